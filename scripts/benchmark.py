@@ -0,0 +1,309 @@
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import shutil
+import asyncio
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from pathlib import Path
+from datetime import datetime
+from lightrag import LightRAG, QueryParam
+from lightrag.llm import ollama_model_complete
+from lightrag.utils import EmbeddingFunc
+import fetch_github_data
+import scrape_website
+import insert_driver
+from merge_data import merge_data
+from shard_corpus import shard_corpus
+from embedding_cache import EmbeddingCache, CachedEmbedding, ollama_embed_batch
+from completion_cache import CompletionCache, cached_completion
+from fake_services import SyntheticRepo, fake_github, fake_profile_site, fake_ollama
+import instrumentation
+
+# Set up logging
+logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
+
+# Set up file paths
+BENCHMARK_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/benchmarks'  # One JSON result file per run
+
+# Corpus sizes: files and issues in the synthetic repository, profiles on the fake site
+SIZES = {
+    "small": {"files": 20, "issues": 10, "profiles": 10},
+    "medium": {"files": 100, "issues": 40, "profiles": 40},
+    "large": {"files": 400, "issues": 150, "profiles": 150},
+}
+STAGES = ("fetch_contents", "fetch_archive", "scrape", "scrape_incremental", "merge", "shard", "insert", "insert_warm", "query")
+QUERY_MODES = ("naive", "local", "global", "hybrid")
+QUESTIONS = (
+    "Which Keystone employees would be best positioned to resolve the GitHub issues found?",
+    "What did Alice Moreno and Bilal Chen change in the message handler?",
+)
+FILE_SIZE = 2000  # Bytes per synthetic source file
+LLM_LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "0.05"))  # Seconds the fake Ollama adds to every completion
+LLM_TOKENS_PER_SECOND = float(os.getenv("BENCH_LLM_TOKENS_PER_SECOND", "1000"))  # Simulated generation speed
+EMBED_LATENCY = float(os.getenv("BENCH_EMBED_LATENCY", "0.005"))
+NETWORK_LATENCY = float(os.getenv("BENCH_NETWORK_LATENCY", "0.0"))  # Seconds added to every fake GitHub/site response
+REGRESSION_TOLERANCE = 0.2  # --compare flags stages more than 20% slower
+
+def git_revision():
+    """
+    Return (commit, dirty) of the checkout the scripts run from, or (None, None) outside git.
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd, capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+class StageTimer:
+    """
+    Times named stages, keeping each one's seconds plus whatever counts the stage reports.
+    """
+    def __init__(self, stages, verbose=False):
+        self.stages = stages
+        self.verbose = verbose
+        self.results = {}
+
+    def run(self, name, func, *args, required=False):
+        """
+        Time func(*args) if name is selected; a required stage still runs, untimed, when it is not.
+        """
+        if name not in self.stages:
+            if not required:
+                return None
+            with self.quiet():
+                return func(*args)[0]
+        start = time.perf_counter()
+        with self.quiet(), instrumentation.span(f"benchmark.{name}"):
+            value, details = func(*args)
+        self.record(name, time.perf_counter() - start, details)
+        return value
+
+    async def arun(self, name, func, *args):
+        start = time.perf_counter()
+        with self.quiet(), instrumentation.span(f"benchmark.{name}"):
+            value, details = await func(*args)
+        self.record(name, time.perf_counter() - start, details)
+        return value
+
+    def quiet(self):
+        # The scripts and LightRAG report progress with print; keep it out of the benchmark output unless --verbose
+        return contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    def record(self, name, seconds, details):
+        self.results[name] = dict({"seconds": round(seconds, 4)}, **details)
+        logging.info(f"  {name}: {seconds:.3f}s {details}")
+
+def graph_functions(ollama_url, cache_dir):
+    """
+    Return (llm_model_func, embedding_func) as the graph scripts build them, against the fake Ollama with empty caches.
+    """
+    completion_cache = CompletionCache(path=os.path.join(cache_dir, "completions.sqlite"))
+    embedding_cache = EmbeddingCache("nomic-embed-text:latest", 768, cache_dir=os.path.join(cache_dir, "embeddings"))
+    embedding_func = EmbeddingFunc(
+        embedding_dim=768,
+        max_token_size=8192,
+        func=CachedEmbedding(embedding_cache, ollama_embed_batch("nomic-embed-text:latest", ollama_url)),
+    )
+    return cached_completion(instrumentation.instrument_llm(ollama_model_complete), completion_cache), embedding_func
+
+def make_rag(working_dir, ollama_url, llm_model_func, embedding_func, log_level=logging.WARNING):
+    os.makedirs(working_dir, exist_ok=True)
+    return LightRAG(
+        working_dir=working_dir,
+        llm_model_func=llm_model_func,
+        llm_model_name="llama3.1:8b-instruct-q8_0",
+        llm_model_max_async=4,  # Same as generate_graph_LOCAL.py
+        llm_model_max_token_size=60000,
+        llm_model_kwargs={"host": ollama_url, "options": {"num_ctx": 60000}},
+        embedding_func=embedding_func,
+        log_level=log_level,
+    )
+
+async def insert_documents(rag, documents, ollama):
+    before = dict(ollama.requests)
+    skipped, added, replaced, removed = await insert_driver.aupdate_graph(rag, documents, report_interval=3600)
+    calls = {endpoint: count - before.get(endpoint, 0) for endpoint, count in ollama.requests.items()}
+    return rag, {"documents": added + replaced, "llm_calls": calls.get("/api/chat", 0), "embed_calls": calls.get("/api/embed", 0)}
+
+async def run_queries(rag):
+    count = 0
+    for mode in QUERY_MODES:
+        for question in QUESTIONS:
+            await rag.aquery(question, param=QueryParam(mode=mode))
+            count += 1
+    return None, {"queries": count}
+
+def benchmark_size(name, size, stages, work_dir, verbose=False):
+    """
+    Run every selected stage for one corpus size against fresh stand-in servers and return the stage timings.
+    """
+    github = fake_github(SyntheticRepo(files=size["files"], issues=size["issues"], file_size=FILE_SIZE), latency=NETWORK_LATENCY).start()
+    site = fake_profile_site(size["profiles"], latency=NETWORK_LATENCY).start()
+    ollama = fake_ollama(LLM_LATENCY, LLM_TOKENS_PER_SECOND, EMBED_LATENCY).start()
+    fetch_github_data.GITHUB_API_URL = github.url
+    fetch_github_data.GITHUB_TOKEN = None
+    repo_url = f"https://github.com/{github.repo.full_name}"
+    data_dir = Path(work_dir, "data")
+    archive_dir = Path(work_dir, "archive")
+    os.makedirs(data_dir)
+    os.makedirs(archive_dir)
+    merged_path = os.path.join(work_dir, "merged_output.txt")
+    manifest_path = os.path.join(work_dir, "token_manifest.json")
+    shards_path = os.path.join(work_dir, "shards.jsonl")
+    timer = StageTimer(stages, verbose)
+    logging.info(f"Size {name}: {size}")
+
+    def fetch(mode, output_dir):
+        result = fetch_github_data.repo_to_text(repo_url, output_dir, mode)
+        if result["status"] == "failed":
+            raise RuntimeError(f"repo_to_text failed in {mode} mode")
+        return result, {"api_calls": result["api_calls"], "files": result["files"]}
+
+    def scrape(previous):
+        records, changes = scrape_website.scrape_profiles(f"{site.url}/our-people", previous, min_interval=0.0)
+        scrape_website.write_profiles(records, os.path.join(data_dir, "our_people.txt"))
+        return {record["url"]: record for record in records}, {"profiles": len(records), "unchanged": changes["unchanged"]}
+
+    def merge():
+        manifest = merge_data(data_dir, merged_path, manifest_path)
+        return manifest, {"files": len(manifest["files"]), "tokens": sum(entry["tokens"] for entry in manifest["files"].values())}
+
+    def shard():
+        shards = shard_corpus(merged_path, manifest_path, shards_path)
+        return shards, {"shards": len(shards)}
+
+    try:
+        # Each stage works on the previous one's output, so those run even when only later stages are timed
+        contents = timer.run("fetch_contents", fetch, "contents", data_dir, required=True)
+        archive = timer.run("fetch_archive", fetch, "archive", archive_dir)
+        if archive is not None:
+            # Both modes must write the same text, or the archive timings compare different work
+            digests = {mode: hashlib.sha256(Path(result["output"]).read_bytes()).hexdigest()
+                       for mode, result in (("contents", contents), ("archive", archive))}
+            if digests["contents"] != digests["archive"]:
+                raise RuntimeError(f"Archive output differs from contents output: {digests}")
+        records = timer.run("scrape", scrape, None, required=True)
+        timer.run("scrape_incremental", scrape, records)
+        timer.run("merge", merge, required=True)
+        shards = timer.run("shard", shard, required=True)
+        if not {"insert", "insert_warm", "query"} & set(stages):
+            return timer.results
+        documents = [(shard["id"], shard["text"]) for shard in shards]
+
+        async def graph_stages():
+            llm_model_func, embedding_func = graph_functions(ollama.url, os.path.join(work_dir, "cache"))
+            embedding_func = instrumentation.instrument_embedding(embedding_func)
+            log_level = logging.INFO if verbose else logging.WARNING
+            rag = make_rag(os.path.join(work_dir, "graph"), ollama.url, llm_model_func, embedding_func, log_level)
+            if "insert" in stages:
+                await timer.arun("insert", insert_documents, rag, documents, ollama)
+            else:
+                with timer.quiet():
+                    await insert_documents(rag, documents, ollama)
+            if "insert_warm" in stages:
+                # A rebuild into a new working directory, served by the completion and embedding caches
+                warm = make_rag(os.path.join(work_dir, "graph_warm"), ollama.url, llm_model_func, embedding_func, log_level)
+                await timer.arun("insert_warm", insert_documents, warm, documents, ollama)
+            if "query" in stages:
+                await timer.arun("query", run_queries, rag)
+                timer.results["query"]["per_query"] = round(timer.results["query"]["seconds"] / timer.results["query"]["queries"], 4)
+
+        asyncio.run(graph_stages())
+        return timer.results
+    finally:
+        for server in (github, site, ollama):
+            server.stop()
+
+def summarize(runs):
+    """
+    Collapse repeated runs of one size into min/median seconds per stage, keeping the first run's counts.
+    """
+    summary = {}
+    for stage in runs[0]:
+        seconds = [run[stage]["seconds"] for run in runs if stage in run]
+        summary[stage] = dict(runs[0][stage], seconds=round(min(seconds), 4), median=round(statistics.median(seconds), 4), runs=len(seconds))
+    return summary
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Print seconds per stage against a previous result file; returns the stages more than tolerance slower.
+    """
+    regressions = []
+    print(f"Comparing with {baseline.get('commit') or 'unknown commit'} ({baseline.get('created')})")
+    print(f"{'Size':<8} {'Stage':<20} {'Baseline':>10} {'Current':>10} {'Ratio':>7}")
+    for size, stages in results["sizes"].items():
+        for stage, timing in stages.items():
+            previous = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if not previous:
+                continue
+            ratio = timing["seconds"] / previous["seconds"] if previous["seconds"] else float("inf")
+            flag = "  slower" if ratio > 1 + tolerance else ""
+            if flag:
+                regressions.append((size, stage, ratio))
+            print(f"{size:<8} {stage:<20} {previous['seconds']:>10.3f} {timing['seconds']:>10.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the pipeline stages against local stand-ins for GitHub, the profile site and Ollama.")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=["small", "medium"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size; the fastest is reported")
+    parser.add_argument("--output", help="Result file (default: BENCHMARK_DIR/benchmark_<commit>_<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="Slowdown ratio above 1 flagged by --compare")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary working directories")
+    parser.add_argument("--verbose", action="store_true", help="Show the scripts' own output and LightRAG's logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        for name in ("lightrag", "httpx", "nano-vectordb"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+    instrumentation.configure("benchmark")  # INSTRUMENT=1 adds a span trace of every stage (and its overhead to the timings)
+    commit, dirty = git_revision()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"llm_latency": LLM_LATENCY, "llm_tokens_per_second": LLM_TOKENS_PER_SECOND, "embed_latency": EMBED_LATENCY,
+                   "network_latency": NETWORK_LATENCY, "file_size": FILE_SIZE,
+                   "corpus": {name: SIZES[name] for name in args.sizes}, "repeat": args.repeat, "stages": args.stages},
+        "sizes": {},
+    }
+    for name in args.sizes:
+        runs = []
+        for _ in range(max(args.repeat, 1)):
+            work_dir = tempfile.mkdtemp(prefix=f"benchmark_{name}_")
+            try:
+                runs.append(benchmark_size(name, SIZES[name], args.stages, work_dir, args.verbose))
+            finally:
+                if args.keep:
+                    logging.info(f"Kept {work_dir}")
+                else:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+        results["sizes"][name] = summarize(runs)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"benchmark_{(commit or 'nogit')[:8]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    logging.info(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) more than {args.tolerance:.0%} slower than the baseline")
+            sys.exit(1)
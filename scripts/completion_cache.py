@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import contextvars
+from functools import wraps
+import instrumentation
+
+# Shared across working directories (override with COMPLETION_CACHE_PATH / _MODE / _TTL / _MAX_BYTES)
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", os.path.expanduser("~/.cache/keystone_completions.sqlite"))
+COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", str(30 * 24 * 3600)))  # Seconds an entry stays valid
+COMPLETION_CACHE_MAX_BYTES = int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+MODES = ("readwrite", "readonly", "off")
+EVICT_EVERY = 200  # Writes between TTL/size sweeps
+
+# Set by every cached call, so a wrapper around it (insert_driver's counters) can tell hits from model calls
+served_from_cache = contextvars.ContextVar("served_from_cache", default=False)
+
+# Transport settings that do not change what the model answers
+UNKEYED_KWARGS = {"hashing_kv", "host", "timeout"}
+
+def normalize(text):
+    """
+    Strip surrounding whitespace, unify line endings and drop trailing spaces on each line.
+    """
+    if text is None:
+        return None
+    return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").strip().split("\n"))
+
+def completion_key(model, prompt, system_prompt, history_messages, kwargs):
+    key = {
+        "model": model,
+        "system_prompt": normalize(system_prompt),
+        "history": [{"role": m.get("role"), "content": normalize(m.get("content"))} for m in history_messages or []],
+        "prompt": normalize(prompt),
+        # Generation settings such as options.num_ctx or temperature
+        "kwargs": {k: v for k, v in kwargs.items() if k not in UNKEYED_KWARGS},
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class CompletionCache:
+    """
+    SQLite cache of LLM completions, keyed by model, normalized prompts and generation options.
+
+    Entries older than ttl are ignored and swept; once the stored responses exceed max_bytes the
+    least recently used are deleted. Each entry keeps how long the original call took, so hits
+    can be reported as seconds saved. In readonly mode lookups still hit but nothing is written.
+    """
+    def __init__(self, path=COMPLETION_CACHE_PATH, mode="readwrite", ttl=COMPLETION_CACHE_TTL, max_bytes=COMPLETION_CACHE_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown completion cache mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets several graph builds and query apps share the file
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, model TEXT, response TEXT, "
+            "seconds REAL, size INTEGER, created REAL, last_used REAL)"
+        )
+        self.db.commit()
+        if mode == "readwrite":
+            self.evict()
+
+    def get(self, key):
+        row = self.db.execute(
+            "SELECT response, seconds FROM completions WHERE key = ? AND created >= ?", (key, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.seconds_saved += row[1]
+        if self.mode == "readwrite":
+            self.db.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return row[0]
+
+    def put(self, key, model, response, seconds):
+        if self.mode != "readwrite":
+            return
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO completions (key, model, response, seconds, size, created, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, model, response, seconds, len(response.encode("utf-8")), now, now),
+        )
+        self.db.commit()
+        self.writes += 1
+        if self.writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete expired entries, then least recently used ones until the cache fits under max_bytes.
+        """
+        removed = self.db.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.ttl,)).rowcount
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total > self.max_bytes:
+            for key, size in self.db.execute("SELECT key, size FROM completions ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        self.db.commit()
+        return removed
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        logging.info(
+            f"Completion cache ({self.mode}): {self.hits} hits, {self.misses} misses ({hit_rate:.0%}), "
+            f"{self.seconds_saved:.1f}s of LLM time saved"
+        )
+
+def cached_completion(llm_model_func, cache, model=None):
+    """
+    Wrap a LightRAG completion function (e.g. ollama_model_complete) with a CompletionCache.
+
+    model names the model for the cache key; by default it is read from LightRAG's global config
+    (llm_model_name), which is also where ollama_model_complete takes it from.
+    """
+    @wraps(llm_model_func)
+    async def complete(prompt, system_prompt=None, history_messages=[], **kwargs):
+        model_name = model or kwargs["hashing_kv"].global_config["llm_model_name"]
+        key = completion_key(model_name, prompt, system_prompt, history_messages, kwargs)
+        response = cache.get(key)
+        served_from_cache.set(response is not None)
+        instrumentation.count("completion_cache_lookups", result="miss" if response is None else "hit")
+        if response is not None:
+            return response
+        start = time.monotonic()
+        response = await llm_model_func(prompt, system_prompt=system_prompt, history_messages=history_messages, **kwargs)
+        cache.put(key, model_name, response, time.monotonic() - start)
+        return response
+
+    return complete
+
+def completion_cache_from_env(default_mode):
+    """
+    Return a CompletionCache in COMPLETION_CACHE_MODE (or the script's default_mode), or None when off.
+    """
+    mode = os.getenv("COMPLETION_CACHE_MODE", default_mode)
+    if mode == "off":
+        return None
+    return CompletionCache(mode=mode)
+
+def with_completion_cache(llm_model_func, default_mode, model=None):
+    """
+    Return (llm_model_func wrapped per the configured mode, cache or None).
+    """
+    cache = completion_cache_from_env(default_mode)
+    if cache is None:
+        return llm_model_func, None
+    return cached_completion(llm_model_func, cache, model), cache
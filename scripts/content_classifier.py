@@ -0,0 +1,116 @@
+import os
+import re
+import sys
+import time
+
+# Bytes that may appear in text files: BEL, BS, TAB, LF, FF, CR, ESC and everything printable except DEL
+TEXT_CHARACTERS = bytes(sorted({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f}))
+
+PREFIX_SIZE = 8192  # Only this many leading bytes are inspected
+HEADER_SIZE = 1024  # Generated-code markers must appear this close to the top of the file
+MAX_FILE_SIZE = int(os.getenv("FETCH_MAX_FILE_SIZE", str(1024 * 1024)))  # Larger files are skipped unread
+
+LFS_POINTER_PREFIX = b"version https://git-lfs.github.com/spec/"
+
+# Lockfiles recognised by content, whatever they are named
+LOCKFILE_MARKERS = re.compile(
+    rb"^# This file is automatically @generated by (Poetry|Cargo)"
+    rb"|^# yarn lockfile v1"
+    rb"|^\s*\"lockfileVersion\"\s*:"
+    rb"|^lockfileVersion:"
+    rb"|^\s*\"_meta\"\s*:\s*\{\s*\"hash\""
+    rb"|^GEM\r?\n\s+remote:",
+    re.MULTILINE,
+)
+
+# Generated-code banners, only counted inside a comment line
+GENERATED_MARKERS = re.compile(
+    rb"^\s*(#|//|/?\*|<!--|--|;).*(@generated|DO NOT EDIT|Code generated by|auto-generated|autogenerated file)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+MINIFIED_MIN_SAMPLE = 4096  # Need at least this much of a prefix to judge line lengths
+MINIFIED_MAX_AVG_LINE = 500  # Average line length above which text may be minified...
+MINIFIED_MAX_SPACE_RATIO = 0.05  # ...when spaces are also this rare (prose with long lines has ~15%)
+
+def is_binary_string(bytes_data):
+    if not bytes_data:
+        return False
+    prefix = bytes_data[:PREFIX_SIZE]
+    if b'\0' in prefix:
+        return True
+    # translate deletes every text byte in C; anything left over is non-text
+    return bool(prefix.translate(None, TEXT_CHARACTERS))
+
+def classify_size(size):
+    """
+    Return "too_large" when a file can be skipped from its size alone, before it is fetched.
+    """
+    if size is not None and size > MAX_FILE_SIZE:
+        return "too_large"
+    return None
+
+def classify_content(data):
+    """
+    Return the reason a file should be left out of the document, or None to keep it.
+
+    Reasons: too_large, binary, lfs_pointer, lockfile, generated, minified.
+    """
+    reason = classify_size(len(data))
+    if reason:
+        return reason
+    if is_binary_string(data):
+        return "binary"
+    prefix = data[:PREFIX_SIZE]
+    if prefix.startswith(LFS_POINTER_PREFIX):
+        return "lfs_pointer"
+    if LOCKFILE_MARKERS.search(prefix):
+        return "lockfile"
+    if GENERATED_MARKERS.search(prefix[:HEADER_SIZE]):
+        return "generated"
+    if (len(prefix) >= MINIFIED_MIN_SAMPLE
+            and (prefix.count(b"\n") + 1) * MINIFIED_MAX_AVG_LINE < len(prefix)
+            and prefix.count(b" ") < len(prefix) * MINIFIED_MAX_SPACE_RATIO):
+        return "minified"
+    return None
+
+def legacy_is_binary_string(bytes_data):
+    text_characters = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+    if not bytes_data:
+        return False
+    if b'\0' in bytes_data:
+        return True
+    nontext = bytes([b for b in bytes_data if b not in text_characters])
+    return bool(nontext)
+
+# Compare the old per-byte loop with the classifier on local files:
+#   python content_classifier.py path/to/file_or_dir ...
+if __name__ == "__main__":
+    blobs = []
+    for target in sys.argv[1:]:
+        for root, _, files in os.walk(target) if os.path.isdir(target) else [("", [], [target])]:
+            for name in files:
+                with open(os.path.join(root, name), "rb") as f:
+                    blobs.append(f.read())
+    megabytes = sum(len(blob) for blob in blobs) / (1024 * 1024)
+    if not megabytes:
+        print("Usage: python content_classifier.py <file or directory> ...")
+        sys.exit(1)
+
+    start = time.process_time()
+    for blob in blobs:
+        legacy_is_binary_string(blob)
+    legacy_seconds = time.process_time() - start
+
+    start = time.process_time()
+    reasons = {}
+    for blob in blobs:
+        reason = classify_content(blob) or "kept"
+        reasons[reason] = reasons.get(reason, 0) + 1
+    seconds = time.process_time() - start
+
+    print(f"{len(blobs)} files, {megabytes:.1f} MB")
+    print(f"Legacy is_binary_string: {legacy_seconds / megabytes * 1000:.1f} ms CPU per MB")
+    print(f"classify_content: {seconds / megabytes * 1000:.2f} ms CPU per MB")
+    for reason, count in sorted(reasons.items()):
+        print(f"  {reason}: {count}")
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import argparse
+from pathlib import Path
+import numpy as np
+from shard_corpus import SHARDS_PATH, PEOPLE_HEADER, ISSUE_HEADER, encoding, load_shards
+
+# Set up file paths
+DEDUP_SHARDS_PATH = SHARDS_PATH.with_name("shards_dedup.jsonl")  # Preferred by the graph scripts when current
+DEDUP_REPORT_PATH = SHARDS_PATH.with_name("dedup_report.json")
+
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # Estimated Jaccard similarity at which a segment counts as a duplicate
+# Extraction throughput of the graph model, used to turn saved tokens into saved time (insert_driver.py reports it)
+DEDUP_LLM_TOKENS_PER_SECOND = float(os.getenv("DEDUP_LLM_TOKENS_PER_SECOND", "400"))
+NUM_PERM = 128  # MinHash signature length
+SHINGLE_WORDS = 5
+MIN_SEGMENT_WORDS = 12  # Shorter segments (e.g. "Thanks!") are never dropped
+EXCERPT_CHARS = 160
+
+COMMENT_LINE = re.compile(r"^  - \S+ \(.*?\): ")
+PR_LINK_PREFIX = re.compile(r"^\s*- (Potential PR Link: )?")
+
+def normalize_line(line):
+    return re.sub(r"\s+", " ", PR_LINK_PREFIX.sub("", line)).strip().lower()
+
+def segment_shard(shard):
+    """
+    Split a shard into line ranges that may be deduplicated.
+
+    Returns (lines, segments, link_lines). Each segment is a dict with start/end line indexes,
+    an issue section number and a role: "body", "comment", "row" or "paragraph". Protected
+    segments (headings, code fences) are compared against but never dropped. link_lines maps
+    each PR link line derived from an issue to its section.
+    """
+    lines = shard["text"].split("\n")
+    segments, link_lines = [], {}
+    if shard["kind"] == "structure":
+        return lines, segments, link_lines
+
+    if shard["kind"] == "person":
+        for i, line in enumerate(lines):
+            if line.strip() and line != PEOPLE_HEADER:
+                segments.append({"start": i, "end": i + 1, "section": i, "role": "row", "protected": False})
+        return lines, segments, link_lines
+
+    if shard["kind"] == "issue":
+        section, field, current = -1, None, None
+        for i, line in enumerate(lines):
+            starts_segment = False
+            if ISSUE_HEADER.match(line):
+                section, field, current = section + 1, None, None
+                continue
+            if line.startswith("- **"):
+                field = line.split("**")[1] if line.count("**") >= 2 else None
+                current = None
+                starts_segment = field == "Body"
+                if not starts_segment:
+                    continue
+            elif field == "Potential Pull Request Links" and line.startswith("  - "):
+                link_lines[i] = section
+                continue
+            elif line.startswith("    - Potential PR Link: "):
+                link_lines[i] = section
+                continue
+            elif field == "Comments" and COMMENT_LINE.match(line):
+                starts_segment = True
+            if starts_segment:
+                # A body segment starts after its "- **Body**:" line
+                start = i + 1 if field == "Body" else i
+                current = {"start": start, "end": i + 1, "section": section,
+                           "role": "body" if field == "Body" else "comment", "protected": False}
+                segments.append(current)
+            elif current is not None:
+                current["end"] = i + 1
+        return lines, [segment for segment in segments if segment["end"] > segment["start"]], link_lines
+
+    # File sections and other text: paragraphs separated by blank lines. A fenced block can
+    # contain blank lines, so every line from an opening fence to its closing one is code.
+    fenced, in_fence = [], False
+    for line in lines:
+        is_fence = line.lstrip().startswith("```")
+        fenced.append(in_fence or is_fence)
+        in_fence = in_fence != is_fence
+    start = None
+    for i, line in enumerate(lines + [""]):
+        if line.strip() and start is None:
+            start = i
+        elif not line.strip() and start is not None:
+            protected = lines[start].startswith("#") or any(fenced[start:i])
+            segments.append({"start": start, "end": i, "section": start, "role": "paragraph", "protected": protected})
+            start = None
+    return lines, segments, link_lines
+
+def shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+class MinHashIndex:
+    """
+    MinHash signatures over word shingles, bucketed by LSH bands.
+
+    Bands and rows are chosen so pairs somewhat below threshold still collide in a band; the
+    estimated Jaccard similarity of each candidate is then checked against threshold.
+    """
+    def __init__(self, threshold, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.rows = max((r for r in range(1, num_perm + 1) if num_perm % r == 0 and (r / num_perm) ** (1 / r) <= threshold), default=1)
+        self.bands = num_perm // self.rows
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = []
+
+    def signature(self, text):
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles(text)], dtype=np.uint64)
+        # Multiply-add hashing modulo 2**32, one permutation per column
+        return ((hashes[:, None] * self.a + self.b) & np.uint64(0xFFFFFFFF)).min(axis=0).astype(np.uint32)
+
+    def best_match(self, signature):
+        """
+        Return (item, estimated Jaccard) of the most similar indexed item at or above threshold, else (None, 0).
+        """
+        candidates = set()
+        for band, bucket in enumerate(self.buckets):
+            candidates.update(bucket.get(signature[band * self.rows:(band + 1) * self.rows].tobytes(), ()))
+        best, best_similarity = None, 0.0
+        for item in candidates:
+            similarity = float(np.mean(self.signatures[item] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = item, similarity
+        return best, best_similarity
+
+    def add(self, signature):
+        item = len(self.signatures)
+        self.signatures.append(signature)
+        for band, bucket in enumerate(self.buckets):
+            bucket.setdefault(signature[band * self.rows:(band + 1) * self.rows].tobytes(), []).append(item)
+        return item
+
+def excerpt(text):
+    text = re.sub(r"\s+", " ", text).strip()
+    return text if len(text) <= EXCERPT_CHARS else text[:EXCERPT_CHARS - 3] + "..."
+
+def dedup_shards(shards, threshold=DEDUP_THRESHOLD):
+    """
+    Drop exact and near-duplicate segments across the shards.
+
+    Returns (deduplicated shards, removals). Segments are visited in corpus order, except that an
+    issue's body goes before its comments so a comment quoting the body is the copy removed. PR link
+    lines that repeat a line of their issue's body or comments are removed as well. Shard IDs are
+    kept, so the graph ledger sees an edited shard as changed; a shard left with nothing but its
+    context line is dropped.
+    """
+    index = MinHashIndex(threshold)
+    exact = {}  # Normalized text digest -> first kept copy
+    index_refs = []  # MinHash index item -> kept copy
+    removals = []
+    parsed = [segment_shard(shard) for shard in shards]
+    keep = [[True] * len(lines) for lines, _, _ in parsed]
+
+    # PR link lines derived from an issue's own text
+    for s, (lines, segments, link_lines) in enumerate(parsed):
+        section_text = {}
+        for segment in segments:
+            for i in range(segment["start"], segment["end"]):
+                section_text.setdefault(segment["section"], set()).add(normalize_line(lines[i]))
+        for i, section in link_lines.items():
+            if normalize_line(lines[i]) in section_text.get(section, ()):
+                keep[s][i] = False
+                removals.append({"shard": shards[s]["id"], "source": shards[s]["source"], "reason": "pr-link",
+                                 "text": lines[i], "excerpt": excerpt(lines[i])})
+
+    order = sorted(
+        ((s, segment) for s, (_, segments, _) in enumerate(parsed) for segment in segments),
+        key=lambda item: (item[0], item[1]["section"], item[1]["role"] != "body", item[1]["start"]),
+    )
+    for s, segment in order:
+        text = "\n".join(parsed[s][0][segment["start"]:segment["end"]])
+        normalized = re.sub(r"[\s>]+", " ", text).strip().lower()
+        if not normalized:
+            continue
+        long_enough = len(normalized.split()) >= MIN_SEGMENT_WORDS
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        signature = index.signature(normalized) if long_enough else None
+        original, similarity = exact.get(digest), 1.0
+        if original is None and long_enough:
+            item, similarity = index.best_match(signature)
+            original = index_refs[item] if item is not None else None
+        if original is not None and long_enough and not segment["protected"]:
+            for i in range(segment["start"], segment["end"]):
+                keep[s][i] = False
+            removals.append({
+                "shard": shards[s]["id"], "source": shards[s]["source"],
+                "reason": "exact" if digest in exact else "near", "similarity": round(similarity, 3),
+                "text": text, "excerpt": excerpt(text), "duplicate_of": original,
+            })
+            continue
+        ref = {"shard": shards[s]["id"], "source": shards[s]["source"], "excerpt": excerpt(text)}
+        exact.setdefault(digest, ref)
+        if long_enough:
+            index.add(signature)
+            index_refs.append(ref)
+
+    deduped = []
+    for shard, (lines, _, _), mask in zip(shards, parsed, keep):
+        if all(mask):
+            deduped.append(shard)
+            continue
+        text = re.sub(r"\n{3,}", "\n\n", "\n".join(line for line, kept in zip(lines, mask) if kept)).strip("\n")
+        has_context = lines[0].startswith("# Repository: ") or lines[0] == PEOPLE_HEADER
+        if not (text.partition("\n")[2] if has_context else text).strip():
+            # Nothing but the context line is left
+            continue
+        deduped.append(dict(
+            shard,
+            text=text,
+            tokens=len(encoding.encode_ordinary(text)),
+            content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        ))
+    return deduped, removals
+
+def build_report(shards, deduped, removals, threshold, tokens_per_second=DEDUP_LLM_TOKENS_PER_SECOND):
+    tokens_before = sum(shard["tokens"] for shard in shards)
+    tokens_after = sum(shard["tokens"] for shard in deduped)
+    by_reason = {}
+    for removal in removals:
+        entry = by_reason.setdefault(removal["reason"], {"segments": 0, "tokens": 0})
+        entry["segments"] += 1
+        entry["tokens"] += len(encoding.encode_ordinary(removal.pop("text")))
+    return {
+        "created": time.time(),
+        "threshold": threshold,
+        "shards_before": len(shards),
+        "shards_after": len(deduped),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "llm_tokens_per_second": tokens_per_second,
+        "estimated_llm_seconds_saved": round((tokens_before - tokens_after) / tokens_per_second, 1),
+        "removed_by_reason": by_reason,
+        "removed": removals,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove exact and near-duplicate text from the shards before graph insertion.")
+    parser.add_argument("--shards", type=Path, default=SHARDS_PATH)
+    parser.add_argument("--output", type=Path, default=DEDUP_SHARDS_PATH)
+    parser.add_argument("--report", type=Path, default=DEDUP_REPORT_PATH)
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD,
+                        help="Estimated Jaccard similarity of word shingles at which a segment is a duplicate")
+    parser.add_argument("--tokens-per-second", type=float, default=DEDUP_LLM_TOKENS_PER_SECOND,
+                        help="LLM extraction throughput used to estimate the time saved")
+    args = parser.parse_args()
+
+    shards = load_shards(args.shards)
+    deduped, removals = dedup_shards(shards, args.threshold)
+    report = build_report(shards, deduped, removals, args.threshold, args.tokens_per_second)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for shard in deduped:
+            f.write(json.dumps(shard, ensure_ascii=False) + "\n")
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"Wrote {len(deduped)} of {len(shards)} shards to {args.output}")
+    for reason, entry in sorted(report["removed_by_reason"].items()):
+        print(f"  {reason}: {entry['segments']} segments, {entry['tokens']} tokens")
+    print(
+        f"Tokens: {report['tokens_before']} -> {report['tokens_after']} ({report['tokens_saved']} saved, "
+        f"about {report['estimated_llm_seconds_saved'] / 60:.1f} min of LLM extraction at {args.tokens_per_second:g} tokens/s)"
+    )
+    print(f"Audit report: {args.report}")
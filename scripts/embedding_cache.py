@@ -0,0 +1,231 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import numpy as np
+import ollama
+from lightrag.utils import EmbeddingFunc
+import instrumentation
+
+# Cache location and limits (override with EMBED_CACHE_DIR / EMBED_CACHE_MAX_BYTES)
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.expanduser("~/.cache/keystone_embeddings"))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # Vector file size cap
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # Most texts sent to Ollama in one /api/embed request
+EMBED_COALESCE_WINDOW = float(os.getenv("EMBED_COALESCE_WINDOW", "0.01"))  # Seconds misses wait for company before being sent
+GROW_ROWS = 4096  # The vector file grows this many rows at a time, up to the cap
+
+OLLAMA_HOST = "http://localhost:11434"
+EMBED_MODEL = "nomic-embed-text:latest"
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by SHA-256 of (model, text).
+
+    Vectors live as float32 rows in an mmap-ed file (vectors.f32); a SQLite index maps each key to
+    its row and last-use time. Once the file reaches max_bytes, the least recently used rows are reused.
+    Each (model, dimension) pair gets its own directory under cache_dir.
+
+    Several processes can share a directory: rows are handed out and read under SQLite's write lock, and the
+    vector file only ever grows, so a row another process has mapped never disappears under it.
+    """
+    def __init__(self, model, dim, cache_dir=EMBED_CACHE_DIR, max_bytes=EMBED_CACHE_MAX_BYTES):
+        self.model = model
+        self.dim = dim
+        self.directory = os.path.join(cache_dir, f"{model.replace('/', '_').replace(':', '_')}_{dim}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_rows = max(1, max_bytes // (dim * 4))
+        self.vector_path = os.path.join(self.directory, "vectors.f32")
+        self.db = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), check_same_thread=False, timeout=30)
+        # WAL lets several graph builds and query apps share the index
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)")
+        self.db.commit()
+        self.rows = 0
+        self.vectors = None
+        self._remap()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.requests = 0
+
+    def _map(self, rows):
+        if self.vectors is not None:
+            self.vectors.flush()
+        with open(self.vector_path, "ab") as f:
+            # Grow only: another process may have mapped more rows than this one needs
+            if os.fstat(f.fileno()).st_size < rows * self.dim * 4:
+                f.truncate(rows * self.dim * 4)
+        self.rows = rows
+        self.vectors = np.memmap(self.vector_path, dtype=np.float32, mode="r+", shape=(rows, self.dim)) if rows else None
+
+    def _remap(self):
+        # Pick up rows another process has added to the file since it was mapped here
+        rows = os.path.getsize(self.vector_path) // (self.dim * 4) if os.path.exists(self.vector_path) else 0
+        if rows > self.rows:
+            self._map(rows)
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Return {key: vector} for the keys present in the cache and refresh their last-use time.
+        """
+        found = {}
+        keys = list(keys)
+        # Rows are only rewritten under the write lock (see put_many). A WAL read snapshot does not
+        # hold writers off, so take the lock here too: a row cannot be evicted and reused for
+        # another text between looking up its slot and copying the vector out.
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, slot in self.db.execute(f"SELECT key, slot FROM embeddings WHERE key IN ({placeholders})", batch).fetchall():
+                    if slot >= self.rows:
+                        self._remap()
+                    found[key] = np.array(self.vectors[slot])
+            if found:
+                now = time.time()
+                self.db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return found
+
+    def _free_slots(self, count):
+        # Rows are handed out in order, so everything past the highest used slot is free
+        self._remap()
+        next_slot = self.db.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM embeddings").fetchone()[0]
+        if next_slot + count > self.rows and self.rows < self.max_rows:
+            self._map(min(self.max_rows, max(next_slot + count, self.rows + GROW_ROWS)))
+        slots = list(range(next_slot, min(next_slot + count, self.rows)))
+        if len(slots) < count:
+            # Evict the least recently used entries and reuse their rows
+            evicted = self.db.execute(
+                "SELECT key, slot FROM embeddings ORDER BY last_used LIMIT ?", (count - len(slots),)
+            ).fetchall()
+            self.db.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key, _ in evicted])
+            slots += [slot for _, slot in evicted]
+        return slots
+
+    def put_many(self, items):
+        """
+        Store [(key, vector)]; rows beyond the cap replace the least recently used entries.
+        """
+        items = items[-self.max_rows:]
+        # Hold the write lock from choosing rows to recording them, so two processes never get the same row
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            slots = self._free_slots(len(items))
+            now = time.time()
+            for (_, vector), slot in zip(items, slots):
+                self.vectors[slot] = vector
+            self.vectors.flush()
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for (key, _), slot in zip(items, slots)],
+            )
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        logging.info(
+            f"Embedding cache: {self.hits}/{lookups} texts from cache ({hit_rate:.0%}), "
+            f"{self.deduplicated} duplicates skipped, {self.misses} embedded in {self.requests} requests"
+        )
+
+class CachedEmbedding:
+    """
+    Async embedding function for LightRAG's EmbeddingFunc that serves repeats from an EmbeddingCache.
+
+    Duplicate texts in a call are embedded once. Misses from concurrent calls are queued for
+    EMBED_COALESCE_WINDOW seconds and sent together in batches of up to batch_size, and a text
+    already being embedded for another call is awaited rather than sent twice.
+    """
+    def __init__(self, cache, embed_batch, batch_size=EMBED_BATCH_SIZE, window=EMBED_COALESCE_WINDOW):
+        self.cache = cache
+        self.embed_batch = embed_batch
+        self.batch_size = batch_size
+        self.window = window
+        self.queue = []
+        self.inflight = {}
+        self.flusher = None
+
+    def __deepcopy__(self, memo):
+        # LightRAG deep-copies its config (dataclasses.asdict) when it starts; the cache's connection must stay shared
+        return self
+
+    async def __call__(self, texts):
+        keys = [self.cache.key(text) for text in texts]
+        unique = dict(zip(keys, texts))
+        self.cache.deduplicated += len(keys) - len(unique)
+        vectors = self.cache.get_many(unique)
+        self.cache.hits += len(vectors)
+
+        waiting = {}
+        loop = asyncio.get_running_loop()
+        for key, text in unique.items():
+            if key in vectors:
+                continue
+            if key not in self.inflight:
+                self.inflight[key] = loop.create_future()
+                self.queue.append((key, text))
+                self.cache.misses += 1
+            waiting[key] = self.inflight[key]
+        if self.queue and self.flusher is None:
+            self.flusher = asyncio.ensure_future(self._flush())
+        if waiting:
+            for key, vector in zip(waiting, await asyncio.gather(*waiting.values())):
+                vectors[key] = vector
+        return np.array([vectors[key] for key in keys], dtype=np.float32).reshape(len(keys), self.cache.dim)
+
+    async def _flush(self):
+        try:
+            await asyncio.sleep(self.window)
+            while self.queue:
+                batch, self.queue = self.queue[:self.batch_size], self.queue[self.batch_size:]
+                try:
+                    embedded = await self.embed_batch([text for _, text in batch])
+                    self.cache.requests += 1
+                    self.cache.put_many([(key, vector) for (key, _), vector in zip(batch, embedded)])
+                except Exception as e:
+                    for key, _ in batch:
+                        self.inflight.pop(key).set_exception(e)
+                    continue
+                for (key, _), vector in zip(batch, embedded):
+                    self.inflight.pop(key).set_result(np.asarray(vector, dtype=np.float32))
+        finally:
+            self.flusher = None
+
+def ollama_embed_batch(model, host):
+    """
+    Embed a list of texts with a single request to Ollama's /api/embed endpoint.
+    """
+    client = ollama.AsyncClient(host=host)
+
+    async def embed(texts):
+        with instrumentation.span("embed.request", texts=len(texts)):
+            response = await client.embed(model=model, input=texts)
+            instrumentation.count("http_requests", service="ollama")
+        return np.array(response["embeddings"], dtype=np.float32)
+
+    return embed
+
+def cached_ollama_embedding(embed_model=EMBED_MODEL, host=OLLAMA_HOST, embedding_dim=768, max_token_size=8192):
+    """
+    Build the EmbeddingFunc the graph scripts pass to LightRAG, backed by the persistent cache.
+    """
+    cache = EmbeddingCache(embed_model, embedding_dim)
+    return EmbeddingFunc(
+        embedding_dim=embedding_dim,
+        max_token_size=max_token_size,
+        func=CachedEmbedding(cache, ollama_embed_batch(embed_model, host)),
+    )
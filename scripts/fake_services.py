@@ -0,0 +1,416 @@
+import io
+import re
+import base64
+import json
+import time
+import random
+import tarfile
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode, unquote
+import numpy as np
+
+# Deterministic local stand-ins for GitHub, the Keystone "Our People" site and Ollama, used by benchmark.py
+WORDS = (
+    "agent handoff routine tool function message context loop client stream response model runner "
+    "config state memory queue retry buffer token schema parser event handler session cache"
+).split()
+NAMES = ("Alice Moreno", "Bilal Chen", "Carla Diaz", "Dmitri Novak", "Elena Rossi", "Farid Haddad",
+         "Grace Okafor", "Hiro Tanaka", "Ingrid Berg", "Jonas Weber", "Keiko Sato", "Liam Walsh")
+POSITIONS = ("Engineer", "Senior Engineer", "Data Scientist", "Product Manager", "Principal", "Director")
+SCHOOLS = ("MIT", "Stanford University", "Harvard Business School", "ETH Zurich", "University of Toronto")
+EMBEDDING_DIM = 768
+
+def sentence(rng, words=12):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    # A few capitalized names per sentence give the fake LLM entities to extract
+    return f"{rng.choice(NAMES)} changed the {text} for {rng.choice(NAMES).split()[0]}Service."
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, content_type="application/json", headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+class FakeServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer that records request counts per endpoint and can add a fixed latency.
+    """
+    daemon_threads = True
+
+    def __init__(self, handler, host="127.0.0.1", port=0, latency=0.0):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = {}
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+# GitHub
+
+class SyntheticRepo:
+    """
+    A repository of `files` Python files spread over `dirs` directories, plus `issues` issues with comments.
+    """
+    def __init__(self, full_name="bench/synthetic", files=50, dirs=5, issues=20, comments_per_issue=2, file_size=2000, seed=0):
+        rng = random.Random(seed)
+        self.full_name = full_name
+        self.files = {}
+        for i in range(files):
+            lines = [f'"""Module {i}: {sentence(rng)}"""', ""]
+            while sum(len(line) + 1 for line in lines) < file_size:
+                lines.append(f"def {rng.choice(WORDS)}_{len(lines)}():  # {sentence(rng, 6)}")
+                lines.append(f"    return '{rng.choice(WORDS)}'")
+            self.files[f"src/pkg{i % max(dirs, 1)}/module{i}.py"] = ("\n".join(lines) + "\n").encode("utf-8")
+        self.files["src/__init__.py"] = b""
+
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.issues, self.comments = [], []
+        for number in range(issues, 0, -1):
+            created = now - timedelta(hours=number * 5)
+            body = "\n".join(sentence(rng) for _ in range(3))
+            if number % 3 == 0:
+                body += f"\nFixed in https://github.com/{full_name}/pull/{number + 1000} (PR)"
+            self.issues.append({
+                "number": number, "title": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} fails", "state": "open" if number % 2 else "closed",
+                "body": body, "created_at": created, "updated_at": created + timedelta(hours=1),
+                "closed_at": None if number % 2 else created + timedelta(hours=2),
+                "user": rng.choice(NAMES).split()[0].lower(), "labels": ["bug"] if number % 4 == 0 else [],
+            })
+            for c in range(comments_per_issue):
+                self.comments.append({
+                    "id": number * 100 + c, "issue": number, "user": rng.choice(NAMES).split()[0].lower(),
+                    "body": sentence(rng), "created_at": created + timedelta(minutes=10 * (c + 1)),
+                })
+        self.tarball = self._tarball()
+
+    def _tarball(self):
+        buffer = io.BytesIO()
+        prefix = f"{self.full_name.replace('/', '-')}-0000000"
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            # Members in git order, as git archive writes them
+            for path, data in sorted(self.files.items()):
+                info = tarfile.TarInfo(f"{prefix}/{path}")
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    def blob_sha(self, path):
+        data = self.files[path]
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    def directories(self):
+        dirs = {""}
+        for path in self.files:
+            parts = path.split("/")
+            dirs.update("/".join(parts[:i]) for i in range(1, len(parts)))
+        return dirs
+
+    def listing(self, path):
+        """
+        Return the direct children of directory path as (name, full path, type).
+        """
+        prefix = f"{path}/" if path else ""
+        children = {}
+        for file_path in list(self.files) + sorted(self.directories() - {""}):
+            if not file_path.startswith(prefix) or file_path == path:
+                continue
+            name = file_path[len(prefix):].split("/", 1)[0]
+            children[name] = "dir" if f"{prefix}{name}" in self.directories() else "file"
+        # Git order: a directory sorts as if its name ended in "/"
+        ordered = sorted(children.items(), key=lambda child: child[0] + ("/" if child[1] == "dir" else ""))
+        return [(name, f"{prefix}{name}", kind) for name, kind in ordered]
+
+def iso(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ") if value else None
+
+class FakeGitHubHandler(QuietHandler):
+    """
+    The GitHub REST endpoints used by fetch_github_data.py, with X-RateLimit headers on every response.
+    """
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        parts = urlsplit(self.path)
+        path, query = unquote(parts.path), parse_qs(parts.query)
+        base = f"http://{self.headers['Host']}"
+        repo = server.repo
+        repo_url = f"{base}/repos/{repo.full_name}"
+
+        with server.lock:
+            server.remaining = max(server.remaining - 1, 0)
+        rate_headers = {
+            "X-RateLimit-Limit": str(server.rate_limit),
+            "X-RateLimit-Remaining": str(server.remaining),
+            "X-RateLimit-Reset": str(int(server.reset)),
+        }
+
+        if path == "/rate_limit":
+            server.count("rate_limit")
+            core = {"limit": server.rate_limit, "remaining": server.remaining, "reset": int(server.reset), "used": server.rate_limit - server.remaining}
+            return self.send_body(200, {"resources": {"core": core, "search": core, "graphql": core}, "rate": core}, headers=rate_headers)
+        if path == "/user":
+            server.count("user")
+            return self.send_body(200, {"login": "benchmark", "id": 1, "url": f"{base}/users/benchmark"}, headers=rate_headers)
+        if path == f"/repos/{repo.full_name}":
+            server.count("repo")
+            owner, name = repo.full_name.split("/")
+            return self.send_body(200, {"id": 1, "name": name, "full_name": repo.full_name, "owner": {"login": owner}, "url": repo_url,
+                                        "default_branch": "main"}, headers=rate_headers)
+        if path.startswith(f"/repos/{repo.full_name}/contents"):
+            server.count("contents")
+            return self.contents(repo, path[len(f"/repos/{repo.full_name}/contents"):].strip("/"), repo_url, rate_headers)
+        if path == f"/repos/{repo.full_name}/git/trees/HEAD":
+            server.count("trees")
+            tree = [{"path": p, "type": "tree", "sha": hashlib.sha1(p.encode()).hexdigest()} for p in repo.directories() - {""}]
+            tree += [{"path": p, "type": "blob", "sha": repo.blob_sha(p), "size": len(data)} for p, data in repo.files.items()]
+            # Recursive trees come back in git order: each directory right before its contents
+            tree.sort(key=lambda entry: entry["path"] + ("/" if entry["type"] == "tree" else ""))
+            return self.send_body(200, {"sha": "0" * 40, "tree": tree, "truncated": False}, headers=rate_headers)
+        if path == f"/repos/{repo.full_name}/tarball":
+            server.count("tarball")
+            return self.send_body(200, repo.tarball, content_type="application/x-gzip", headers=rate_headers)
+        if path == f"/repos/{repo.full_name}/issues":
+            server.count("issues")
+            since = query.get("since", [None])[0]
+            issues = [i for i in repo.issues if since is None or iso(i["updated_at"]) >= since]
+            return self.paginate([self.issue_json(i, repo_url) for i in issues], query, base + path, rate_headers)
+        if path == f"/repos/{repo.full_name}/issues/comments":
+            server.count("issue_comments")
+            since = query.get("since", [None])[0]
+            comments = [c for c in repo.comments if since is None or iso(c["created_at"]) >= since]
+            return self.paginate([self.comment_json(c, repo_url) for c in comments], query, base + path, rate_headers)
+        server.count("not_found")
+        return self.send_body(404, {"message": "Not Found"}, headers=rate_headers)
+
+    def contents(self, repo, path, repo_url, rate_headers):
+        def item(name, full_path, kind):
+            entry = {"name": name, "path": full_path, "type": kind, "url": f"{repo_url}/contents/{full_path}",
+                     "sha": repo.blob_sha(full_path) if kind == "file" else hashlib.sha1(full_path.encode()).hexdigest(),
+                     "size": len(repo.files[full_path]) if kind == "file" else 0}
+            return entry
+        if path in repo.files:
+            entry = item(path.rsplit("/", 1)[-1], path, "file")
+            entry.update({"encoding": "base64", "content": base64.b64encode(repo.files[path]).decode("ascii")})
+            return self.send_body(200, entry, headers=rate_headers)
+        if path not in repo.directories():
+            return self.send_body(404, {"message": "Not Found"}, headers=rate_headers)
+        listing = [item(*child) for child in repo.listing(path)]
+        etag = '"%s"' % hashlib.sha1(json.dumps(listing).encode()).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.server.count("not_modified")
+            return self.send_body(304, b"", headers=dict(rate_headers, ETag=etag))
+        return self.send_body(200, listing, headers=dict(rate_headers, ETag=etag))
+
+    def issue_json(self, issue, repo_url):
+        return {
+            "id": issue["number"], "number": issue["number"], "title": issue["title"], "state": issue["state"],
+            "body": issue["body"], "user": {"login": issue["user"]}, "labels": [{"name": name} for name in issue["labels"]],
+            "assignees": [], "milestone": None, "created_at": iso(issue["created_at"]), "updated_at": iso(issue["updated_at"]),
+            "closed_at": iso(issue["closed_at"]), "url": f"{repo_url}/issues/{issue['number']}",
+        }
+
+    def comment_json(self, comment, repo_url):
+        return {
+            "id": comment["id"], "body": comment["body"], "user": {"login": comment["user"]},
+            "created_at": iso(comment["created_at"]), "updated_at": iso(comment["created_at"]),
+            "issue_url": f"{repo_url}/issues/{comment['issue']}",
+        }
+
+    def paginate(self, items, query, url, rate_headers):
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        headers = dict(rate_headers)
+        if page * per_page < len(items):
+            next_query = {k: v[0] for k, v in query.items()}
+            next_query.update(page=page + 1, per_page=per_page)
+            headers["Link"] = f'<{url}?{urlencode(next_query)}>; rel="next"'
+        return self.send_body(200, items[(page - 1) * per_page:page * per_page], headers=headers)
+
+def fake_github(repo=None, latency=0.0, rate_limit=5000, port=0):
+    server = FakeServer(FakeGitHubHandler, port=port, latency=latency)
+    server.repo = repo or SyntheticRepo()
+    server.rate_limit = rate_limit
+    server.remaining = rate_limit
+    server.reset = time.time() + 3600
+    return server
+
+# Profile site
+
+class FakeProfileSiteHandler(QuietHandler):
+    """
+    An "Our People" index linking to every profile (each twice, as the real page does) and the profile pages.
+    """
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/our-people":
+            server.count("index")
+            links = "".join(f'<a href="/our-people/{slug}">{p["name"]}</a><a href="/our-people/{slug}/">More</a>'
+                            for slug, p in server.profiles.items())
+            return self.send_body(200, f"<html><body><nav><a href='/about'>About</a></nav>{links}</body></html>".encode(), "text/html")
+        slug = path.rsplit("/", 1)[-1]
+        profile = server.profiles.get(slug)
+        if profile is None:
+            server.count("not_found")
+            return self.send_body(404, b"", "text/html")
+        page = (
+            f"<html><head><script>var analytics = {{}};</script></head><body><div class='page'>"
+            f"<h1>{profile['name']}</h1><div class='c-title-6'>{profile['position']}</div>"
+            f"<div class='c-global-richtext w-richtext'><p>{profile['bio']}</p></div>"
+            f"<h3>Education</h3><ul>{''.join(f'<li>{school}</li>' for school in profile['education'])}</ul>"
+            f"</div></body></html>"
+        ).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(page).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            server.count("not_modified")
+            return self.send_body(304, b"", "text/html", {"ETag": etag})
+        server.count("profile")
+        return self.send_body(200, page, "text/html", {"ETag": etag})
+
+def fake_profile_site(profiles=20, latency=0.0, seed=0, port=0):
+    rng = random.Random(seed)
+    server = FakeServer(FakeProfileSiteHandler, port=port, latency=latency)
+    server.profiles = {}
+    for i in range(profiles):
+        name = f"{NAMES[i % len(NAMES)]} {i}"
+        server.profiles[f"person-{i}"] = {
+            "name": name, "position": rng.choice(POSITIONS),
+            "bio": " ".join(sentence(rng) for _ in range(4)),
+            "education": rng.sample(SCHOOLS, 2),
+        }
+    return server
+
+# Ollama
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """
+    Hashed bag-of-words vector, normalized: texts sharing words get similar embeddings.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+def fake_completion(prompt):
+    """
+    Answer LightRAG's prompts in the format it parses: entity extraction records, keyword JSON or plain text.
+    """
+    if "-Real Data-" in prompt and "Entity_types:" in prompt:
+        text = prompt.rsplit("Text:", 1)[-1].rsplit("Output:", 1)[0]
+        entities = list(dict.fromkeys(re.findall(r"\b[A-Z][a-z]{3,}(?:[A-Z][a-z]+)*\b", text)))[:12]
+        records = [f'("entity"<|>"{name.upper()}"<|>"concept"<|>"{name} appears in the benchmark corpus.")' for name in entities]
+        records += [f'("relationship"<|>"{a.upper()}"<|>"{b.upper()}"<|>"{a} is mentioned with {b}."<|>"co-occurrence"<|>5)'
+                    for a, b in zip(entities, entities[1:])]
+        return "##".join(records) + "<|COMPLETE|>"
+    if "MANY entities were missed" in prompt:
+        return "<|COMPLETE|>"
+    if "Answer YES | NO" in prompt:
+        return "no"
+    if "high_level_keywords" in prompt:
+        query = prompt.rsplit("Query:", 1)[-1]
+        words = list(dict.fromkeys(re.findall(r"[A-Za-z]{4,}", query)))
+        return json.dumps({"high_level_keywords": words[:3], "low_level_keywords": words[3:8] or words[:3]})
+    if "Description List:" in prompt:
+        return prompt.rsplit("Description List:", 1)[-1].split("#######", 1)[0].strip()[:500]
+    return f"Benchmark answer drawing on {len(prompt)} characters of context."
+
+class FakeOllamaHandler(QuietHandler):
+    """
+    /api/chat, /api/generate, /api/embeddings and /api/embed with per-request and per-token latency.
+    """
+    def do_POST(self):
+        server = self.server
+        path = urlsplit(self.path).path
+        body = self.read_json()
+        server.count(path)
+        model = body.get("model", "fake")
+        created = datetime.now(timezone.utc).isoformat()
+        if path in ("/api/chat", "/api/generate"):
+            prompt = body["messages"][-1]["content"] if path == "/api/chat" else body.get("prompt", "")
+            content = fake_completion(prompt)
+            time.sleep(server.latency + len(content.split()) / server.tokens_per_second)
+            if path == "/api/chat":
+                return self.send_body(200, {"model": model, "created_at": created, "message": {"role": "assistant", "content": content},
+                                            "done": True, "eval_count": len(content.split())})
+            return self.send_body(200, {"model": model, "created_at": created, "response": content, "done": True})
+        if path == "/api/embeddings":
+            time.sleep(server.embed_latency)
+            return self.send_body(200, {"embedding": fake_embedding(body.get("prompt", ""))})
+        if path == "/api/embed":
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            time.sleep(server.embed_latency * max(len(texts), 1) ** 0.5)  # Batches amortize the per-request cost
+            return self.send_body(200, {"model": model, "embeddings": [fake_embedding(text) for text in texts]})
+        return self.send_body(404, {"error": "not found"})
+
+def fake_ollama(latency=0.05, tokens_per_second=200.0, embed_latency=0.005, port=0):
+    server = FakeServer(FakeOllamaHandler, port=port)
+    server.latency = latency
+    server.tokens_per_second = tokens_per_second
+    server.embed_latency = embed_latency
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local GitHub, profile site and Ollama stand-ins.")
+    parser.add_argument("--github-port", type=int, default=9001)
+    parser.add_argument("--site-port", type=int, default=9002)
+    parser.add_argument("--ollama-port", type=int, default=9003)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--issues", type=int, default=20)
+    parser.add_argument("--profiles", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds added to every completion")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Simulated generation speed")
+    args = parser.parse_args()
+
+    servers = [
+        fake_github(SyntheticRepo(files=args.files, issues=args.issues), port=args.github_port).start(),
+        fake_profile_site(args.profiles, port=args.site_port).start(),
+        fake_ollama(args.llm_latency, args.tokens_per_second, port=args.ollama_port).start(),
+    ]
+    print(f"GITHUB_API_URL={servers[0].url}")
+    print(f"SCRAPE_BASE_URL={servers[1].url}/our-people")
+    print(f"OLLAMA_HOST={servers[2].url}")
+    print(f"Repository: {servers[0].repo.full_name}. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import threading
+
+# Default cache location and size cap (override with FETCH_CACHE_DIR / FETCH_CACHE_MAX_BYTES)
+DEFAULT_CACHE_DIR = os.getenv('FETCH_CACHE_DIR', os.path.expanduser('~/.cache/keystone_fetch'))
+DEFAULT_MAX_BYTES = int(os.getenv('FETCH_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+class FetchCache:
+    """
+    Persistent on-disk cache for fetch_github_data.
+
+    - blobs/: raw file contents keyed by Git blob SHA, so unchanged files are never downloaded twice
+    - listings/: directory listings with their ETag, replayed when GitHub answers 304 Not Modified
+    - issues/: one rendered file per issue plus an index with the updated_at high-water mark, per repository
+    - outputs.json: digest of the last document written per repository and output directory
+
+    Blobs and listings are evicted least-recently-used first once they exceed max_bytes; file
+    mtimes are refreshed on every hit and serve as the LRU clock.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.listing_dir = os.path.join(cache_dir, "listings")
+        self.issue_dir = os.path.join(cache_dir, "issues")
+        self.outputs_file = os.path.join(cache_dir, "outputs.json")
+        for directory in (self.blob_dir, self.listing_dir, self.issue_dir):
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    # Blobs
+
+    def _blob_path(self, sha):
+        return os.path.join(self.blob_dir, sha[:2], sha)
+
+    def has_blob(self, sha):
+        return os.path.exists(self._blob_path(sha))
+
+    def get_blob(self, sha):
+        path = self._blob_path(sha)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._touch(path)
+        return data
+
+    def put_blob(self, sha, data):
+        _write_atomic(self._blob_path(sha), data)
+
+    # Directory listings
+
+    def _listing_path(self, repo_name, path):
+        key = hashlib.sha1(f"{repo_name}:{path}".encode("utf-8")).hexdigest()
+        return os.path.join(self.listing_dir, f"{key}.json")
+
+    def get_listing(self, repo_name, path):
+        listing_path = self._listing_path(repo_name, path)
+        listing = _read_json(listing_path)
+        if listing is not None:
+            self._touch(listing_path)
+        return listing
+
+    def put_listing(self, repo_name, path, etag, items):
+        listing = {"etag": etag, "items": items}
+        _write_atomic(self._listing_path(repo_name, path), json.dumps(listing).encode("utf-8"))
+
+    # Issues
+
+    def _issues_dir(self, repo_name):
+        return os.path.join(self.issue_dir, repo_name.replace('/', '_'))
+
+    def _issue_path(self, repo_name, number):
+        return os.path.join(self._issues_dir(repo_name), f"{number}.md")
+
+    def get_issues(self, repo_name):
+        """
+        Return {"high_water_mark", "issues": {number: {"created_at", "updated_at"}}}, or None when
+        any rendered issue it lists is missing (the window is then fetched again in full).
+        """
+        state = _read_json(os.path.join(self._issues_dir(repo_name), "index.json"))
+        if state and all(os.path.exists(self._issue_path(repo_name, number)) for number in state["issues"]):
+            return state
+        return None
+
+    def get_issue_text(self, repo_name, number):
+        try:
+            with open(self._issue_path(repo_name, number), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put_issue_text(self, repo_name, number, text):
+        _write_atomic(self._issue_path(repo_name, number), text.encode("utf-8"))
+
+    def put_issues(self, repo_name, high_water_mark, issues):
+        """
+        Record the issue index after a complete listing and delete rendered issues no longer in it.
+        """
+        state = {"high_water_mark": high_water_mark, "issues": issues}
+        _write_atomic(os.path.join(self._issues_dir(repo_name), "index.json"), json.dumps(state).encode("utf-8"))
+        for name in os.listdir(self._issues_dir(repo_name)):
+            if name.endswith(".md") and name[:-3] not in issues:
+                os.remove(os.path.join(self._issues_dir(repo_name), name))
+
+    # Output digests
+
+    def _output_key(self, repo_name, output_dir):
+        # The same repository fetched into another directory is a separate document
+        return f"{repo_name}:{os.path.abspath(output_dir)}"
+
+    def get_output(self, repo_name, output_dir):
+        return (_read_json(self.outputs_file) or {}).get(self._output_key(repo_name, output_dir))
+
+    def put_output(self, repo_name, output_dir, path, digest):
+        with self.lock:
+            outputs = _read_json(self.outputs_file) or {}
+            outputs[self._output_key(repo_name, output_dir)] = {"path": path, "sha256": digest}
+            _write_atomic(self.outputs_file, json.dumps(outputs, indent=2).encode("utf-8"))
+
+    # Eviction
+
+    def evict(self):
+        """
+        Delete least-recently-used blobs and listings until the cache fits under max_bytes.
+        """
+        entries = []
+        for directory in (self.blob_dir, self.listing_dir):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
@@ -1,9 +1,22 @@
 import os
 from github import Github
+from github.ContentFile import ContentFile
 import base64
-import mimetypes
+import heapq
+import hashlib
+import tarfile
+import threading
+import time
+import urllib.parse
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from dotenv import load_dotenv
+from fetch_cache import FetchCache
+import instrumentation
+from content_classifier import classify_content, classify_size
 
 # Load environment variables explicitly from .env file
 dotenv_path = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/.env'
@@ -11,19 +24,26 @@ load_dotenv(dotenv_path=dotenv_path)
 
 # Load and verify GITHUB_TOKEN
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')  # Override to point at a local stand-in API
 
-if GITHUB_TOKEN:
-    print(f"Token loaded: {GITHUB_TOKEN[:4]}...{GITHUB_TOKEN[-4:]}")  # Print partial token for confirmation
-else:
-    print("Token not loaded correctly. Check .env file path and format.")
+def check_auth():
+    """
+    Print whether the token loaded and which user it authenticates as; returns False on failure.
+    """
+    if GITHUB_TOKEN:
+        print(f"Token loaded: {GITHUB_TOKEN[:4]}...{GITHUB_TOKEN[-4:]}")  # Print partial token for confirmation
+    else:
+        print("Token not loaded correctly. Check .env file path and format.")
 
-# Initialize GitHub client
-try:
-    g = Github(GITHUB_TOKEN)
-    user = g.get_user()  # Test the connection
-    print("Authenticated as:", user.login)
-except Exception as e:
-    print("Authentication failed:", e)
+    # Initialize GitHub client
+    try:
+        g = Github(GITHUB_TOKEN, base_url=GITHUB_API_URL)
+        user = g.get_user()  # Test the connection
+        print("Authenticated as:", user.login)
+        return True
+    except Exception as e:
+        print("Authentication failed:", e)
+        return False
 
 # Define patterns to exclude from processing
 EXCLUDE_PATTERNS = {
@@ -34,6 +54,157 @@ EXCLUDE_PATTERNS = {
     "dist", "build", "out", "node_modules", "ci", ".circleci", ".travis.yml", ".vscode", ".idea", "logs"
 }
 
+# Concurrency settings for the repository walk
+MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))  # Threads used for directory listings and blob fetches
+RATE_LIMIT_FLOOR = int(os.getenv("FETCH_RATE_LIMIT_FLOOR", "50"))  # Pause when fewer API calls than this remain
+PER_PAGE = 100  # Page size for paginated listings (GitHub's maximum)
+WRITE_BUFFER_SIZE = 1024 * 1024  # Output is flushed to disk in chunks of this size
+
+class FetchStats:
+    """
+    Thread-safe counters for API calls, fetched files and cache hits, used to report throughput.
+
+    Kept per repo_to_text call: fetch_scheduler.py shares one FetchCache across repositories.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.api_calls = 0
+        self.files = 0
+        self.blob_hits = 0
+        self.blob_misses = 0
+        self.listing_hits = 0
+        self.skipped = {}  # Classification reason -> [files, bytes]
+        self.started = time.monotonic()
+
+    def record_call(self, count=1):
+        with self.lock:
+            self.api_calls += count
+        instrumentation.count("http_requests", count, service="github")
+
+    def record_file(self):
+        with self.lock:
+            self.files += 1
+
+    def record_blob(self, hit):
+        with self.lock:
+            if hit:
+                self.blob_hits += 1
+            else:
+                self.blob_misses += 1
+
+    def record_listing_hit(self):
+        with self.lock:
+            self.listing_hits += 1
+
+    def record_skip(self, reason, size):
+        with self.lock:
+            counts = self.skipped.setdefault(reason, [0, 0])
+            counts[0] += 1
+            counts[1] += size or 0
+
+    def report(self, label="Fetch"):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        print(f"{label}: {self.files} files, {self.api_calls} API calls in {elapsed:.1f}s "
+              f"({self.files / elapsed:.1f} files/sec, {self.api_calls / elapsed:.1f} API calls/sec)")
+        for reason, (files, size) in sorted(self.skipped.items()):
+            print(f"  skipped {reason}: {files} files, {size / 1024:.0f} KB")
+
+    def report_cache(self):
+        lookups = self.blob_hits + self.blob_misses
+        hit_rate = self.blob_hits / lookups if lookups else 0.0
+        print(f"Fetch cache: {self.blob_hits}/{lookups} blobs from cache ({hit_rate:.0%}), "
+              f"{self.listing_hits} directory listings not modified")
+
+class RateLimiter:
+    """
+    Blocks callers while the GitHub rate limit is nearly exhausted.
+
+    PyGithub records the X-RateLimit-Remaining/Reset headers of every response on the
+    client, so checking them costs no extra request once the first call has been made.
+    """
+    def __init__(self, client, floor=RATE_LIMIT_FLOOR):
+        self.client = client
+        self.floor = floor
+        self.lock = threading.Lock()
+
+    def wait(self):
+        # Holding the lock while sleeping pauses every worker until the window resets
+        with self.lock:
+            remaining, _ = self.client.rate_limiting
+            if remaining >= self.floor:
+                return
+            delay = max(self.client.rate_limiting_resettime - time.time(), 0) + 1
+            print(f"Rate limit nearly exhausted ({remaining} calls left), sleeping {delay:.0f}s until reset")
+            time.sleep(delay)
+
+class RateBudget:
+    """
+    One view of the token's rate limit shared by every client and session in a process.
+
+    Repositories fetched concurrently draw on the same X-RateLimit-Remaining budget. Each
+    PyGithub client is attached and each raw session reports its response headers; within
+    one reset window the lowest remaining count seen is the current one. wait() has the same
+    contract as RateLimiter.wait, so it can stand in for it.
+    """
+    def __init__(self, floor=RATE_LIMIT_FLOOR):
+        self.floor = floor
+        self.lock = threading.Lock()
+        self.wait_lock = threading.Lock()
+        self.clients = []
+        self.remaining = None
+        self.reset = 0.0
+
+    def observe(self, remaining, reset):
+        with self.lock:
+            if reset > self.reset + 1:
+                # A newer window; counts from the previous one no longer apply
+                self.remaining, self.reset = remaining, reset
+            elif reset >= self.reset - 1:
+                self.remaining = remaining if self.remaining is None else min(self.remaining, remaining)
+
+    def observe_headers(self, response, *args, **kwargs):
+        # requests response hook
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            self.observe(int(remaining), float(reset))
+
+    def attach(self, client):
+        with self.lock:
+            self.clients.append(client)
+        return self
+
+    def attach_session(self, session):
+        session.hooks["response"].append(self.observe_headers)
+        return session
+
+    def refresh(self):
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            remaining, _ = client.rate_limiting
+            self.observe(remaining, float(client.rate_limiting_resettime))
+
+    def status(self):
+        """
+        Return (remaining, reset time); remaining is None until a response has been seen or after the window resets.
+        """
+        self.refresh()
+        with self.lock:
+            if self.remaining is not None and time.time() > self.reset:
+                self.remaining = None
+            return self.remaining, self.reset
+
+    def wait(self):
+        # Holding the lock while sleeping pauses every worker of every repository until the window resets
+        with self.wait_lock:
+            remaining, reset = self.status()
+            if remaining is None or remaining >= self.floor:
+                return
+            delay = max(reset - time.time(), 0) + 1
+            print(f"Rate limit nearly exhausted ({remaining} calls left), sleeping {delay:.0f}s until reset")
+            time.sleep(delay)
+
 def is_excluded(name):
     name_lower = name.lower()
     for pattern in EXCLUDE_PATTERNS:
@@ -42,161 +213,493 @@ def is_excluded(name):
             return True
     return False
 
-def is_binary_string(bytes_data):
-    text_characters = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
-    if not bytes_data:
-        return False
-    if b'\0' in bytes_data:
-        return True
-    nontext = bytes([b for b in bytes_data if b not in text_characters])
-    return bool(nontext)
+def is_excluded_path(path):
+    return any(is_excluded(part) for part in path.split("/"))
 
-def process_file_content(repo, file_content, path):
-    decoded_content = base64.b64decode(file_content.content)
-    if is_binary_string(decoded_content):
-        return ""
-    try:
-        decoded_content = decoded_content.decode('utf-8', errors='ignore')
-    except UnicodeDecodeError:
+def render_file_section(data, path, stats=None):
+    instrumentation.count("bytes_processed", len(data), stage="fetch")
+    reason = classify_content(data)
+    if reason:
+        if stats:
+            stats.record_skip(reason, len(data))
         return ""
+    decoded_content = data.decode('utf-8', errors='ignore')
     file_text = f"\n## {path}\n\n```\n{decoded_content}\n```\n"
     return file_text
 
-def process_repo_contents(repo, contents, base_path="", indent_level=0):
-    repo_text = ""
-    structure_text = ""
+@instrumentation.traced("fetch.list_directory")
+def list_directory(repo, path, limiter, stats, cache=None):
+    if limiter:
+        limiter.wait()
+    if cache is None:
+        contents = repo.get_contents(path)
+        stats.record_call()
+        return contents if isinstance(contents, list) else [contents]
+
+    # Conditional request: a 304 Not Modified replays the cached listing and does not count against the rate limit
+    cached = cache.get_listing(repo.full_name, path)
+    request_headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+    headers, data = repo._requester.requestJsonAndCheck(
+        "GET", f"{repo.url}/contents/{urllib.parse.quote(path)}", headers=request_headers
+    )
+    stats.record_call()
+    if data is None and cached:
+        stats.record_listing_hit()
+        items = cached["items"]
+    else:
+        items = data if isinstance(data, list) else [data]
+        cache.put_listing(repo.full_name, path, headers.get("etag"), items)
+    return [ContentFile(repo._requester, headers, item, completed=False) for item in items]
+
+def walk_repo_tree(repo, contents, executor, limiter, stats, cache=None):
+    """
+    List every non-excluded directory concurrently, returning a dict of directory path -> listing.
+    """
+    listings = {"": contents}
+    pending = {}
+    list_subdirectory = instrumentation.propagate(list_directory)
+
+    def submit_subdirectories(items):
+        for content_file in items:
+            if content_file.type == "dir" and not is_excluded(content_file.name):
+                future = executor.submit(list_subdirectory, repo, content_file.path, limiter, stats, cache)
+                pending[future] = content_file.path
+
+    submit_subdirectories(contents)
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            path = pending.pop(future)
+            try:
+                listings[path] = future.result()
+            except Exception as e:
+                print(f"Failed to get contents of directory {path}: {e}")
+                continue
+            submit_subdirectories(listings[path])
+    return listings
+
+def iter_tree_entries(listings, path="", base_path="", indent_level=0):
+    """
+    Yield (structure line, ContentFile, full path) in depth-first order; directories yield no ContentFile.
+    """
+    contents = listings.get(path, [])
     indent = "│   " * indent_level
     for i, content_file in enumerate(contents):
         if is_excluded(content_file.name):
             continue
         connector = "└── " if i == len(contents) - 1 else "├── "
         full_path = os.path.join(base_path, content_file.name)
-        
+
         if content_file.type == "dir":
-            structure_text += f"{indent}{connector}{content_file.name}/\n"
-            try:
-                sub_contents = repo.get_contents(content_file.path)
-            except Exception as e:
-                print(f"Failed to get contents of directory {content_file.path}: {e}")
-                continue
-            dir_text, dir_structure = process_repo_contents(repo, sub_contents, full_path, indent_level + 1)
-            repo_text += dir_text
-            structure_text += dir_structure
+            yield f"{indent}{connector}{content_file.name}/\n", None, full_path
+            yield from iter_tree_entries(listings, content_file.path, full_path, indent_level + 1)
         else:
-            structure_text += f"{indent}{connector}{content_file.name}\n"
-            mime_type, _ = mimetypes.guess_type(content_file.path)
-            if mime_type and mime_type.startswith("text"):
-                repo_text += process_file_content(repo, content_file, full_path)
-            else:
-                try:
-                    file_content = repo.get_contents(content_file.path)
-                    decoded_content = base64.b64decode(file_content.content)
-                    if not is_binary_string(decoded_content):
-                        repo_text += process_file_content(repo, file_content, full_path)
-                except Exception as e:
-                    print(f"Failed to process file {content_file.path}: {e}")
+            yield f"{indent}{connector}{content_file.name}\n", content_file, full_path
+
+def fetch_file_section(repo, content_file, path, limiter, stats, cache=None):
+    """
+    Fetch a file's blob once and render its section.
+
+    The ContentFile from the directory listing is reused: reading its content completes it
+    with a single request instead of calling repo.get_contents for the same path again.
+    Blobs already in the cache, or too large to keep, are not fetched at all.
+    """
+    reason = classify_size(content_file.size)
+    if reason:
+        stats.record_skip(reason, content_file.size)
+        return ""
+    if cache is not None:
+        data = cache.get_blob(content_file.sha)
+        stats.record_blob(data is not None)
+        if data is not None:
+            stats.record_file()
+            return render_file_section(data, path, stats)
+    try:
+        if limiter:
+            limiter.wait()
+        data = base64.b64decode(content_file.content)
+        stats.record_call()
+        if cache is not None:
+            cache.put_blob(content_file.sha, data)
+        file_text = render_file_section(data, path, stats)
+    except Exception as e:
+        print(f"Failed to process file {content_file.path}: {e}")
+        return ""
+    stats.record_file()
+    return file_text
+
+def write_structure(out, entries):
+    out.write("```\n")
+    for line, _, _ in entries:
+        out.write(line)
+    out.write("\n```\n")
+
+def iter_in_order(executor, func, items, window):
+    """
+    Yield func(*item) for each item in order, keeping at most `window` calls in flight.
+
+    Unlike executor.map, finished results never pile up beyond the window, so memory stays
+    bounded however many items there are.
+    """
+    pending = deque()
+    func = instrumentation.propagate(func)
+    for item in items:
+        pending.append(executor.submit(func, *item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+@instrumentation.traced("fetch.contents")
+def write_repo_contents(repo, contents, out, limiter=None, stats=None, max_workers=MAX_WORKERS, cache=None):
+    """
+    Walk the repository concurrently and stream the structure tree and file sections to `out`.
+
+    The first pass lists every directory, so the complete structure tree is written before
+    any blob is fetched; the second pass streams file sections in depth-first order as the
+    thread pool fetches them.
+    """
+    stats = stats or FetchStats()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        listings = walk_repo_tree(repo, contents, executor, limiter, stats, cache)
+        entries = list(iter_tree_entries(listings))
+        write_structure(out, entries)
+        files = [(content_file, full_path) for _, content_file, full_path in entries if content_file is not None]
+        fetch = lambda content_file, full_path: fetch_file_section(repo, content_file, full_path, limiter, stats, cache)
+        for section in iter_in_order(executor, fetch, files, max_workers * 4):
+            out.write(section)
+
+def github_api_session():
+    session = requests.Session()
+    session.headers["Accept"] = "application/vnd.github+json"
+    if GITHUB_TOKEN:
+        session.headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    return session
+
+def tree_listings(tree):
+    """
+    Group the entries of a recursive Git Trees response into per-directory listings for iter_tree_entries.
+    """
+    listings = {"": []}
+    for entry in tree:
+        parent, _, name = entry["path"].rpartition("/")
+        entry_type = "dir" if entry["type"] == "tree" else "file"
+        listings.setdefault(parent, []).append(
+            SimpleNamespace(name=name, path=entry["path"], type=entry_type, sha=entry["sha"], size=entry.get("size"))
+        )
+    return listings
+
+@instrumentation.traced("fetch.tree")
+def fetch_tree_entries(session, repo_name, stats):
+    """
+    Fetch the full file list with one recursive Git Trees call, as iter_tree_entries tuples.
+    """
+    response = session.get(f"{GITHUB_API_URL}/repos/{repo_name}/git/trees/HEAD", params={"recursive": "1"})
+    response.raise_for_status()
+    stats.record_call()
+    tree = response.json()
+    if tree.get("truncated"):
+        print(f"Warning: the Git Trees listing for {repo_name} was truncated; the structure may be incomplete")
+    return list(iter_tree_entries(tree_listings(tree["tree"])))
+
+@instrumentation.traced("fetch.archive")
+def write_repo_archive(session, repo_name, entries, out, stats=None, cache=None):
+    """
+    Stream the structure tree and the file sections of the repository tarball to `out`.
+
+    Nothing is unpacked to disk: members are read straight off the gzip stream, and excluded
+    or binary files are skipped as they go past. When every blob in the tree is already
+    cached, the tarball is not downloaded at all. If a cached blob is evicted while the
+    sections are written (fetch_scheduler.py runs repositories on one shared cache), the
+    remaining files are taken from the tarball.
+    """
+    stats = stats or FetchStats()
+    write_structure(out, entries)
+    wanted = {}
+    for _, content_file, full_path in entries:
+        if content_file is None:
+            continue
+        reason = classify_size(content_file.size)
+        if reason:
+            stats.record_skip(reason, content_file.size)
+            continue
+        wanted[full_path] = content_file.sha
+
+    written = set()
+    if cache is not None and all(cache.has_blob(sha) for sha in wanted.values()):
+        for path, sha in wanted.items():
+            data = cache.get_blob(sha)
+            if data is None:
+                break
+            out.write(render_file_section(data, path, stats))
+            stats.record_blob(True)
+            stats.record_file()
+            written.add(path)
+        else:
+            return
+
+    with session.get(f"{GITHUB_API_URL}/repos/{repo_name}/tarball", stream=True) as response:
+        response.raise_for_status()
+        stats.record_call()
+        with tarfile.open(fileobj=response.raw, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile():
                     continue
-    return repo_text, structure_text
+                path = member.name.split("/", 1)[-1]  # Strip the "<owner>-<repo>-<sha>/" prefix
+                # Sections already written from the cache came first: the tarball is in the same git order
+                if path not in wanted or path in written or is_excluded_path(path):
+                    continue
+                data = archive.extractfile(member).read()
+                if cache is not None:
+                    cache.put_blob(wanted[path], data)
+                    stats.record_blob(False)
+                out.write(render_file_section(data, path, stats))
+                stats.record_file()
 
-def fetch_recent_issues(repo):
+def render_issue(issue, comments):
     """
-    Fetch issues from the past 3 months with additional contextual information.
+    Render one issue, its PR links and its comments as markdown.
     """
-    issues_text = "\n## Recent Issues (Past 3 Months)\n\n"
-    since_date = datetime.now(timezone.utc) - timedelta(days=90)
+    issues_text = f"### Issue #{issue.number}: {issue.title}\n"
+    issues_text += f"- **Created at**: {issue.created_at}\n"
+    issues_text += f"- **State**: {issue.state}\n"
+    issues_text += f"- **User**: {issue.user.login}\n"
+    issues_text += f"- **Labels**: {[label.name for label in issue.labels]}\n"
+    
+    # Assignees
+    assignees = [assignee.login for assignee in issue.assignees]
+    issues_text += f"- **Assignees**: {assignees if assignees else 'None'}\n"
+    
+    # Milestone
+    issues_text += f"- **Milestone**: {issue.milestone.title if issue.milestone else 'None'}\n"
     
+    # Closed date
+    issues_text += f"- **Closed at**: {issue.closed_at if issue.closed_at else 'Still open'}\n"
+    
+    # Last Updated
+    issues_text += f"- **Last Updated**: {issue.updated_at}\n"
+
+    # Attempt to find potential PR links in the issue body or comments
+    issues_text += "- **Potential Pull Request Links**:\n"
+    
+    # Check in issue body
+    if issue.body:
+        pr_links = [line for line in issue.body.splitlines() if "pull" in line or "PR" in line]
+        for link in pr_links:
+            issues_text += f"  - {link}\n"
+    
+    # Check in comments for potential PR links
+    if comments:
+        issues_text += "- **Comments**:\n"
+        for comment in comments:
+            issues_text += f"  - {comment.user.login} ({comment.created_at}): {comment.body}\n"
+            comment_pr_links = [line for line in comment.body.splitlines() if "pull" in line or "PR" in line]
+            for link in comment_pr_links:
+                issues_text += f"    - Potential PR Link: {link}\n"
+
+    # Issue body
+    issues_text += f"- **Body**:\n{issue.body}\n\n"
+
+    return issues_text
+
+def pages(count):
+    return max(1, -(-count // PER_PAGE))
+
+def fetch_comments_by_issue(repo, since):
+    """
+    Fetch every issue comment updated since `since` with one repository-level listing, grouped by issue number.
+    """
+    comments_by_issue = {}
+    for comment in repo.get_issues_comments(sort="created", direction="asc", since=since):
+        number = int(comment.issue_url.rsplit("/", 1)[-1])
+        comments_by_issue.setdefault(number, []).append(comment)
+    return comments_by_issue
+
+@instrumentation.traced("fetch.issues")
+def write_recent_issues(repo, out, cache=None, stats=None):
+    """
+    Fetch issues from the past 3 months with additional contextual information and write them to `out`.
+
+    Comments come from a single repository-level listing instead of one get_comments()
+    call (plus totalCount) per issue. With a cache, only issues updated since the previous
+    run's high-water mark are requested; the rest are read back from the rendered copies
+    stored last time. Fresh and cached issues are merged newest first, and each is written
+    as soon as it is rendered or read, so only their timestamps are held in memory.
+    """
+    stats = stats or FetchStats()
+    out.write("\n## Recent Issues (Past 3 Months)\n\n")
+    since_date = datetime.now(timezone.utc) - timedelta(days=90)
+
+    # Cached issues still in the window: number -> created_at/updated_at
+    index = {}
+    high_water_mark = None
+    query_since = since_date
+    cached = cache.get_issues(repo.full_name) if cache is not None else None
+    if cached:
+        for number, entry in cached["issues"].items():
+            if datetime.fromisoformat(entry["created_at"]) >= since_date:
+                index[int(number)] = entry
+        high_water_mark = datetime.fromisoformat(cached["high_water_mark"])
+        query_since = max(since_date, high_water_mark)
+
+    issues = []
+    comments_by_issue = {}
     try:
-        issues = repo.get_issues(state='all', since=since_date)
-        for issue in issues:
+        # The listing also yields pull requests and issues created before the window, and every page is fetched
+        listed = 0
+        for issue in repo.get_issues(state='all', since=query_since):
+            listed += 1
+            if high_water_mark is None or issue.updated_at > high_water_mark:
+                high_water_mark = issue.updated_at
             if issue.created_at >= since_date:
-                issues_text += f"### Issue #{issue.number}: {issue.title}\n"
-                issues_text += f"- **Created at**: {issue.created_at}\n"
-                issues_text += f"- **State**: {issue.state}\n"
-                issues_text += f"- **User**: {issue.user.login}\n"
-                issues_text += f"- **Labels**: {[label.name for label in issue.labels]}\n"
-                
-                # Assignees
-                assignees = [assignee.login for assignee in issue.assignees]
-                issues_text += f"- **Assignees**: {assignees if assignees else 'None'}\n"
-                
-                # Milestone
-                issues_text += f"- **Milestone**: {issue.milestone.title if issue.milestone else 'None'}\n"
-                
-                # Closed date
-                issues_text += f"- **Closed at**: {issue.closed_at if issue.closed_at else 'Still open'}\n"
-                
-                # Last Updated
-                issues_text += f"- **Last Updated**: {issue.updated_at}\n"
-
-                # Attempt to find potential PR links in the issue body or comments
-                issues_text += "- **Potential Pull Request Links**:\n"
-                
-                # Check in issue body
-                if issue.body:
-                    pr_links = [line for line in issue.body.splitlines() if "pull" in line or "PR" in line]
-                    for link in pr_links:
-                        issues_text += f"  - {link}\n"
-                
-                # Check in comments for potential PR links
-                comments = issue.get_comments()
-                if comments.totalCount > 0:
-                    issues_text += "- **Comments**:\n"
-                    for comment in comments:
-                        issues_text += f"  - {comment.user.login} ({comment.created_at}): {comment.body}\n"
-                        comment_pr_links = [line for line in comment.body.splitlines() if "pull" in line or "PR" in line]
-                        for link in comment_pr_links:
-                            issues_text += f"    - Potential PR Link: {link}\n"
-
-                # Issue body
-                issues_text += f"- **Body**:\n{issue.body}\n\n"
+                issues.append(issue)
+        stats.record_call(pages(listed))
 
+        # Every comment on these issues was last updated after the oldest issue was created
+        if issues:
+            comments_by_issue = fetch_comments_by_issue(repo, min(issue.created_at for issue in issues))
+        comment_count = sum(len(comments) for comments in comments_by_issue.values())
+        # No comment listing is requested when there are no issues to render
+        comment_calls = pages(comment_count) if issues else 0
+        stats.record_call(comment_calls)
+        # Not measured: the per-issue path would have paid one totalCount request plus one request per 30-comment page
+        per_issue_calls = sum(1 + -(-len(comments_by_issue.get(issue.number, [])) // 30) for issue in issues)
+        print(f"Issue comments: {comment_count} comments for {len(issues)} issues in {comment_calls} API calls "
+              f"(per-issue get_comments would need an estimated {per_issue_calls})")
+        failed = False
     except Exception as e:
         print(f"Failed to fetch issues: {e}")
-        issues_text += "Failed to retrieve issues data.\n"
-    
-    return issues_text
+        issues, failed = [], True
+
+    # Newest first, matching the default ordering of the issues listing; a fresh copy replaces the cached one
+    fresh = sorted(((issue.created_at, issue.number, issue) for issue in issues), key=lambda item: item[0], reverse=True)
+    fresh_numbers = {issue.number for issue in issues}
+    replay = sorted(((datetime.fromisoformat(entry["created_at"]), number, None) for number, entry in index.items()
+                     if number not in fresh_numbers), key=lambda item: item[0], reverse=True)
+    try:
+        for _, number, issue in heapq.merge(fresh, replay, key=lambda item: item[0], reverse=True):
+            if issue is None:
+                out.write(cache.get_issue_text(repo.full_name, number) or "")
+                continue
+            issue_text = render_issue(issue, comments_by_issue.pop(number, []))
+            out.write(issue_text)
+            if cache is not None:
+                cache.put_issue_text(repo.full_name, number, issue_text)
+                index[number] = {"created_at": issue.created_at.isoformat(), "updated_at": issue.updated_at.isoformat()}
+    except Exception as e:
+        print(f"Failed to fetch issues: {e}")
+        failed = True
 
-def repo_to_text(github_url, output_dir):
+    # Only advance the high-water mark after a complete listing, so a failed run is retried in full
+    if cache is not None and not failed and high_water_mark is not None:
+        cache.put_issues(repo.full_name, high_water_mark.isoformat(), {str(n): e for n, e in index.items()})
+    if failed:
+        out.write("Failed to retrieve issues data.\n")
+
+class DigestWriter:
+    """
+    Encodes text to a binary file while tracking the SHA-256 of everything written.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.sha256.update(data)
+        self.f.write(data)
+
+@instrumentation.traced("fetch.repo")
+def repo_to_text(github_url, output_dir, mode="contents", cache=None, budget=None):
     """
     Convert a GitHub repository to a structured text file, including recent issues.
+
+    mode="contents" walks the Contents API file by file; mode="archive" builds the same
+    document from one Git Trees call plus the streamed repository tarball. With a FetchCache,
+    unchanged blobs, listings and issues are served from disk, and no new file is kept
+    when the document is identical to the previous run's.
+
+    Sections are streamed through a buffered writer as they are produced, so memory stays
+    flat regardless of repository size. The document is written to `<name>.partial` and
+    renamed once complete; after a crash the partial file holds everything fetched so far.
+
+    A shared RateBudget (see fetch_scheduler.py) replaces the per-repository rate limiter when
+    several repositories are fetched at once. Returns a summary dict with the status ("written",
+    "unchanged" or "failed"), the output path, API calls, files and seconds taken.
     """
-    g = Github(GITHUB_TOKEN)
+    g = Github(GITHUB_TOKEN, base_url=GITHUB_API_URL, per_page=PER_PAGE)
+    limiter = RateLimiter(g) if budget is None else budget.attach(g)
+    stats = FetchStats()
     repo_name = github_url.replace("https://github.com/", "").split('/tree/')[0]
-    
+    instrumentation.annotate(repo=repo_name, mode=mode)
+    result = lambda status, output=None: {
+        "repo": repo_name, "status": status, "output": output, "api_calls": stats.api_calls,
+        "files": stats.files, "seconds": round(time.monotonic() - stats.started, 2),
+    }
+
     try:
         repo = g.get_repo(repo_name)
     except Exception as e:
         print(f"Failed to access repository {repo_name}: {e}")
-        return
+        return result("failed")
 
+    session = github_api_session()
+    if budget is not None:
+        budget.attach_session(session)
     try:
-        contents = repo.get_contents("")
+        if mode == "archive":
+            entries = fetch_tree_entries(session, repo_name, stats)
+        else:
+            contents = list_directory(repo, "", limiter, stats, cache)
     except Exception as e:
         print(f"Failed to get contents of repository {repo_name}: {e}")
-        return
+        return result("failed")
 
     timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d_%H-%M-%S')
     safe_repo_name = repo_name.replace('/', '_')
     output_file = os.path.join(output_dir, f"{safe_repo_name}_{timestamp}.txt")
-
-    repo_text = f"# Repository: {repo_name}\n"
-    repo_text += "\n## Repository Structure\n\n"
-    contents_text, structure_text = process_repo_contents(repo, contents)
-    repo_text += f"```\n{structure_text}\n```\n"
-    repo_text += contents_text
-    
-    # Append recent issues to the text
-    repo_text += fetch_recent_issues(repo)
+    partial_file = f"{output_file}.partial"
 
     try:
-        with open(output_file, "w", encoding='utf-8') as f:
-            f.write(repo_text)
-        print(f"Repository contents and issues have been written to {output_file}")
+        with open(partial_file, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            out = DigestWriter(f)
+            out.write(f"# Repository: {repo_name}\n")
+            out.write("\n## Repository Structure\n\n")
+            if mode == "archive":
+                write_repo_archive(session, repo_name, entries, out, stats, cache)
+            else:
+                write_repo_contents(repo, contents, out, limiter, stats, cache=cache)
+            stats.report("Repository walk")
+
+            # Append recent issues to the text
+            write_recent_issues(repo, out, cache, stats)
+            stats.report("Repository and issues")
     except Exception as e:
-        print(f"Failed to write to file {output_file}: {e}")
+        print(f"Failed to write to file {partial_file}: {e}")
+        return result("failed")
+
+    digest = out.sha256.hexdigest()
+    if cache is not None:
+        stats.report_cache()
+        cache.evict()
+        previous = cache.get_output(repo_name, output_dir)
+        if previous and previous["sha256"] == digest and os.path.exists(previous["path"]):
+            os.remove(partial_file)
+            print(f"Repository unchanged since the last run; keeping {previous['path']}")
+            return result("unchanged", previous["path"])
+
+    os.replace(partial_file, output_file)
+    print(f"Repository contents and issues have been written to {output_file}")
+    if cache is not None:
+        cache.put_output(repo_name, output_dir, output_file, digest)
+    return result("written", output_file)
 
 # Example usage
 if __name__ == "__main__":
     github_url = "https://github.com/openai/swarm"  # Replace with the target GitHub repo URL
     output_dir = "/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/data"  # Set as directory path
-    repo_to_text(github_url, output_dir)
+    mode = os.getenv("FETCH_MODE", "contents")  # "contents" or "archive"
+    cache = FetchCache() if os.getenv("FETCH_CACHE", "1") != "0" else None  # Set FETCH_CACHE=0 to refetch everything
+    instrumentation.configure("fetch_github_data")  # INSTRUMENT=1 writes a span trace and metrics snapshot
+    check_auth()
+    repo_to_text(github_url, output_dir, mode=mode, cache=cache)
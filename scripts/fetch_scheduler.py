@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from fetch_cache import FetchCache
+from fetch_github_data import RATE_LIMIT_FLOOR, RateBudget, check_auth, repo_to_text
+import instrumentation
+
+# Set up file paths
+REPOS_FILE = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/repos.txt'  # One owner/name or GitHub URL per line
+OUTPUT_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/data'
+SCHEDULE_FILE = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/fetch_schedule.json'  # Per-repo history and the run checkpoint
+REPORT_FILE = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/fetch_report.json'
+
+FETCH_MAX_REPOS = int(os.getenv("FETCH_MAX_REPOS", "3"))  # Repositories fetched at once
+DEFAULT_REPO_COST = int(os.getenv("FETCH_DEFAULT_REPO_COST", "200"))  # API calls assumed for a repository never fetched before
+
+def read_repos(path):
+    """
+    Return owner/name for every non-empty, non-comment line of path, without duplicates.
+    """
+    repos = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                repos.append(repo_name(line))
+    return list(dict.fromkeys(repos))
+
+def repo_name(repo):
+    return repo.replace("https://github.com/", "").split("/tree/")[0].strip("/")
+
+class FetchSchedule:
+    """
+    Per-repository fetch history plus the checkpoint of the current run, kept in one JSON file.
+
+    A run is the set of repositories requested; each one is marked done or failed as soon as it
+    finishes, and the file is rewritten atomically, so an interrupted run resumes with only the
+    repositories not yet fetched. Once every repository of the run has been attempted, the next
+    invocation starts a new run.
+    """
+    def __init__(self, path=SCHEDULE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.state = {"repos": {}, "run": None}
+
+    def start_run(self, repos, fresh=False):
+        """
+        Return the repositories still to fetch, resuming the unfinished run for the same repositories.
+        """
+        run = self.state.get("run")
+        if fresh or not run or set(run["repos"]) != set(repos) or set(run["done"]) | set(run["failed"]) >= set(repos):
+            run = {"started": time.time(), "repos": repos, "done": [], "failed": []}
+            self.state["run"] = run
+            self.save()
+        elif run["done"]:
+            print(f"Resuming the run started {time.ctime(run['started'])}: {len(run['done'])} of {len(repos)} repositories already fetched")
+        return [repo for repo in repos if repo not in run["done"]]
+
+    def by_staleness(self, repos):
+        # Never-fetched repositories first, then the longest since their last successful fetch
+        return sorted(repos, key=lambda repo: self.state["repos"].get(repo, {}).get("last_success", 0))
+
+    def estimated_cost(self, repo):
+        return self.state["repos"].get(repo, {}).get("api_calls") or DEFAULT_REPO_COST
+
+    def record(self, result):
+        with self.lock:
+            entry = self.state["repos"].setdefault(result["repo"], {})
+            entry.update({
+                "last_attempt": time.time(),
+                "status": result["status"],
+                "seconds": result["seconds"],
+                "api_calls": result["api_calls"],
+                "files": result["files"],
+            })
+            if result["status"] != "failed":
+                entry["last_success"] = entry["last_attempt"]
+                entry["output"] = result["output"]
+                self.state["run"]["done"].append(result["repo"])
+            else:
+                self.state["run"]["failed"].append(result["repo"])
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+@instrumentation.traced("fetch.schedule")
+def schedule_fetches(repos, output_dir, schedule, budget, mode="contents", cache=None, max_repos=FETCH_MAX_REPOS, fresh=False):
+    """
+    Fetch repos concurrently, stalest first, within the shared rate budget; returns the per-repo results.
+
+    A repository only starts when the calls it used last time (DEFAULT_REPO_COST if unknown),
+    plus the estimates of those already running, fit above the budget's floor. If nothing is
+    running and the next repository still does not fit, the scheduler sleeps until the rate
+    limit window resets.
+    """
+    pending = schedule.by_staleness(schedule.start_run(repos, fresh))
+    results = []
+    running = {}
+    fetch = instrumentation.propagate(repo_to_text)
+    with ThreadPoolExecutor(max_workers=max(max_repos, 1)) as executor:
+        while pending or running:
+            while pending and len(running) < max_repos:
+                remaining, reset = budget.status()
+                reserved = sum(schedule.estimated_cost(repo) for repo in running.values())
+                cost = schedule.estimated_cost(pending[0])
+                if remaining is not None and remaining - reserved - cost < budget.floor and running:
+                    break
+                if remaining is not None and remaining - cost < budget.floor:
+                    delay = max(reset - time.time(), 0) + 1
+                    print(f"Rate budget too low for {pending[0]} ({remaining} calls left, needs ~{cost}); sleeping {delay:.0f}s until reset")
+                    time.sleep(delay)
+                    continue
+                repo = pending.pop(0)
+                print(f"Fetching {repo} (~{cost} API calls, {len(pending)} repositories waiting)")
+                running[executor.submit(fetch, f"https://github.com/{repo}", output_dir, mode, cache, budget)] = repo
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                repo = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Failed to fetch {repo}: {e}")
+                    result = {"repo": repo, "status": "failed", "output": None, "api_calls": 0, "files": 0, "seconds": 0}
+                schedule.record(result)
+                results.append(result)
+    return results
+
+def write_report(results, budget, path=REPORT_FILE, started=None):
+    remaining, reset = budget.status()
+    report = {
+        "started": started,
+        "finished": time.time(),
+        "rate_limit_remaining": remaining,
+        "rate_limit_reset": reset,
+        "repos": results,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'Repository':<40} {'Status':<10} {'Seconds':>8} {'API calls':>10} {'Files':>6}")
+    for result in results:
+        print(f"{result['repo']:<40} {result['status']:<10} {result['seconds']:>8.1f} {result['api_calls']:>10} {result['files']:>6}")
+    print(f"Total: {sum(r['api_calls'] for r in results)} API calls; {remaining if remaining is not None else 'unknown'} remaining. Report: {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch many GitHub repositories concurrently within the API rate limit.")
+    parser.add_argument("repos", nargs="*", help="owner/name or GitHub URLs (default: the repositories listed in --repos-file)")
+    parser.add_argument("--repos-file", default=REPOS_FILE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--schedule", default=SCHEDULE_FILE, help="History and checkpoint file")
+    parser.add_argument("--report", default=REPORT_FILE)
+    parser.add_argument("--max-repos", type=int, default=FETCH_MAX_REPOS)
+    parser.add_argument("--floor", type=int, default=RATE_LIMIT_FLOOR, help="API calls always left in reserve")
+    parser.add_argument("--fresh", action="store_true", help="Start a new run instead of resuming an interrupted one")
+    args = parser.parse_args()
+
+    repos = list(dict.fromkeys(repo_name(repo) for repo in args.repos)) or read_repos(args.repos_file)
+    mode = os.getenv("FETCH_MODE", "contents")  # "contents" or "archive"
+    cache = FetchCache() if os.getenv("FETCH_CACHE", "1") != "0" else None  # Set FETCH_CACHE=0 to refetch everything
+    instrumentation.configure("fetch_scheduler")  # INSTRUMENT=1 writes a span trace and metrics snapshot
+    check_auth()
+
+    started = time.time()
+    budget = RateBudget(args.floor)
+    results = schedule_fetches(repos, args.output_dir, FetchSchedule(args.schedule), budget, mode, cache, args.max_repos, args.fresh)
+    write_report(results, budget, args.report, started)
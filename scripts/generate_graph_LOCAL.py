@@ -1,8 +1,13 @@
 import os
+import argparse
 from datetime import datetime
 from lightrag import LightRAG, QueryParam
-from lightrag.llm import ollama_model_complete, ollama_embedding
-from lightrag.utils import EmbeddingFunc
+from lightrag.llm import ollama_model_complete
+from embedding_cache import cached_ollama_embedding
+from completion_cache import with_completion_cache
+from graph_ledger import load_documents
+import insert_driver
+import instrumentation
 from dotenv import load_dotenv
 import logging
 
@@ -15,61 +20,90 @@ load_dotenv('/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/.env')
 # Set up file paths
 BASE_WORKING_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/lightrag_data'
 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-WORKING_DIR = os.path.join(BASE_WORKING_DIR, f"graph_{timestamp}")
 MERGED_FILE_PATH = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/merged_output.txt'
+SHARDS_PATH = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/shards.jsonl'  # Written by shard_corpus.py
+DEDUP_SHARDS_PATH = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/shards_dedup.jsonl'  # Written by dedup_shards.py
 
-# Ensure working directory exists
-os.makedirs(WORKING_DIR, exist_ok=True)
-logging.info(f"Working directory created at: {WORKING_DIR}")
+parser = argparse.ArgumentParser(description="Build or incrementally update a LightRAG graph with a local Ollama model.")
+parser.add_argument("--working-dir", help="Existing graph directory to update in place (default: a new graph_<timestamp> directory)")
+parser.add_argument("--shards", default=SHARDS_PATH)
+parser.add_argument("--dedup-shards", default=DEDUP_SHARDS_PATH, help="Deduplicated shards, preferred when current (pass '' to ignore)")
+parser.add_argument("--merged", default=MERGED_FILE_PATH)
+parser.add_argument("--skip-query", action="store_true", help="Skip the sample query after building")
+insert_driver.add_arguments(parser, max_async=4)  # Sized for a single local Ollama server
+args = parser.parse_args()
+instrumentation.configure("generate_graph_LOCAL")  # INSTRUMENT=1 writes a span trace and metrics snapshot
+
+if args.working_dir:
+    WORKING_DIR = args.working_dir
+    if not os.path.isdir(WORKING_DIR):
+        logging.error(f"Error: The working directory {WORKING_DIR} does not exist.")
+        exit(1)
+    logging.info(f"Updating existing working directory: {WORKING_DIR}")
+else:
+    WORKING_DIR = os.path.join(BASE_WORKING_DIR, f"graph_{timestamp}")
+    # Ensure working directory exists
+    os.makedirs(WORKING_DIR, exist_ok=True)
+    logging.info(f"Working directory created at: {WORKING_DIR}")
+
+# Completions are cached across working directories (COMPLETION_CACHE_MODE: readwrite, readonly or off)
+llm_model_func, completion_cache = with_completion_cache(instrumentation.instrument_llm(ollama_model_complete), default_mode="readwrite")
+
+# Embeddings are served from the persistent cache in embedding_cache.py, falling back to Ollama
+embedding_func = cached_ollama_embedding(
+    embed_model="nomic-embed-text:latest",
+    host="http://localhost:11434",  # Specify Ollama embedding host
+    embedding_dim=768,
+    max_token_size=8192
+)
 
 # Initialize LightRAG with the working directory and Ollama model function
 rag = LightRAG(
     working_dir=WORKING_DIR,
-    llm_model_func=ollama_model_complete,  # Ollama model for text generation
+    llm_model_func=llm_model_func,  # Ollama model for text generation, behind the completion cache
     llm_model_name="llama3.1:8b-instruct-q8_0",  # Specify the local Ollama model name
-    llm_model_max_async=4,  # Maximum number of async requests
+    llm_model_max_async=args.max_async,  # Maximum number of async requests (--max-async / LLM_MAX_ASYNC)
     llm_model_max_token_size=60000,  # Maximum context size
     llm_model_kwargs={
         "host": "http://localhost:11434",  # Ollama server host
         "options": {"num_ctx": 60000}  # Context size configuration
     },
-    embedding_func=EmbeddingFunc(
-        embedding_dim=768,
-        max_token_size=8192,
-        func=lambda texts: ollama_embedding(
-            texts,
-            embed_model="nomic-embed-text:latest",
-            host="http://localhost:11434"  # Specify Ollama embedding host
-        )
-    )
+    embedding_func=instrumentation.instrument_embedding(embedding_func)
 )
 
 logging.info("LightRAG initialized with Ollama model.")
 
-# Read the merged file content
+# Read the sharded corpus, falling back to the whole merged file as a single document
 try:
-    with open(MERGED_FILE_PATH, 'r') as f:
-        merged_content = f.read()
-        logging.info("Merged content loaded successfully.")
+    with instrumentation.span("graph.load_documents"):
+        documents = load_documents(args.shards, args.merged, args.dedup_shards)
+    logging.info(f"Loaded {len(documents)} documents.")
 except FileNotFoundError:
-    logging.error(f"Error: The file {MERGED_FILE_PATH} was not found.")
+    logging.error(f"Error: Neither {args.shards} nor {args.merged} was found.")
     exit(1)
 
-# Insert the merged content into LightRAG to build the graph
+# Insert only new and changed documents into LightRAG, in checkpointed batches
 try:
-    rag.insert(merged_content)
+    skipped, added, replaced, removed = insert_driver.update_graph(rag, documents, args.batch_size, args.report_interval)
     logging.info("Content successfully inserted into LightRAG.")
 except Exception as e:
     logging.error(f"Error during insertion: {e}")
     exit(1)
+logging.info(f"Graph update: {skipped} skipped, {added} added, {replaced} replaced, {removed} removed.")
+embedding_func.func.cache.report()
+if completion_cache:
+    completion_cache.report()
 
 # Optionally, perform a sample query on the created graph to verify it works
+if args.skip_query:
+    exit(0)
 try:
     query_param = QueryParam(mode="global")
-    response = rag.query(
-        "Which Keystone employees would be best positioned to resolve the GitHub issues found?",
-        param=query_param
-    )
+    with instrumentation.span("graph.query", mode=query_param.mode):
+        response = rag.query(
+            "Which Keystone employees would be best positioned to resolve the GitHub issues found?",
+            param=query_param
+        )
     logging.info("Query response:")
     print(response)
 except Exception as e:
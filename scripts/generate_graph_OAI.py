@@ -1,7 +1,16 @@
 import os
+import argparse
+import logging
 from lightrag import LightRAG, QueryParam
-from lightrag.llm import gpt_4o_mini_complete
+from lightrag.llm import gpt_4o_mini_complete, openai_embedding
 from dotenv import load_dotenv
+from graph_ledger import load_documents
+import insert_driver
+from completion_cache import with_completion_cache
+import instrumentation
+
+# Progress from the insertion driver is reported through logging
+logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
 
 # Load environment variables (for OpenAI API key)
 load_dotenv('/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/.env')
@@ -9,31 +18,46 @@ load_dotenv('/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/.env')
 # Set up file paths
 WORKING_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/lightrag_data'
 MERGED_FILE_PATH = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/merged_output.txt'
+SHARDS_PATH = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/shards.jsonl'  # Written by shard_corpus.py
+DEDUP_SHARDS_PATH = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/shards_dedup.jsonl'  # Written by dedup_shards.py
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+parser = argparse.ArgumentParser(description="Build or update the LightRAG graph with OpenAI models.")
+insert_driver.add_arguments(parser, max_async=16)  # LightRAG's default
+args = parser.parse_args()
+instrumentation.configure("generate_graph_OAI")  # INSTRUMENT=1 writes a span trace and metrics snapshot
+
 # Ensure working directory exists
 if not os.path.exists(WORKING_DIR):
     os.makedirs(WORKING_DIR)
 
+# Completions are cached across working directories (COMPLETION_CACHE_MODE: readwrite, readonly or off)
+llm_model_func, completion_cache = with_completion_cache(instrumentation.instrument_llm(gpt_4o_mini_complete), default_mode="readwrite", model="gpt-4o-mini")
+
 # Initialize LightRAG with the working directory and model function
 rag = LightRAG(
     working_dir=WORKING_DIR,
-    llm_model_func=gpt_4o_mini_complete  # Using the gpt_4o_mini_complete model
+    llm_model_func=llm_model_func,  # Using the gpt_4o_mini_complete model, behind the completion cache
+    llm_model_max_async=args.max_async,  # Concurrent OpenAI requests (--max-async / LLM_MAX_ASYNC)
+    embedding_func=instrumentation.instrument_embedding(openai_embedding)  # LightRAG's default, timed when instrumented
 )
 
-# Read the merged file content
+# Read the sharded corpus, falling back to the whole merged file as a single document
 try:
-    with open(MERGED_FILE_PATH, 'r') as f:
-        merged_content = f.read()
-        print("Merged content loaded successfully.")
+    with instrumentation.span("graph.load_documents"):
+        documents = load_documents(SHARDS_PATH, MERGED_FILE_PATH, DEDUP_SHARDS_PATH)
+    print(f"Loaded {len(documents)} documents.")
 except FileNotFoundError:
     print(f"Error: The file {MERGED_FILE_PATH} was not found.")
     exit(1)
 
-# Insert the merged content into LightRAG to build the graph
+# Insert new and changed documents into LightRAG in checkpointed batches
 try:
-    rag.insert(merged_content)
+    skipped, added, replaced, removed = insert_driver.update_graph(rag, documents, args.batch_size, args.report_interval)
     print("Content successfully inserted into LightRAG.")
+    print(f"Graph update: {skipped} skipped, {added} added, {replaced} replaced, {removed} removed.")
+    if completion_cache:
+        completion_cache.report()
 except Exception as e:
     print(f"Error during insertion: {e}")
     exit(1)
@@ -41,7 +65,8 @@ except Exception as e:
 # Optionally, you can perform a sample query on the created graph to verify it works
 try:
     query_param = QueryParam(mode="global")
-    response = rag.query("Which Keystone employees would be best positioned to resolve the github issues found?", param=query_param)
+    with instrumentation.span("graph.query", mode=query_param.mode):
+        response = rag.query("Which Keystone employees would be best positioned to resolve the github issues found?", param=query_param)
     print("Query response:", response)
 except Exception as e:
     print(f"Error during querying: {e}")
@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import logging
+from lightrag.utils import compute_mdhash_id
+from lightrag.prompt import GRAPH_FIELD_SEP
+
+LEDGER_FILE_NAME = "doc_ledger.json"
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def document_id(text):
+    # Same ID LightRAG.ainsert assigns to the document
+    return compute_mdhash_id(text.strip(), prefix="doc-")
+
+def load_documents(shards_path, merged_path, dedup_path=None):
+    """
+    Return [(document key, text)]: one per shard when shard_corpus.py has run, else the whole merged file.
+
+    The deduplicated shards from dedup_shards.py are preferred when they are at least as new as shards_path.
+    """
+    if dedup_path and os.path.exists(dedup_path):
+        if not os.path.exists(shards_path) or os.path.getmtime(dedup_path) >= os.path.getmtime(shards_path):
+            shards_path = dedup_path
+        else:
+            logging.warning(f"{dedup_path} is older than {shards_path}; re-run dedup_shards.py. Using the full shards.")
+    if os.path.exists(shards_path):
+        logging.info(f"Reading shards from {shards_path}")
+        with open(shards_path, "r", encoding="utf-8") as f:
+            shards = [json.loads(line) for line in f if line.strip()]
+        return [(shard["id"], shard["text"]) for shard in shards]
+    with open(merged_path, "r", encoding="utf-8") as f:
+        return [("merged_output", f.read())]
+
+class DocumentLedger:
+    """
+    Content-hash ledger of the documents inserted into a LightRAG working directory.
+
+    Each entry maps a stable document key (a shard ID) to the hash of the text that was
+    inserted and the `doc-` ID LightRAG derived from it, so a rebuild can tell unchanged,
+    changed, new and removed documents apart without touching the LLM.
+    """
+    def __init__(self, working_dir):
+        self.path = os.path.join(working_dir, LEDGER_FILE_NAME)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def plan(self, documents):
+        """
+        Split [(key, text)] into (new, changed, unchanged) lists plus the keys no longer present.
+
+        Raises ValueError on a repeated key: only one of the texts could be recorded, so the
+        other would be reported as changed and re-extracted on every run.
+        """
+        seen, duplicates = set(), set()
+        for key, _ in documents:
+            (duplicates if key in seen else seen).add(key)
+        if duplicates:
+            raise ValueError(f"Duplicate document keys: {', '.join(sorted(duplicates))}")
+        new, changed, unchanged = [], [], []
+        for key, text in documents:
+            entry = self.entries.get(key)
+            if entry is None:
+                new.append((key, text))
+            elif entry["hash"] != content_hash(text):
+                changed.append((key, text))
+            else:
+                unchanged.append((key, text))
+        keys = {key for key, _ in documents}
+        removed = [key for key in self.entries if key not in keys]
+        return new, changed, unchanged, removed
+
+    def record(self, key, text):
+        self.entries[key] = {
+            "hash": content_hash(text),
+            "doc_id": document_id(text),
+        }
+
+    def forget(self, key):
+        return self.entries.pop(key, None)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+async def retire_document(rag, doc_id):
+    """
+    Remove a document's chunks from LightRAG and retire the entities and relations only it supported.
+
+    Entities and relations also extracted from other documents stay, with the retired chunk
+    IDs dropped from their source_id. This works on the storages these scripts use
+    (JsonKVStorage, NanoVectorDBStorage and NetworkXStorage), which expose no delete-by-document API.
+    Returns (chunks, entities, relations) removed.
+    """
+    chunk_ids = [chunk_id for chunk_id, chunk in rag.text_chunks._data.items() if chunk.get("full_doc_id") == doc_id]
+    retired = set(chunk_ids)
+    graph = rag.chunk_entity_relation_graph._graph
+
+    def drop_sources(data):
+        sources = data.get("source_id", "").split(GRAPH_FIELD_SEP)
+        remaining = [source for source in sources if source not in retired]
+        if len(remaining) != len(sources):
+            data["source_id"] = GRAPH_FIELD_SEP.join(remaining)
+        return bool(remaining)
+
+    stale_edges = [(src, tgt) for src, tgt, data in graph.edges(data=True) if not drop_sources(data)]
+    for src, tgt in stale_edges:
+        graph.remove_edge(src, tgt)
+    # Relationship vectors are keyed by src+tgt in extraction order; the graph is undirected
+    rel_ids = [compute_mdhash_id(a + b, prefix="rel-") for src, tgt in stale_edges for a, b in ((src, tgt), (tgt, src))]
+    if rel_ids:
+        rag.relationships_vdb._client.delete(rel_ids)
+
+    stale_nodes = [node_id for node_id, data in graph.nodes(data=True) if not drop_sources(data)]
+    for node_id in stale_nodes:
+        await rag.entities_vdb.delete_entity(node_id)
+        await rag.relationships_vdb.delete_relation(node_id)
+        await rag.chunk_entity_relation_graph.delete_node(node_id)
+
+    if chunk_ids:
+        rag.chunks_vdb._client.delete(chunk_ids)
+    for chunk_id in chunk_ids:
+        rag.text_chunks._data.pop(chunk_id, None)
+    rag.full_docs._data.pop(doc_id, None)
+    return len(chunk_ids), len(stale_nodes), len(stale_edges)
+
+async def retire_documents(rag, doc_ids):
+    """
+    Retire several documents and persist every storage once at the end.
+    """
+    totals = [0, 0, 0]
+    for doc_id in doc_ids:
+        for i, count in enumerate(await retire_document(rag, doc_id)):
+            totals[i] += count
+    if doc_ids:
+        await rag._insert_done()
+    return tuple(totals)
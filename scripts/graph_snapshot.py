@@ -0,0 +1,460 @@
+import os
+import sys
+import json
+import mmap
+import base64
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import resource
+import subprocess
+from dataclasses import dataclass
+import numpy as np
+import networkx as nx
+from lightrag import LightRAG
+from lightrag.base import BaseGraphStorage, BaseVectorStorage
+from lightrag.storage import JsonKVStorage
+from lightrag.utils import EmbeddingFunc
+from lightrag.prompt import GRAPH_FIELD_SEP
+
+SNAPSHOT_DIR_NAME = "snapshot"
+SNAPSHOT_VERSION = 1
+
+# What a snapshot is compiled from; any change to these files makes it stale
+KV_NAMESPACES = ("full_docs", "text_chunks")
+VDB_NAMESPACES = ("entities", "relationships", "chunks")
+GRAPH_NAMESPACE = "chunk_entity_relation"
+
+def source_files(working_dir):
+    names = [f"kv_store_{namespace}.json" for namespace in KV_NAMESPACES]
+    names += [f"vdb_{namespace}.json" for namespace in VDB_NAMESPACES]
+    names.append(f"graph_{GRAPH_NAMESPACE}.graphml")
+    return {name: os.path.join(working_dir, name) for name in names}
+
+def source_stamps(working_dir):
+    stamps = {}
+    for name, path in source_files(working_dir).items():
+        if os.path.exists(path):
+            st = os.stat(path)
+            stamps[name] = [st.st_size, st.st_mtime_ns]
+    return stamps
+
+def snapshot_dir(working_dir):
+    return os.path.join(working_dir, SNAPSHOT_DIR_NAME)
+
+def snapshot_is_current(working_dir):
+    try:
+        with open(os.path.join(snapshot_dir(working_dir), "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    return manifest.get("version") == SNAPSHOT_VERSION and manifest.get("sources") == source_stamps(working_dir)
+
+class RecordStore:
+    """
+    JSON records packed into one file with an offset index, read through mmap on demand.
+
+    <name>.bin holds the UTF-8 records back to back, <name>.offsets.npy their int64 boundaries
+    and <name>.keys.json the key of each record (when written with keys). Nothing is read until
+    the first lookup.
+    """
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        self._offsets = None
+        self._data = None
+        self._keys = None
+        self._index = None
+
+    @staticmethod
+    def write(directory, name, records, keys=None):
+        offsets = [0]
+        with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+            for record in records:
+                data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(os.path.join(directory, f"{name}.offsets.npy"), np.array(offsets, dtype=np.int64))
+        if keys is not None:
+            with open(os.path.join(directory, f"{name}.keys.json"), "w", encoding="utf-8") as f:
+                json.dump(keys, f, ensure_ascii=False)
+
+    def _open(self):
+        if self._offsets is not None:
+            return
+        self._offsets = np.load(os.path.join(self.directory, f"{self.name}.offsets.npy"), mmap_mode="r")
+        with open(os.path.join(self.directory, f"{self.name}.bin"), "rb") as f:
+            # mmap cannot map an empty file
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b""
+
+    def _open_keys(self):
+        if self._index is None:
+            with open(os.path.join(self.directory, f"{self.name}.keys.json"), "r", encoding="utf-8") as f:
+                self._keys = json.load(f)
+            self._index = {key: i for i, key in enumerate(self._keys)}
+
+    def __len__(self):
+        self._open()
+        return len(self._offsets) - 1
+
+    def keys(self):
+        self._open_keys()
+        return list(self._keys)
+
+    def position(self, key):
+        self._open_keys()
+        return self._index.get(key)
+
+    def key_at(self, i):
+        self._open_keys()
+        return self._keys[i]
+
+    def get_at(self, i):
+        self._open()
+        return json.loads(self._data[int(self._offsets[i]):int(self._offsets[i + 1])])
+
+    def get(self, key):
+        i = self.position(key)
+        return None if i is None else self.get_at(i)
+
+def compile_snapshot(working_dir):
+    """
+    Compile a finished graph directory into <working_dir>/snapshot.
+
+    - kv_<namespace>: chunk and document records with an offset index
+    - vdb_<namespace>.npy: normalized float32 embedding matrix, opened with mmap; vdb_<namespace>: row metadata
+    - graph: CSR adjacency (indptr/neighbors/edge ids), node degrees, node and edge attribute records
+    """
+    target = snapshot_dir(working_dir)
+    tmp = f"{target}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    stamps = source_stamps(working_dir)
+    files = source_files(working_dir)
+    manifest = {"version": SNAPSHOT_VERSION, "sources": stamps, "created": time.time(), "vectors": {}}
+
+    for namespace in KV_NAMESPACES:
+        path = files[f"kv_store_{namespace}.json"]
+        data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        RecordStore.write(tmp, f"kv_{namespace}", list(data.values()), keys=list(data.keys()))
+        manifest[f"kv_{namespace}"] = len(data)
+
+    for namespace in VDB_NAMESPACES:
+        path = files[f"vdb_{namespace}.json"]
+        with open(path, "r", encoding="utf-8") as f:
+            storage = json.load(f)
+        dim = storage["embedding_dim"]
+        matrix = np.frombuffer(base64.b64decode(storage["matrix"]), dtype=np.float32).reshape(-1, dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        np.save(os.path.join(tmp, f"vdb_{namespace}.npy"), matrix.astype(np.float32))
+        meta = [{k: v for k, v in row.items() if k != "__vector__"} for row in storage["data"]]
+        RecordStore.write(tmp, f"vdb_{namespace}", meta)
+        manifest["vectors"][namespace] = {"rows": len(meta), "embedding_dim": dim}
+
+    graph = nx.read_graphml(files[f"graph_{GRAPH_NAMESPACE}.graphml"])
+    nodes = list(graph.nodes())
+    node_index = {node: i for i, node in enumerate(nodes)}
+    edges = list(graph.edges())
+    edge_index = {}
+    for i, (src, tgt) in enumerate(edges):
+        edge_index[(src, tgt)] = i
+        edge_index[(tgt, src)] = i
+    indptr, neighbors, edge_ids = [0], [], []
+    for node in nodes:
+        # Neighbors sorted by index so has_edge/get_edge can binary search
+        adjacent = sorted(node_index[neighbor] for neighbor in graph.adj[node])
+        neighbors.extend(adjacent)
+        edge_ids.extend(edge_index[(node, nodes[j])] for j in adjacent)
+        indptr.append(len(neighbors))
+    np.save(os.path.join(tmp, "graph_indptr.npy"), np.array(indptr, dtype=np.int64))
+    np.save(os.path.join(tmp, "graph_neighbors.npy"), np.array(neighbors, dtype=np.int32))
+    np.save(os.path.join(tmp, "graph_edge_ids.npy"), np.array(edge_ids, dtype=np.int32))
+    np.save(os.path.join(tmp, "graph_degrees.npy"), np.array([graph.degree(node) for node in nodes], dtype=np.int32))
+    RecordStore.write(tmp, "graph_nodes", [graph.nodes[node] for node in nodes], keys=nodes)
+    RecordStore.write(tmp, "graph_edges", [graph.edges[edge] for edge in edges])
+    manifest["nodes"] = len(nodes)
+    manifest["edges"] = len(edges)
+
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return manifest
+
+class ReadOnlyStorageError(RuntimeError):
+    pass
+
+@dataclass
+class SnapshotKVStorage(JsonKVStorage):
+    """
+    Serves full_docs and text_chunks from the snapshot; other namespaces (the LLM response cache) stay JSON.
+    """
+    def __post_init__(self):
+        if self.namespace not in KV_NAMESPACES:
+            self._records = None
+            super().__post_init__()
+            return
+        self._records = RecordStore(snapshot_dir(self.global_config["working_dir"]), f"kv_{self.namespace}")
+
+    async def all_keys(self):
+        if self._records is None:
+            return await super().all_keys()
+        return self._records.keys()
+
+    async def get_by_id(self, id):
+        if self._records is None:
+            return await super().get_by_id(id)
+        return self._records.get(id)
+
+    async def get_by_ids(self, ids, fields=None):
+        if self._records is None:
+            return await super().get_by_ids(ids, fields)
+        records = [self._records.get(id) for id in ids]
+        if fields is None:
+            return records
+        return [{k: v for k, v in record.items() if k in fields} if record else None for record in records]
+
+    async def filter_keys(self, data):
+        if self._records is None:
+            return await super().filter_keys(data)
+        return set(key for key in data if self._records.position(key) is None)
+
+    async def upsert(self, data):
+        if self._records is None:
+            return await super().upsert(data)
+        raise ReadOnlyStorageError(f"{self.namespace} is served from a read-only snapshot")
+
+    async def index_done_callback(self):
+        if self._records is None:
+            await super().index_done_callback()
+
+    async def drop(self):
+        if self._records is None:
+            await super().drop()
+
+@dataclass
+class SnapshotVectorStorage(BaseVectorStorage):
+    cosine_better_than_threshold: float = 0.2
+
+    def __post_init__(self):
+        self._directory = snapshot_dir(self.global_config["working_dir"])
+        self._matrix = None
+        self._meta = RecordStore(self._directory, f"vdb_{self.namespace}")
+        self.cosine_better_than_threshold = self.global_config.get(
+            "cosine_better_than_threshold", self.cosine_better_than_threshold
+        )
+
+    async def query(self, query, top_k=5):
+        if self._matrix is None:
+            self._matrix = np.load(os.path.join(self._directory, f"vdb_{self.namespace}.npy"), mmap_mode="r")
+        if not len(self._matrix):
+            return []
+        embedding = np.asarray((await self.embedding_func([query]))[0], dtype=np.float32)
+        embedding /= np.linalg.norm(embedding) or 1.0
+        scores = self._matrix @ embedding
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        results = []
+        for i in best[np.argsort(-scores[best])]:
+            score = float(scores[i])
+            if score < self.cosine_better_than_threshold:
+                break
+            row = self._meta.get_at(int(i))
+            results.append({**row, "__metrics__": score, "id": row["__id__"], "distance": score})
+        return results
+
+    async def upsert(self, data):
+        raise ReadOnlyStorageError(f"vdb_{self.namespace} is served from a read-only snapshot")
+
+    async def index_done_callback(self):
+        pass
+
+@dataclass
+class SnapshotGraphStorage(BaseGraphStorage):
+    def __post_init__(self):
+        self._directory = snapshot_dir(self.global_config["working_dir"])
+        self._nodes = RecordStore(self._directory, "graph_nodes")
+        self._edges = RecordStore(self._directory, "graph_edges")
+        self._arrays = None
+
+    def _open(self):
+        if self._arrays is None:
+            self._arrays = {
+                name: np.load(os.path.join(self._directory, f"graph_{name}.npy"), mmap_mode="r")
+                for name in ("indptr", "neighbors", "edge_ids", "degrees")
+            }
+        return self._arrays
+
+    def _edge_id(self, source_node_id, target_node_id):
+        src, tgt = self._nodes.position(source_node_id), self._nodes.position(target_node_id)
+        if src is None or tgt is None:
+            return None
+        arrays = self._open()
+        start, end = int(arrays["indptr"][src]), int(arrays["indptr"][src + 1])
+        neighbors = arrays["neighbors"][start:end]
+        j = int(np.searchsorted(neighbors, tgt))
+        if j < len(neighbors) and neighbors[j] == tgt:
+            return int(arrays["edge_ids"][start + j])
+        return None
+
+    async def has_node(self, node_id):
+        return self._nodes.position(node_id) is not None
+
+    async def has_edge(self, source_node_id, target_node_id):
+        return self._edge_id(source_node_id, target_node_id) is not None
+
+    async def get_node(self, node_id):
+        return self._nodes.get(node_id)
+
+    async def node_degree(self, node_id):
+        i = self._nodes.position(node_id)
+        return 0 if i is None else int(self._open()["degrees"][i])
+
+    async def edge_degree(self, src_id, tgt_id):
+        return await self.node_degree(src_id) + await self.node_degree(tgt_id)
+
+    async def get_edge(self, source_node_id, target_node_id):
+        edge_id = self._edge_id(source_node_id, target_node_id)
+        return None if edge_id is None else self._edges.get_at(edge_id)
+
+    async def get_node_edges(self, source_node_id):
+        i = self._nodes.position(source_node_id)
+        if i is None:
+            return None
+        arrays = self._open()
+        neighbors = arrays["neighbors"][int(arrays["indptr"][i]):int(arrays["indptr"][i + 1])]
+        return [(source_node_id, self._nodes.key_at(int(j))) for j in neighbors]
+
+    async def upsert_node(self, node_id, node_data):
+        raise ReadOnlyStorageError("The graph is served from a read-only snapshot")
+
+    async def upsert_edge(self, source_node_id, target_node_id, edge_data):
+        raise ReadOnlyStorageError("The graph is served from a read-only snapshot")
+
+    async def delete_node(self, node_id):
+        raise ReadOnlyStorageError("The graph is served from a read-only snapshot")
+
+    async def index_done_callback(self):
+        pass
+
+@dataclass
+class SnapshotLightRAG(LightRAG):
+    """
+    LightRAG that also knows the snapshot graph storage, selected with kg="SnapshotGraphStorage".
+    """
+    def _get_storage_class(self):
+        return {**super()._get_storage_class(), "SnapshotGraphStorage": SnapshotGraphStorage}
+
+def snapshot_storage_kwargs(working_dir):
+    """
+    LightRAG keyword arguments that serve working_dir from its snapshot, or {} when it has none or it is stale.
+    """
+    if not snapshot_is_current(working_dir):
+        if os.path.exists(snapshot_dir(working_dir)):
+            logging.warning(f"Snapshot in {working_dir} is stale; loading the JSON stores. Re-run graph_snapshot.py.")
+        return {}
+    return {
+        "kg": "SnapshotGraphStorage",
+        "key_string_value_json_storage_cls": SnapshotKVStorage,
+        "vector_db_storage_cls": SnapshotVectorStorage,
+    }
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def probe(working_dir, use_snapshot, embedding_dim):
+    """
+    Load the graph, then run the storage lookups of a local query (no LLM); return timings and peak RSS.
+    """
+    rng = np.random.default_rng(0)
+
+    async def random_embedding(texts):
+        return rng.standard_normal((len(texts), embedding_dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    kwargs = snapshot_storage_kwargs(working_dir) if use_snapshot else {}
+    rag = SnapshotLightRAG(
+        working_dir=working_dir,
+        embedding_func=EmbeddingFunc(embedding_dim=embedding_dim, max_token_size=8192, func=random_embedding),
+        **kwargs
+    )
+    loaded = time.perf_counter()
+
+    async def first_lookup():
+        results = await rag.entities_vdb.query("probe", top_k=60)
+        for result in results:
+            node = await rag.chunk_entity_relation_graph.get_node(result["entity_name"])
+            await rag.chunk_entity_relation_graph.node_degree(result["entity_name"])
+            await rag.chunk_entity_relation_graph.get_node_edges(result["entity_name"])
+            if node:
+                for chunk_id in node.get("source_id", "").split(GRAPH_FIELD_SEP)[:3]:
+                    await rag.text_chunks.get_by_id(chunk_id)
+        return len(results)
+
+    hits = asyncio.run(first_lookup())
+    ready = time.perf_counter()
+    return {
+        "snapshot": bool(kwargs),
+        "load_seconds": loaded - start,
+        "first_lookup_seconds": ready - loaded,
+        "startup_seconds": ready - start,
+        "max_rss_mb": max_rss_mb(),
+        "entities_found": hits,
+    }
+
+def measure(working_dir):
+    """
+    Compile, then probe JSON loading and snapshot loading, each in a fresh process.
+
+    Linux carries a parent's peak RSS into its children, so the compile (which holds the whole
+    graph in memory) also runs in a child rather than in this process.
+    """
+    subprocess.run([sys.executable, os.path.abspath(__file__), working_dir], check=True)
+    with open(os.path.join(snapshot_dir(working_dir), "manifest.json"), "r", encoding="utf-8") as f:
+        embedding_dim = json.load(f)["vectors"]["entities"]["embedding_dim"]
+    results = {}
+    for label, flag in (("json", []), ("snapshot", ["--use-snapshot"])):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), working_dir, "--probe", "--embedding-dim", str(embedding_dim)] + flag,
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[label] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a LightRAG working directory into a memory-mapped snapshot.")
+    parser.add_argument("working_dir")
+    parser.add_argument("--measure", action="store_true", help="Compare startup time and peak RSS with and without the snapshot")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--use-snapshot", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--embedding-dim", type=int, default=768, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        logging.disable(logging.INFO)
+        print(json.dumps(probe(args.working_dir, args.use_snapshot, args.embedding_dim)))
+        sys.exit(0)
+
+    logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
+    if args.measure:
+        results = measure(args.working_dir)
+        for label, result in results.items():
+            print(f"{label:>8}: load {result['load_seconds']:.2f}s, first lookup {result['first_lookup_seconds']:.3f}s, "
+                  f"startup {result['startup_seconds']:.2f}s, peak RSS {result['max_rss_mb']:.0f} MB")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    manifest = compile_snapshot(args.working_dir)
+    vectors = ", ".join(f"{namespace}={info['rows']}" for namespace, info in manifest["vectors"].items())
+    logging.info(
+        f"Compiled snapshot in {time.perf_counter() - start:.1f}s: {manifest['nodes']} nodes, {manifest['edges']} edges, "
+        f"{manifest['kv_text_chunks']} chunks, vectors {vectors}"
+    )
@@ -0,0 +1,154 @@
+import os
+import time
+import asyncio
+import logging
+from functools import wraps
+from lightrag.lightrag import always_get_an_event_loop
+from lightrag.utils import encode_string_by_tiktoken
+from graph_ledger import DocumentLedger, document_id, retire_documents
+from completion_cache import served_from_cache
+import instrumentation
+
+# Defaults for the shared CLI options (override with INSERT_BATCH_SIZE / INSERT_REPORT_INTERVAL)
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", "8"))  # Documents per ainsert call; each batch is checkpointed
+INSERT_REPORT_INTERVAL = float(os.getenv("INSERT_REPORT_INTERVAL", "30"))  # Seconds between progress lines
+
+def add_arguments(parser, max_async):
+    """
+    Add the shared insertion options; max_async is the script's default for concurrent LLM requests.
+    """
+    parser.add_argument("--batch-size", type=int, default=INSERT_BATCH_SIZE,
+                        help="Documents per insertion batch (env INSERT_BATCH_SIZE)")
+    parser.add_argument("--max-async", type=int, default=int(os.getenv("LLM_MAX_ASYNC", str(max_async))),
+                        help="Concurrent LLM requests (env LLM_MAX_ASYNC)")
+    parser.add_argument("--report-interval", type=float, default=INSERT_REPORT_INTERVAL,
+                        help="Seconds between progress reports (env INSERT_REPORT_INTERVAL)")
+
+class InsertMetrics:
+    """
+    Throughput counters for one insertion run: documents, LLM calls and LLM tokens (prompt + completion).
+
+    Completions served by the completion cache are counted separately and add no tokens.
+    """
+    def __init__(self, total_docs, total_chars):
+        self.total_docs = total_docs
+        self.total_chars = total_chars
+        self.docs = 0
+        self.chars = 0
+        self.llm_calls = 0
+        self.cache_hits = 0
+        self.tokens = 0
+        self.start = time.monotonic()
+
+    def record_batch(self, texts):
+        self.docs += len(texts)
+        self.chars += sum(len(text) for text in texts)
+
+    def record_llm_call(self, prompt, system_prompt, history_messages, response, cached=False):
+        if cached:
+            self.cache_hits += 1
+            return
+        self.llm_calls += 1
+        text = "".join([system_prompt or "", prompt, response or ""] + [m.get("content", "") for m in history_messages or []])
+        self.tokens += len(encode_string_by_tiktoken(text))
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        # ETA by characters rather than documents, since shards vary in size
+        chars_per_sec = self.chars / elapsed
+        eta = (self.total_chars - self.chars) / chars_per_sec if chars_per_sec else float("inf")
+        eta_text = f"{eta / 60:.1f} min" if eta != float("inf") else "unknown"
+        logging.info(
+            f"Inserted {self.docs}/{self.total_docs} docs in {elapsed / 60:.1f} min: "
+            f"{self.docs / elapsed * 60:.2f} docs/min, {self.llm_calls / elapsed:.2f} LLM calls/sec "
+            f"({self.cache_hits} completions from cache), {self.tokens / elapsed:.0f} tokens/sec, ETA {eta_text}"
+        )
+
+def instrument_llm(rag, metrics):
+    """
+    Wrap the rag's (already rate-limited) LLM function so every completion is counted.
+
+    The wrapper sits outside any completion cache, so it asks the cache whether each call was a hit.
+    """
+    llm_model_func = rag.llm_model_func
+
+    @wraps(llm_model_func)
+    async def counted(prompt, system_prompt=None, history_messages=[], **kwargs):
+        # The limiter and cache run in this task, so the flag the cache sets is visible here afterwards
+        served_from_cache.set(False)
+        response = await llm_model_func(prompt, system_prompt=system_prompt, history_messages=history_messages, **kwargs)
+        metrics.record_llm_call(prompt, system_prompt, history_messages, response, cached=served_from_cache.get())
+        return response
+
+    rag.llm_model_func = counted
+    return llm_model_func
+
+async def insert_batches(rag, ledger, pending, batch_size, report_interval):
+    """
+    Insert [(key, text)] through rag.ainsert in batches, recording each finished batch in the ledger.
+
+    The ledger is saved after every batch, so a crashed run resumes from the first unfinished
+    batch: documents already recorded are skipped as unchanged on the next run. Documents
+    LightRAG did not store are left out of the ledger and retried on the next run.
+    """
+    metrics = InsertMetrics(len(pending), sum(len(text) for _, text in pending))
+    original_llm = instrument_llm(rag, metrics)
+
+    async def report_periodically():
+        while True:
+            await asyncio.sleep(report_interval)
+            metrics.report()
+
+    reporter = asyncio.ensure_future(report_periodically())
+    try:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            with instrumentation.span("insert.batch", documents=len(batch), chars=sum(len(text) for _, text in batch)):
+                await rag.ainsert([text for _, text in batch])
+            # LightRAG 1.0.0 returns without storing the batch when extraction finds no entities or relations
+            missing = await rag.full_docs.filter_keys([document_id(text) for _, text in batch])
+            for key, text in batch:
+                if document_id(text) not in missing:
+                    ledger.record(key, text)
+            if missing:
+                logging.warning(f"{len(missing)} of {len(batch)} documents were not stored by LightRAG and stay pending: "
+                                f"{', '.join(key for key, text in batch if document_id(text) in missing)}")
+            ledger.save()
+            metrics.record_batch([text for _, text in batch])
+            metrics.report()
+    finally:
+        reporter.cancel()
+        rag.llm_model_func = original_llm
+    return metrics
+
+@instrumentation.traced("insert")
+async def aupdate_graph(rag, documents, batch_size=INSERT_BATCH_SIZE, report_interval=INSERT_REPORT_INTERVAL):
+    """
+    Bring rag's working directory in line with [(key, text)] documents.
+
+    Unchanged documents are skipped, changed and removed ones are retired, and new and changed
+    ones are inserted in checkpointed batches. Returns (skipped, added, replaced, removed).
+    """
+    ledger = DocumentLedger(rag.working_dir)
+    new, changed, unchanged, removed = ledger.plan(documents)
+    logging.info(f"Documents: {len(unchanged)} unchanged, {len(new)} new, {len(changed)} changed, {len(removed)} removed.")
+
+    # Retire the chunks, entities and relations of changed and removed documents before re-inserting
+    stale_doc_ids = [ledger.entries[key]["doc_id"] for key, _ in changed] + [ledger.entries[key]["doc_id"] for key in removed]
+    if stale_doc_ids:
+        with instrumentation.span("insert.retire", documents=len(stale_doc_ids)):
+            chunks, entities, relations = await retire_documents(rag, stale_doc_ids)
+        logging.info(f"Retired {chunks} chunks, {entities} entities and {relations} relations.")
+    for key in removed:
+        ledger.forget(key)
+    ledger.save()
+
+    pending = new + changed
+    if pending:
+        await insert_batches(rag, ledger, pending, batch_size, report_interval)
+    return len(unchanged), len(new), len(changed), len(removed)
+
+def update_graph(rag, documents, batch_size=INSERT_BATCH_SIZE, report_interval=INSERT_REPORT_INTERVAL):
+    # Same loop LightRAG's own sync wrappers use, so rag.query can run afterwards
+    loop = always_get_an_event_loop()
+    return loop.run_until_complete(aupdate_graph(rag, documents, batch_size, report_interval))
@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import time
+import atexit
+import asyncio
+import logging
+import itertools
+import threading
+import contextvars
+import dataclasses
+from functools import wraps
+from datetime import datetime
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then left out
+    resource = None
+
+# Set up file paths
+TRACE_DIR = os.getenv("INSTRUMENT_TRACE_DIR", '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/traces')  # <script>_<timestamp>.jsonl and .prom
+
+INSTRUMENT = os.getenv("INSTRUMENT", "0") == "1"  # Set INSTRUMENT=1 to record spans and counters
+METRIC_PREFIX = "keystone_"
+
+_current = contextvars.ContextVar("instrumentation_span", default=None)
+_ids = itertools.count(1)
+_recorder = None
+_encoding = None
+
+def peak_rss():
+    """
+    Return the process's peak resident set size in bytes, or None where it cannot be read.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class Span:
+    """
+    One timed region. Counters recorded inside it are added to it and, when it ends, to its parent.
+    """
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self.counts = {}
+        self.id = next(_ids)
+        self.parent = None
+        self.finished = False
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self.token = _current.set(self)
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.rss_start = peak_rss()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.recorder.finish(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, name, value=1):
+        with self.recorder.lock:
+            # Work started inside a span can outlive it (e.g. a shared batching task); credit the nearest open ancestor
+            target = self
+            while target.finished and target.parent is not None:
+                target = target.parent
+            target.counts[name] = target.counts.get(name, 0) + value
+
+class NoopSpan:
+    """
+    Stands in for Span while instrumentation is off, so instrumented code costs one function call.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, name, value=1):
+        pass
+
+NOOP_SPAN = NoopSpan()
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+class Recorder:
+    """
+    Writes each finished span as a line of the JSONL trace and keeps the totals for the Prometheus snapshot.
+
+    Trace records carry the span's parent ID, so the nesting can be rebuilt; counters are also kept
+    process-wide per label set. The snapshot is rewritten on close, which runs at exit.
+    """
+    def __init__(self, script, trace_path, metrics_path):
+        self.script = script
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, ((label, value), ...)) -> total
+        self.spans = {}  # span name -> [count, seconds, peak RSS]
+        self.started = time.time()
+        os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+        self.trace = open(trace_path, "a", encoding="utf-8", buffering=1)  # Line-buffered: a crash keeps the spans so far
+        self.closed = False
+
+    def count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def finish(self, span):
+        rss = peak_rss()
+        with self.lock:
+            # Built under the lock: worker threads may still be adding to this span's counts
+            record = {
+                "type": "span", "script": self.script, "name": span.name, "id": span.id,
+                "parent": span.parent.id if span.parent else None, "thread": threading.current_thread().name,
+                "start": round(span.started, 6), "seconds": round(span.seconds, 6), "attrs": span.attrs,
+                "counts": span.counts, "peak_rss": rss,
+                "rss_growth": rss - span.rss_start if rss is not None else None,
+            }
+            line = json.dumps(record, default=str) + "\n"
+            span.finished = True
+            totals = self.spans.setdefault(span.name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += span.seconds
+            totals[2] = max(totals[2], rss or 0)
+            if span.parent is not None:
+                for name, value in span.counts.items():
+                    span.parent.counts[name] = span.parent.counts.get(name, 0) + value
+            if not self.closed:
+                self.trace.write(line)
+
+    def metrics_text(self):
+        """
+        Render the span totals and counters in the Prometheus text exposition format.
+        """
+        script = ("script", self.script)
+        lines = []
+        with self.lock:
+            spans = sorted(self.spans.items())
+            counters = sorted(self.counters.items())
+        for metric, kind, help_text, index in (
+            ("span_seconds_total", "counter", "Wall-clock seconds spent in each span.", 1),
+            ("spans_total", "counter", "Spans finished.", 0),
+            ("span_peak_rss_bytes", "gauge", "Process peak RSS at the end of the spans of this name.", 2),
+        ):
+            lines.append(f"# HELP {METRIC_PREFIX}{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{metric} {kind}")
+            for name, totals in spans:
+                lines.append(f"{METRIC_PREFIX}{metric}{format_labels([script, ('span', name)])} {format_value(totals[index])}")
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {METRIC_PREFIX}{name}_total counter")
+            for (counter, labels), value in counters:
+                if counter == name:
+                    lines.append(f"{METRIC_PREFIX}{name}_total{format_labels((script,) + labels)} {format_value(value)}")
+        rss = peak_rss()
+        if rss is not None:
+            lines.append(f"# TYPE {METRIC_PREFIX}peak_rss_bytes gauge")
+            lines.append(f"{METRIC_PREFIX}peak_rss_bytes{format_labels([script])} {rss}")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self):
+        tmp_path = f"{self.metrics_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.metrics_text())
+        os.replace(tmp_path, self.metrics_path)
+
+    def close(self):
+        if self.closed:
+            return
+        counters = {}
+        for (name, labels), value in self.counters.items():
+            counters[name + format_labels(labels)] = value
+        summary = {"type": "summary", "script": self.script, "seconds": round(time.time() - self.started, 3),
+                   "counters": counters, "peak_rss": peak_rss()}
+        with self.lock:
+            self.trace.write(json.dumps(summary) + "\n")
+            self.closed = True
+            self.trace.close()
+        self.write_metrics()
+        logging.info(f"Instrumentation: trace written to {self.trace_path}, metrics to {self.metrics_path}")
+
+def configure(script, enabled=None, trace_dir=TRACE_DIR):
+    """
+    Turn instrumentation on for this process if INSTRUMENT=1 (or enabled); returns the Recorder or None.
+
+    Called once by each entry point before it builds clients or models, since instrument_llm and
+    instrument_embedding only wrap functions while instrumentation is on. Repeated calls (e.g.
+    Streamlit re-running its script) return the existing recorder.
+    """
+    global _recorder
+    if _recorder is not None:
+        return _recorder
+    if not (INSTRUMENT if enabled is None else enabled):
+        return None
+    stem = os.path.join(trace_dir, f"{script}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+    _recorder = Recorder(script, f"{stem}.jsonl", f"{stem}.prom")
+    atexit.register(_recorder.close)
+    return _recorder
+
+def enabled():
+    return _recorder is not None
+
+def span(name, **attrs):
+    """
+    Context manager timing a region; nested spans (including in asyncio tasks) record their parent.
+    """
+    if _recorder is None:
+        return NOOP_SPAN
+    return Span(_recorder, name, attrs)
+
+def annotate(**attrs):
+    """
+    Attach attributes to the innermost open span.
+    """
+    if _recorder is None:
+        return
+    current = _current.get()
+    if current is not None:
+        current.set(**attrs)
+
+def count(name, value=1, **labels):
+    """
+    Add value to the process-wide counter name{labels} and to the innermost open span.
+    """
+    if _recorder is None:
+        return
+    _recorder.count(name, value, labels)
+    current = _current.get()
+    if current is not None:
+        current.add(name, value)
+
+def traced(name):
+    """
+    Decorator running each call of a function or coroutine function inside span(name).
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _recorder is None:
+                    return await func(*args, **kwargs)
+                with Span(_recorder, name, {}):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with Span(_recorder, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def propagate(func):
+    """
+    Bind func to the current context so spans it opens in a worker thread nest under the caller's span.
+    """
+    if _recorder is None:
+        return func
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+def count_tokens(text):
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode_ordinary(text))
+
+def instrument_llm(llm_model_func):
+    """
+    Wrap a LightRAG completion function so each call is a span counting calls and prompt/completion tokens.
+
+    Wrap the function that reaches the model (inside any completion cache), so cache hits are not counted as LLM calls.
+    """
+    if _recorder is None:
+        return llm_model_func
+
+    @wraps(llm_model_func)
+    async def instrumented(prompt, system_prompt=None, history_messages=[], **kwargs):
+        with span("llm.complete"):
+            response = await llm_model_func(prompt, system_prompt=system_prompt, history_messages=history_messages, **kwargs)
+            prompt_text = "".join([system_prompt or "", prompt] + [message["content"] for message in history_messages])
+            prompt_tokens, completion_tokens = count_tokens(prompt_text), count_tokens(response or "")
+            count("llm_calls")
+            count("prompt_tokens", prompt_tokens)
+            count("completion_tokens", completion_tokens)
+        return response
+
+    return instrumented
+
+def instrument_embedding(embedding_func):
+    """
+    Return a copy of a LightRAG EmbeddingFunc whose calls are spans counting calls and texts embedded.
+    """
+    if _recorder is None:
+        return embedding_func
+    func = embedding_func.func
+
+    async def instrumented(texts):
+        with span("embed", texts=len(texts)):
+            result = await func(texts)
+            count("embed_calls")
+            count("embed_texts", len(texts))
+            count("bytes_processed", sum(len(text) for text in texts), stage="embed")
+        return result
+
+    return dataclasses.replace(embedding_func, func=instrumented)
+
+def metrics_text():
+    return _recorder.metrics_text() if _recorder is not None else None
@@ -0,0 +1,170 @@
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+import numpy as np
+from embedding_cache import cached_ollama_embedding
+from shard_corpus import repo_units
+
+# Set up file paths
+DATA_FOLDER = Path("/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/data")
+PEOPLE_RECORDS = DATA_FOLDER / "our_people.jsonl"  # Written by scrape_website.py; preferred over the CSV
+PEOPLE_FILE = DATA_FOLDER / "our_people.txt"
+MATCHES_PATH = Path("/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/issue_matches.json")
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+EMBED_MODEL = "nomic-embed-text:latest"
+TOP_K = 5
+SNIPPET_CHARS = 1500  # Issue text kept with each match so the shortlist can be explained without the graph
+
+# nomic-embed-text expects these task prefixes for asymmetric search
+ISSUE_PREFIX = "search_query: "
+PROFILE_PREFIX = "search_document: "
+
+def load_issues(data_folder):
+    """
+    Return one dict per issue in the fetched repository files: repo, number, title and text.
+
+    An issue found in several snapshots of a repository is taken from the newest one (snapshot
+    file names end in the fetch timestamp, so they sort oldest first).
+    """
+    issues = {}
+    for path in sorted(data_folder.glob("*.txt")):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        if not lines[0].startswith("# Repository: "):
+            continue
+        repo = lines[0][len("# Repository: "):].strip()
+        for unit in repo_units(lines):
+            if unit["kind"] != "issue":
+                continue
+            header = unit["text"].split("\n", 1)[0]
+            number = int(unit["key"].split("-", 1)[1])
+            issues[(repo, number)] = {
+                "repo": repo,
+                "number": number,
+                "title": header.split(": ", 1)[1] if ": " in header else header,
+                "text": unit["text"],
+            }
+    return list(issues.values())
+
+def load_people(people_file):
+    """
+    Return one dict per profile: name, position and the text embedded for matching.
+
+    Reads scrape_website.py's JSONL records, or a CSV file as name and position followed by the
+    rest of the row. The rest is kept whole because older CSV files are not quoted, so commas
+    inside a biography split it across columns.
+    """
+    people_file = Path(people_file)
+    with open(people_file, "r", encoding="utf-8", newline="") as f:
+        if people_file.suffix == ".jsonl":
+            records = [json.loads(line) for line in f if line.strip()]
+            rows = [(r["Name"], r.get("Position") or "", f"{r.get('Biography') or ''} Education: {r.get('Education') or ''}")
+                    for r in records]
+        else:
+            reader = csv.reader(f)
+            next(reader, None)  # Header
+            rows = [(row[0], row[1] if len(row) > 1 else "", ",".join(row[2:])) for row in reader if row]
+    return [
+        {"name": name.strip(), "position": position.strip(), "text": f"{name.strip()}, {position.strip()}. {details.strip()}"}
+        for name, position, details in rows
+        if name.strip()
+    ]
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def top_k_matches(similarity, k):
+    """
+    Return (indices, scores) of the k best columns per row, best first.
+    """
+    k = min(k, similarity.shape[1])
+    best = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(similarity, best, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+async def embed_all(texts, embed):
+    # CachedEmbedding batches misses itself; repeated runs only embed new or edited texts
+    return np.asarray(await embed(texts), dtype=np.float32)
+
+def compute_matches(issues, people, embed, k=TOP_K):
+    """
+    Embed issues and profiles, score every issue against every person and keep the top k per issue.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        issue_vectors = loop.run_until_complete(embed_all([ISSUE_PREFIX + issue["text"] for issue in issues], embed))
+        people_vectors = loop.run_until_complete(embed_all([PROFILE_PREFIX + person["text"] for person in people], embed))
+    finally:
+        loop.close()
+    similarity = normalize_rows(issue_vectors) @ normalize_rows(people_vectors).T
+    best, scores = top_k_matches(similarity, k)
+    return {
+        "model": EMBED_MODEL,
+        "created": time.time(),
+        "top_k": k,
+        "issues": [
+            {
+                "repo": issue["repo"],
+                "number": issue["number"],
+                "title": issue["title"],
+                "snippet": issue["text"][:SNIPPET_CHARS],
+                "matches": [
+                    {"name": people[j]["name"], "position": people[j]["position"], "score": round(float(score), 4),
+                     "profile": people[j]["text"][:SNIPPET_CHARS]}
+                    for j, score in zip(best[i], scores[i])
+                ],
+            }
+            for i, issue in enumerate(issues)
+        ],
+    }
+
+def load_matches(path=MATCHES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def explain_prompt(issue):
+    """
+    Prompt asking the LLM to explain and rank one issue's precomputed shortlist.
+    """
+    candidates = "\n\n".join(
+        f"{rank}. {match['name']} ({match['position']}), similarity {match['score']:.2f}\n{match['profile']}"
+        for rank, match in enumerate(issue["matches"], 1)
+    )
+    return (
+        f"GitHub issue #{issue['number']} in {issue['repo']}:\n{issue['snippet']}\n\n"
+        f"Shortlisted Keystone employees:\n{candidates}\n\n"
+        "Which of these employees would be best positioned to resolve this issue, and why? "
+        "Rank them and keep each explanation to one or two sentences."
+    )
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Precompute the best-matching Keystone employees for every fetched GitHub issue.")
+    parser.add_argument("--data", type=Path, default=DATA_FOLDER)
+    parser.add_argument("--people", type=Path, default=None,
+                        help="Profile records (.jsonl) or CSV (default: our_people.jsonl if present, else our_people.txt)")
+    parser.add_argument("--output", type=Path, default=MATCHES_PATH)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    issues = load_issues(args.data)
+    people = load_people(args.people or (PEOPLE_RECORDS if PEOPLE_RECORDS.exists() else PEOPLE_FILE))
+    if not issues or not people:
+        logging.error(f"Need issues and profiles to match; found {len(issues)} issues and {len(people)} people.")
+        exit(1)
+
+    embedding_func = cached_ollama_embedding(embed_model=EMBED_MODEL, host=OLLAMA_HOST)
+    start = time.perf_counter()
+    matches = compute_matches(issues, people, embedding_func.func, args.top_k)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(matches, f, ensure_ascii=False, indent=2)
+    logging.info(f"Matched {len(issues)} issues against {len(people)} people in {time.perf_counter() - start:.1f}s; wrote {args.output}")
+    embedding_func.func.cache.report()
@@ -1,34 +1,133 @@
 import os
+import json
+import hashlib
 from pathlib import Path
 import tiktoken
+import instrumentation
 
 # Define paths
 data_folder = Path("/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/data")
 output_file = Path("/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/merged_output.txt")
+manifest_file = output_file.with_name("token_manifest.json")  # Cached per-file counts, keyed by path
 
-# Initialize content to store merged text
-merged_content = ""
+TOKEN_THREADS = int(os.getenv("TOKEN_THREADS", str(os.cpu_count() or 4)))  # Threads used by encode_ordinary_batch
+TOKEN_CHUNK_CHARS = 64 * 1024  # Files are split on line boundaries into chunks of about this size for batching
+TOKEN_BATCH_CHARS = 8 * 1024 * 1024  # Changed files are tokenized in batches of up to this much text
 
-# Loop through all .txt files in the data folder
-for txt_file in data_folder.glob("*.txt"):
-    with open(txt_file, "r", encoding="utf-8") as file:
-        merged_content += file.read() + "\n\n"  # Add extra newlines for separation
+# Use a general BPE encoding from tiktoken
+ENCODING_NAME = "cl100k_base"  # General-purpose BPE encoding
+encoding = tiktoken.get_encoding(ENCODING_NAME)
 
-# Save merged content to the output file
-with open(output_file, "w", encoding="utf-8") as file:
-    file.write(merged_content)
+def split_chunks(text, size=TOKEN_CHUNK_CHARS):
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + size)
+        end = len(text) if end == -1 else end + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
 
-# Count words, characters, and tokens
-word_count = len(merged_content.split())
-character_count = len(merged_content)
+@instrumentation.traced("merge.tokenize")
+def count_batch(texts):
+    """
+    Count words, characters and tokens for {path: text}, encoding every chunk in one threaded batch.
+    """
+    owners, chunks = [], []
+    for path, text in texts.items():
+        for chunk in split_chunks(text):
+            owners.append(path)
+            chunks.append(chunk)
+    counts = {path: {"words": len(text.split()), "characters": len(text), "tokens": 0} for path, text in texts.items()}
+    for path, tokens in zip(owners, encoding.encode_ordinary_batch(chunks, num_threads=TOKEN_THREADS)):
+        counts[path]["tokens"] += len(tokens)
+    instrumentation.count("tokens_counted", sum(c["tokens"] for c in counts.values()))
+    instrumentation.count("bytes_processed", sum(len(chunk) for chunk in chunks), stage="tokenize")
+    return counts
 
-# Use a general BPE encoding from tiktoken
-encoding = tiktoken.get_encoding("cl100k_base")  # General-purpose BPE encoding
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"encoding": ENCODING_NAME, "files": {}}
+    if manifest.get("encoding") != ENCODING_NAME:
+        return {"encoding": ENCODING_NAME, "files": {}}
+    return manifest
+
+@instrumentation.traced("merge")
+def merge_data(data_folder, output_file, manifest_file):
+    """
+    Stream every .txt file in data_folder into output_file and return the token manifest.
+
+    Files are written to the output one at a time as they are read. Word, character and
+    token counts are only computed for files whose size/mtime or SHA-256 changed since the
+    manifest was last written; unchanged files reuse their stored counts. The manifest's
+    layout records where each file landed in the output (character offsets), so later
+    stages can split the merged corpus along source-file boundaries.
+    """
+    manifest = load_manifest(manifest_file)
+    previous = manifest["files"]
+    files = {}
+    layout = []
+    offset = 0
+    pending = {}
+    pending_chars = 0
+
+    with open(output_file, "w", encoding="utf-8") as out:
+        for txt_file in sorted(data_folder.glob("*.txt")):
+            path = str(txt_file)
+            stat = txt_file.stat()
+            raw = txt_file.read_bytes()
+            instrumentation.count("bytes_processed", len(raw), stage="merge")
+            # Match text-mode reading: UTF-8 with universal newlines
+            text = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            out.write(text + "\n\n")  # Add extra newlines for separation
+            layout.append({"path": path, "offset": offset, "length": len(text)})
+            offset += len(text) + 2
+
+            entry = previous.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                files[path] = entry
+                continue
+            digest = hashlib.sha256(raw).hexdigest()
+            if entry and entry["sha256"] == digest:
+                files[path] = {**entry, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+                continue
+
+            files[path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+            pending[path] = text
+            pending_chars += len(text)
+            if pending_chars >= TOKEN_BATCH_CHARS:
+                for counted_path, counts in count_batch(pending).items():
+                    files[counted_path].update(counts)
+                pending, pending_chars = {}, 0
+
+    if pending:
+        for counted_path, counts in count_batch(pending).items():
+            files[counted_path].update(counts)
+
+    manifest = {"encoding": ENCODING_NAME, "files": files, "layout": layout}
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    instrumentation.configure("merge_data")  # INSTRUMENT=1 writes a span trace and metrics snapshot
+    manifest = merge_data(data_folder, output_file, manifest_file)
+    files = manifest["files"]
+
+    # Totals come from the manifest; the two separator newlines per file only add characters
+    word_count = sum(entry["words"] for entry in files.values())
+    character_count = sum(entry["characters"] + 2 for entry in files.values())
+    token_count = sum(entry["tokens"] for entry in files.values())
 
-# Encode the content and calculate token count
-token_count = len(encoding.encode(merged_content))
+    # Display counts
+    print(f"Word count: {word_count}")
+    print(f"Character count: {character_count}")
+    print(f"Token count: {token_count}")
 
-# Display counts
-print(f"Word count: {word_count}")
-print(f"Character count: {character_count}")
-print(f"Token count: {token_count}")
+    # Per-file token counts, largest first, to show what dominates LLM cost
+    for path, entry in sorted(files.items(), key=lambda item: item[1]["tokens"], reverse=True):
+        share = entry["tokens"] / token_count if token_count else 0.0
+        print(f"  {entry['tokens']:>10}  {share:6.1%}  {os.path.basename(path)}")
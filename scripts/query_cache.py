@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+from dataclasses import asdict
+import numpy as np
+from lightrag.lightrag import always_get_an_event_loop
+from lightrag.prompt import PROMPTS
+
+# Kept outside the graph directory so caching answers never changes its fingerprint
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", os.path.expanduser("~/.cache/keystone_queries.sqlite"))
+QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", "0.95"))  # Cosine similarity for a reworded question to count as a hit
+
+# LightRAG rewrites its own LLM cache on every query; it does not change the graph
+FINGERPRINT_IGNORED = {"kv_store_llm_response_cache.json"}
+
+# Numbers, and capitalized words other than the first of a sentence: issue numbers, names, repositories
+IDENTIFIER = re.compile(r"\d+(?:\.\d+)*|\b[A-Z][\w'-]*")
+SENTENCE_START = re.compile(r"(?:^|[.!?]\s+)[\s\"'(]*$")
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?.! ")
+
+def identifiers(question):
+    """
+    Return the identifiers in a question, which a similar question must repeat exactly to share its answer.
+
+    Whole-question embeddings score "issue #12" and "issue #13", or the same question about two
+    people, as near-identical.
+    """
+    found = set()
+    for match in IDENTIFIER.finditer(question):
+        token = match.group()
+        if token[0].isupper() and (token == "I" or SENTENCE_START.search(question[:match.start()])):
+            continue
+        found.add(token)
+    return found
+
+def working_dir_fingerprint(working_dir):
+    """
+    Hash the name, size and mtime of every file in the graph directory.
+    """
+    entries = []
+    for name in sorted(os.listdir(working_dir)):
+        path = os.path.join(working_dir, name)
+        if name in FINGERPRINT_IGNORED or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        entries.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+
+def param_key(param):
+    # Mode plus every other QueryParam field that shapes the answer
+    return json.dumps(asdict(param), sort_keys=True, default=str)
+
+class QueryCache:
+    """
+    Cache of rag.query answers for one graph working directory.
+
+    A question is served from the cache when its normalized text matches a cached question
+    asked with the same QueryParam, or when it names the same identifiers as one and its
+    embedding's cosine similarity to it passes threshold. Entries are tied to a fingerprint of the working directory and dropped as
+    soon as the graph files change.
+    """
+    def __init__(self, rag, path=QUERY_CACHE_PATH, threshold=QUERY_CACHE_THRESHOLD):
+        self.rag = rag
+        self.working_dir = os.path.abspath(rag.working_dir)
+        self.threshold = threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS answers (working_dir TEXT, fingerprint TEXT, param TEXT, "
+            "question TEXT, normalized TEXT, embedding BLOB, response TEXT, created REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS answers_lookup ON answers (working_dir, fingerprint, param)")
+        self.db.commit()
+
+    def _current_fingerprint(self):
+        fingerprint = working_dir_fingerprint(self.working_dir)
+        # Anything cached against an older state of this graph is stale
+        self.db.execute("DELETE FROM answers WHERE working_dir = ? AND fingerprint != ?", (self.working_dir, fingerprint))
+        self.db.commit()
+        return fingerprint
+
+    async def aquery(self, question, param):
+        """
+        Return (response, source) where source is "exact", "semantic" or "llm".
+        """
+        fingerprint = self._current_fingerprint()
+        key = param_key(param)
+        normalized = normalize_question(question)
+        scope = (self.working_dir, fingerprint, key)
+
+        row = self.db.execute(
+            "SELECT response FROM answers WHERE working_dir = ? AND fingerprint = ? AND param = ? AND normalized = ?",
+            scope + (normalized,),
+        ).fetchone()
+        if row is not None:
+            self.exact_hits += 1
+            return row[0], "exact"
+
+        embedding = np.asarray((await self.rag.embedding_func([question]))[0], dtype=np.float32)
+        embedding /= np.linalg.norm(embedding) or 1.0
+        asked = identifiers(question)
+        rows = [
+            (blob, response) for cached_question, blob, response in self.db.execute(
+                "SELECT question, embedding, response FROM answers WHERE working_dir = ? AND fingerprint = ? AND param = ?", scope
+            ).fetchall()
+            if identifiers(cached_question) == asked
+        ]
+        if rows:
+            cached = np.frombuffer(b"".join(blob for blob, _ in rows), dtype=np.float32).reshape(len(rows), -1)
+            similarities = cached @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                self.semantic_hits += 1
+                return rows[best][1], "semantic"
+
+        self.misses += 1
+        response = await self.rag.aquery(question, param=param)
+        if response == PROMPTS["fail_response"]:
+            # Not worth keeping; the graph may answer once it has more context
+            return response, "llm"
+        self.db.execute(
+            "INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            scope + (question, normalized, embedding.tobytes(), response, time.time()),
+        )
+        self.db.commit()
+        return response, "llm"
+
+    def query(self, question, param):
+        loop = always_get_an_event_loop()
+        return loop.run_until_complete(self.aquery(question, param))
+
+    def report(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        logging.info(
+            f"Query cache: {self.exact_hits} exact and {self.semantic_hits} similar-question hits, "
+            f"{self.misses} answered by the graph ({lookups} queries)"
+        )
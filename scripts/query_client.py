@@ -0,0 +1,48 @@
+import os
+import requests
+import instrumentation
+
+# Where query_service.py listens (override with QUERY_SERVICE_URL)
+QUERY_SERVICE_URL = os.getenv("QUERY_SERVICE_URL", "http://127.0.0.1:8765")
+
+def _error(resp):
+    # A proxy in front of the service can answer with an HTML error page instead of JSON
+    try:
+        message = resp.json().get('error', resp.text)
+    except ValueError:
+        message = resp.text
+    return RuntimeError(f"Query service returned {resp.status_code}: {message}")
+
+def query_service(question, mode="global", url=QUERY_SERVICE_URL, timeout=600):
+    """
+    Ask the running query service a question; returns its JSON reply (response, source, coalesced, seconds).
+    """
+    with instrumentation.span("client.query", mode=mode):
+        resp = requests.post(f"{url}/query", json={"query": question, "mode": mode}, timeout=timeout)
+        instrumentation.count("http_requests", service="query_service")
+    if resp.status_code != 200:
+        raise _error(resp)
+    return resp.json()
+
+def issue_matches(issue=None, repo=None, explain=False, url=QUERY_SERVICE_URL, timeout=600):
+    """
+    Fetch precomputed employee shortlists: all issues, or one issue (optionally with an LLM explanation).
+    """
+    params = {}
+    if repo:
+        params["repo"] = repo
+    if issue is not None:
+        params["issue"] = str(issue)
+    if explain:
+        params["explain"] = "1"
+    with instrumentation.span("client.matches", explain=explain):
+        resp = requests.get(f"{url}/matches", params=params, timeout=timeout)
+        instrumentation.count("http_requests", service="query_service")
+    if resp.status_code != 200:
+        raise _error(resp)
+    return resp.json()
+
+def service_health(url=QUERY_SERVICE_URL, timeout=5):
+    resp = requests.get(f"{url}/health", timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
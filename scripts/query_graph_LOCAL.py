@@ -1,59 +1,40 @@
-import os
-from datetime import datetime
-from lightrag import LightRAG, QueryParam
-from lightrag.llm import ollama_model_complete, ollama_embedding
-from lightrag.utils import EmbeddingFunc
-from dotenv import load_dotenv
+import argparse
+import requests
+from query_client import QUERY_SERVICE_URL, query_service, issue_matches
+import instrumentation
 import logging
 
 # Set up logging
 logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
 
-# Load environment variables (for OpenAI API key, if needed in future)
-load_dotenv('/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/.env')
+# The graph stays loaded in query_service.py; this script only sends it a question
+DEFAULT_QUESTION = "Which Keystone employees would be best positioned to resolve the GitHub issues found?"
 
-# Set up file paths
-BASE_WORKING_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/lightrag_data'
-EXISTING_GRAPH_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/lightrag_data/graph_20241112_135927'
+parser = argparse.ArgumentParser(description="Query the LightRAG graph through the local query service.")
+parser.add_argument("question", nargs="?", default=DEFAULT_QUESTION)
+parser.add_argument("--mode", default="global", choices=["local", "global", "hybrid", "naive"])
+parser.add_argument("--url", default=QUERY_SERVICE_URL)
+parser.add_argument("--issue", type=int, help="Show the precomputed employee shortlist for this issue number instead of asking the graph")
+parser.add_argument("--repo", help="Repository (owner/name) of --issue when the number is not unique")
+parser.add_argument("--explain", action="store_true", help="With --issue, have the LLM rank and explain the shortlist")
+args = parser.parse_args()
+instrumentation.configure("query_graph_LOCAL")  # INSTRUMENT=1 writes a span trace and metrics snapshot
 
-# Ensure the existing graph directory exists
-if not os.path.exists(EXISTING_GRAPH_DIR):
-    logging.error(f"Error: The existing graph directory {EXISTING_GRAPH_DIR} does not exist.")
-    exit(1)
-
-logging.info(f"Using existing working directory at: {EXISTING_GRAPH_DIR}")
-
-# Initialize LightRAG with the existing working directory and Ollama model function
-rag = LightRAG(
-    working_dir=EXISTING_GRAPH_DIR,
-    llm_model_func=ollama_model_complete,  # Ollama model for text generation
-    llm_model_name="llama3.1:8b-instruct-q8_0",  # Specify the local Ollama model name
-    llm_model_max_async=4,  # Maximum number of async requests
-    llm_model_max_token_size=60000,  # Maximum context size
-    llm_model_kwargs={
-        "host": "http://localhost:11434",  # Ollama server host
-        "options": {"num_ctx": 60000}  # Context size configuration
-    },
-    embedding_func=EmbeddingFunc(
-        embedding_dim=768,
-        max_token_size=8192,
-        func=lambda texts: ollama_embedding(
-            texts,
-            embed_model="nomic-embed-text:latest",
-            host="http://localhost:11434"  # Specify Ollama embedding host
-        )
-    )
-)
-logging.info("LightRAG initialized with Ollama model.")
-
-# Optionally, perform a sample query on the existing graph to verify it works
 try:
-    query_param = QueryParam(mode="global")
-    response = rag.query(
-        "Which Keystone employees would be best positioned to resolve the GitHub issues found?",
-        param=query_param
-    )
-    logging.info("Query response:")
-    print(response)
+    if args.issue is not None:
+        result = issue_matches(args.issue, repo=args.repo, explain=args.explain, url=args.url)
+        print(f"{result['repo']} #{result['number']}: {result['title']}")
+        for match in result["matches"]:
+            print(f"  {match['score']:.3f}  {match['name']} ({match['position']})")
+        if "explanation" in result:
+            print(result["explanation"])
+    else:
+        result = query_service(args.question, mode=args.mode, url=args.url)
+        logging.info(f"Query response ({result['source']}, {result['seconds']:.1f}s):")
+        print(result["response"])
+except requests.ConnectionError:
+    logging.error(f"Error: No query service at {args.url}. Start it with: python scripts/query_service.py")
+    exit(1)
 except Exception as e:
-    logging.error(f"Error during querying: {e}")
\ No newline at end of file
+    logging.error(f"Error during querying: {e}")
+    exit(1)
@@ -0,0 +1,284 @@
+import os
+import time
+import asyncio
+import logging
+import argparse
+from collections import deque
+from aiohttp import web
+from dotenv import load_dotenv
+from lightrag import QueryParam
+from lightrag.llm import ollama_model_complete
+from embedding_cache import cached_ollama_embedding
+from completion_cache import with_completion_cache
+from query_cache import QueryCache, normalize_question, param_key
+from graph_snapshot import SnapshotLightRAG, snapshot_storage_kwargs
+from match_issues import MATCHES_PATH, load_matches, explain_prompt
+import instrumentation
+
+# Service address (override with QUERY_SERVICE_HOST / QUERY_SERVICE_PORT; clients use QUERY_SERVICE_URL)
+QUERY_SERVICE_HOST = os.getenv("QUERY_SERVICE_HOST", "127.0.0.1")
+QUERY_SERVICE_PORT = int(os.getenv("QUERY_SERVICE_PORT", "8765"))
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "2"))  # Queries answered at once
+QUERY_QUEUE_SIZE = int(os.getenv("QUERY_QUEUE_SIZE", "16"))  # Queries allowed to wait; beyond this requests get 503
+QUERY_MODES = ("local", "global", "hybrid", "naive")
+LATENCY_WINDOW = 1000  # Most recent queries kept for the latency percentiles
+
+EXISTING_GRAPH_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/lightrag_data/graph_20241112_135927'
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+LLM_MODEL = os.getenv("QUERY_LLM_MODEL", "llama3.1:8b-instruct-q8_0")
+
+def build_rag(working_dir, llm_model=LLM_MODEL, ollama_host=OLLAMA_HOST):
+    """
+    Load the graph in working_dir with the same Ollama models and caches the query scripts used.
+
+    A current snapshot (graph_snapshot.py) is opened lazily through mmap instead of parsing the JSON stores.
+    """
+    llm_model_func, completion_cache = with_completion_cache(instrumentation.instrument_llm(ollama_model_complete), default_mode="readonly")
+    embedding_func = cached_ollama_embedding(
+        embed_model="nomic-embed-text:latest",
+        host=ollama_host,
+        embedding_dim=768,
+        max_token_size=8192
+    )
+    rag = SnapshotLightRAG(
+        working_dir=working_dir,
+        llm_model_func=llm_model_func,
+        llm_model_name=llm_model,
+        llm_model_max_async=4,
+        llm_model_max_token_size=60000,
+        llm_model_kwargs={
+            "host": ollama_host,
+            "options": {"num_ctx": 60000}
+        },
+        embedding_func=instrumentation.instrument_embedding(embedding_func),
+        **snapshot_storage_kwargs(working_dir)
+    )
+    return rag, embedding_func.func.cache, completion_cache
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class QueryService:
+    """
+    Answers queries against one resident graph.
+
+    Requests wait in a bounded queue for one of `workers` workers; when the queue is full the
+    service answers 503 instead of piling up work. A query identical (normalized question and
+    QueryParam) to one already queued or running waits for that result instead of asking the
+    LLM again. Match explanations share the same queue and workers.
+    """
+    def __init__(self, query_cache, caches=(), workers=QUERY_WORKERS, queue_size=QUERY_QUEUE_SIZE, matches=None):
+        self.query_cache = query_cache
+        # Precomputed issue shortlists from match_issues.py, keyed by (repo, issue number)
+        self.matches = {(issue["repo"], issue["number"]): issue for issue in (matches or {}).get("issues", [])}
+        self.caches = [cache for cache in caches if cache is not None]
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.inflight = {}
+        self.tasks = []
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.coalesced = 0
+        self.rejected = 0
+        self.started = time.time()
+
+    async def start(self, app):
+        self.tasks = [asyncio.ensure_future(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self, app):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def worker(self):
+        while True:
+            key, job, future = await self.queue.get()
+            try:
+                future.set_result(await job())
+            except Exception as e:
+                logging.error(f"Error during querying: {e}")
+                future.set_exception(e)
+            finally:
+                self.inflight.pop(key, None)
+                self.queue.task_done()
+
+    async def run_queued(self, key, job):
+        """
+        Run the coroutine function job on a worker and return (result, coalesced).
+
+        A job with the same key already queued or running is awaited instead of being queued
+        again. Raises asyncio.QueueFull when the service is saturated.
+        """
+        if key in self.inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self.inflight[key]), True
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((key, job, future))
+        self.inflight[key] = future
+        return await asyncio.shield(future), False
+
+    async def answer(self, question, param):
+        with instrumentation.span("service.answer", mode=param.mode):
+            return await self.query_cache.aquery(question, param)
+
+    async def explain(self, issue):
+        with instrumentation.span("service.explain"):
+            # Only the shortlist goes to the LLM, never the whole staff list
+            return await self.query_cache.rag.llm_model_func(explain_prompt(issue))
+
+    async def submit(self, question, param):
+        """
+        Return (response, source, coalesced); raises asyncio.QueueFull when the service is saturated.
+        """
+        key = (normalize_question(question), param_key(param))
+        (response, source), coalesced = await self.run_queued(key, lambda: self.answer(question, param))
+        return response, source, coalesced
+
+    async def handle_query(self, request):
+        try:
+            body = await request.json()
+        except ValueError:  # Includes json.JSONDecodeError and undecodable bytes
+            return web.json_response({"error": "request body must be JSON"}, status=400)
+        if not isinstance(body, dict):
+            return web.json_response({"error": "request body must be a JSON object"}, status=400)
+        question = body.get("query", "")
+        if not isinstance(question, str) or not question.strip():
+            return web.json_response({"error": "query is required"}, status=400)
+        question = question.strip()
+        mode = body.get("mode", "global")
+        if mode not in QUERY_MODES:
+            return web.json_response({"error": f"mode must be one of {', '.join(QUERY_MODES)}"}, status=400)
+        param = QueryParam(mode=mode)
+
+        start = time.monotonic()
+        try:
+            with instrumentation.span("service.query", mode=mode) as span:
+                response, source, coalesced = await self.submit(question, param)
+                span.set(source=source, coalesced=coalesced)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return web.json_response({"error": "query service is busy"}, status=503, headers={"Retry-After": "5"})
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+        seconds = time.monotonic() - start
+        self.latencies.append((seconds, source))
+        self.query_cache.report()
+        for cache in self.caches:
+            cache.report()
+        return web.json_response({"response": response, "source": source, "coalesced": coalesced, "seconds": seconds})
+
+    async def handle_matches(self, request):
+        """
+        GET /matches lists every issue's shortlist; with repo and issue it returns that issue's
+        shortlist, and explain=1 additionally asks the LLM to rank and justify it.
+        """
+        if not self.matches:
+            return web.json_response({"error": "no issue matches loaded; run scripts/match_issues.py"}, status=404)
+        repo = request.query.get("repo")
+        number = request.query.get("issue")
+        if number is None:
+            return web.json_response({"issues": [
+                {"repo": issue["repo"], "number": issue["number"], "title": issue["title"],
+                 "matches": [{"name": m["name"], "position": m["position"], "score": m["score"]} for m in issue["matches"]]}
+                for issue in self.matches.values()
+                if repo is None or issue["repo"] == repo
+            ]})
+        if not number.isdigit():
+            return web.json_response({"error": "issue must be an issue number"}, status=400)
+        found = [issue for (issue_repo, issue_number), issue in self.matches.items()
+                 if issue_number == int(number) and (repo is None or issue_repo == repo)]
+        if len(found) != 1:
+            error = "issue not found" if not found else "issue number is ambiguous; pass repo as well"
+            return web.json_response({"error": error}, status=404 if not found else 400)
+        issue = found[0]
+        reply = {"repo": issue["repo"], "number": issue["number"], "title": issue["title"], "matches": issue["matches"]}
+        if request.query.get("explain") in ("1", "true"):
+            start = time.monotonic()
+            try:
+                reply["explanation"], _ = await self.run_queued(("explain", issue["repo"], issue["number"]),
+                                                                lambda: self.explain(issue))
+            except asyncio.QueueFull:
+                self.rejected += 1
+                return web.json_response({"error": "query service is busy"}, status=503, headers={"Retry-After": "5"})
+            except Exception as e:
+                logging.error(f"Error explaining matches: {e}")
+                return web.json_response({"error": str(e)}, status=500)
+            reply["seconds"] = time.monotonic() - start
+        return web.json_response(reply)
+
+    async def handle_health(self, request):
+        return web.json_response({
+            "status": "ok",
+            "working_dir": self.query_cache.working_dir,
+            "snapshot": type(self.query_cache.rag.chunk_entity_relation_graph).__name__ == "SnapshotGraphStorage",
+            "uptime_seconds": time.time() - self.started,
+            "workers": self.workers,
+            "queued": self.queue.qsize(),
+            "in_flight": len(self.inflight),
+            "issue_matches": len(self.matches),
+        })
+
+    async def handle_metrics(self, request):
+        text = instrumentation.metrics_text()
+        if text is None:
+            return web.json_response({"error": "instrumentation is off; start the service with INSTRUMENT=1"}, status=404)
+        return web.Response(text=text, content_type="text/plain", headers={"X-Prometheus-Format": "0.0.4"})
+
+    async def handle_latency(self, request):
+        by_source = {}
+        for seconds, source in self.latencies:
+            by_source.setdefault(source, []).append(seconds)
+        summary = {}
+        for source, values in [("all", [seconds for seconds, _ in self.latencies])] + sorted(by_source.items()):
+            values = sorted(values)
+            summary[source] = {
+                "count": len(values),
+                "p50": percentile(values, 0.5),
+                "p90": percentile(values, 0.9),
+                "p99": percentile(values, 0.99),
+                "max": values[-1] if values else None,
+            }
+        return web.json_response({"latency_seconds": summary, "coalesced": self.coalesced, "rejected": self.rejected})
+
+def create_app(service):
+    app = web.Application()
+    app.router.add_post("/query", service.handle_query)
+    app.router.add_get("/health", service.handle_health)
+    app.router.add_get("/latency", service.handle_latency)
+    app.router.add_get("/matches", service.handle_matches)
+    app.router.add_get("/metrics", service.handle_metrics)
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    return app
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
+    load_dotenv('/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/.env')
+
+    parser = argparse.ArgumentParser(description="Serve queries against a LightRAG graph kept in memory.")
+    parser.add_argument("--working-dir", default=os.getenv("QUERY_GRAPH_DIR", EXISTING_GRAPH_DIR))
+    parser.add_argument("--host", default=QUERY_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=QUERY_SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=QUERY_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUERY_QUEUE_SIZE)
+    parser.add_argument("--llm-model", default=LLM_MODEL)
+    parser.add_argument("--ollama-host", default=OLLAMA_HOST)
+    parser.add_argument("--matches", default=MATCHES_PATH, help="issue_matches.json written by match_issues.py")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.working_dir):
+        logging.error(f"Error: The existing graph directory {args.working_dir} does not exist.")
+        exit(1)
+
+    instrumentation.configure("query_service")  # INSTRUMENT=1 records spans and serves them at /metrics
+    rag, embedding_cache, completion_cache = build_rag(args.working_dir, args.llm_model, args.ollama_host)
+    matches = None
+    if os.path.exists(args.matches):
+        matches = load_matches(args.matches)
+        logging.info(f"Loaded employee shortlists for {len(matches['issues'])} issues from {args.matches}")
+    else:
+        logging.warning(f"No issue matches at {args.matches}; /matches is disabled until match_issues.py has run")
+    logging.info(f"Graph loaded from {args.working_dir}; serving on http://{args.host}:{args.port}")
+    service = QueryService(QueryCache(rag), (embedding_cache, completion_cache), args.workers, args.queue_size, matches)
+    web.run_app(create_app(service), host=args.host, port=args.port)
@@ -1,72 +1,289 @@
-import requests
-from bs4 import BeautifulSoup
+import io
 import os
+import re
+import csv
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+import instrumentation
 
-# Step 1: Set up the URL for the main page and initialize headers
-base_url = 'https://www.keystone.ai/our-people'
+# Step 1: Set up the URL for the main page and initialize headers (override with SCRAPE_BASE_URL, e.g. a local fixture server)
+base_url = os.getenv('SCRAPE_BASE_URL', 'https://www.keystone.ai/our-people')
 headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36'
 }
 
-# File path for saving the output
+# File paths for saving the output: JSONL records are the source of truth, the CSV is rendered from them
 output_file = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/data/our_people.txt'
+profiles_file = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/data/our_people.jsonl'
+changes_file = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/data/our_people_changes.json'
+PROFILE_FIELDS = ['Name', 'Position', 'Biography', 'Education']
+
+# Concurrency and politeness (override with the SCRAPE_* environment variables)
+SCRAPE_WORKERS = int(os.getenv('SCRAPE_WORKERS', '8'))  # Profiles fetched at once across all hosts
+SCRAPE_PER_HOST = int(os.getenv('SCRAPE_PER_HOST', '4'))  # Open requests allowed to one host
+SCRAPE_MIN_INTERVAL = float(os.getenv('SCRAPE_MIN_INTERVAL', '0.1'))  # Seconds between request starts on one host
+SCRAPE_RETRIES = int(os.getenv('SCRAPE_RETRIES', '3'))
+SCRAPE_BACKOFF = float(os.getenv('SCRAPE_BACKOFF', '0.5'))  # Retry waits grow as backoff * 2 ** attempt
+SCRAPE_TIMEOUT = float(os.getenv('SCRAPE_TIMEOUT', '30'))
+
+# lxml is much faster than html.parser; the strainers skip building tags the scraper never reads
+PARSER = 'lxml'
+LINK_STRAINER = SoupStrainer('a', href=True)
+PROFILE_STRAINER = SoupStrainer('body')
+
+def make_session(pool_size=SCRAPE_WORKERS, retries=SCRAPE_RETRIES, backoff=SCRAPE_BACKOFF):
+    """
+    Return a requests.Session that keeps connections alive and retries failed or throttled requests with backoff.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET', 'HEAD'),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class HostThrottle:
+    """
+    Limits each host to per_host open requests, started at least min_interval seconds apart.
+    """
+    def __init__(self, per_host=SCRAPE_PER_HOST, min_interval=SCRAPE_MIN_INTERVAL):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    @contextmanager
+    def __call__(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = {'slots': threading.Semaphore(self.per_host), 'lock': threading.Lock(), 'next_start': 0.0}
+            state = self.hosts[host]
+        with state['slots']:
+            with state['lock']:
+                wait = state['next_start'] - time.monotonic()
+                state['next_start'] = max(state['next_start'], time.monotonic()) + self.min_interval
+            if wait > 0:
+                time.sleep(wait)
+            yield
+
+def fetch(session, throttle, url, timeout=SCRAPE_TIMEOUT, request_headers=None):
+    with throttle(url):
+        response = session.get(url, timeout=timeout, headers=request_headers)
+    instrumentation.count("http_requests", service="site")
+    instrumentation.count("bytes_processed", len(response.content), stage="scrape")
+    response.raise_for_status()
+    return response
+
+def conditional_headers(record):
+    # Validators from the last fetch; the server answers 304 Not Modified when the page is unchanged
+    request_headers = {}
+    if record and record.get('etag'):
+        request_headers['If-None-Match'] = record['etag']
+    if record and record.get('last_modified'):
+        request_headers['If-Modified-Since'] = record['last_modified']
+    return request_headers
+
+def profile_hash(profile):
+    return hashlib.sha256(json.dumps([profile[field] for field in PROFILE_FIELDS]).encode('utf-8')).hexdigest()
+
+def load_records(path=profiles_file):
+    """
+    Return the profile records from the last run as {url: record}.
+    """
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                records[record['url']] = record
+    return records
+
+def canonical_url(url):
+    # Drop query, fragment and trailing slash so the same profile is only fetched once
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+
+def find_profile_links(content, page_url):
+    """
+    Return the unique profile URLs linked from the "Our People" page, in page order.
+    """
+    soup = BeautifulSoup(content, PARSER, parse_only=LINK_STRAINER)
+    index_path = urlsplit(page_url).path.rstrip('/')
+    profile_links = []
+    seen = set()
+    for link in soup.find_all('a', href=True):
+        full_link = canonical_url(urljoin(page_url, link['href']))
+        path = urlsplit(full_link).path
+        if path.startswith(index_path + '/') and full_link not in seen:  # Filter to only profile links
+            seen.add(full_link)
+            profile_links.append(full_link)
+    return profile_links
+
+@instrumentation.traced("scrape.parse")
+def parse_profile(content):
+    """
+    Extract name, position, biography and education from a profile page.
+    """
+    profile_soup = BeautifulSoup(content, PARSER, parse_only=PROFILE_STRAINER)
 
-# Step 2: Request the main "Our People" page
-response = requests.get(base_url, headers=headers)
-soup = BeautifulSoup(response.content, 'html.parser')
-
-# Step 3: Locate all team member profile links
-profile_links = []
-for link in soup.find_all('a', href=True):
-    href = link['href']
-    if '/our-people/' in href and href != '/our-people':  # Filter to only profile links
-        full_link = 'https://www.keystone.ai' + href if href.startswith('/') else href
-        profile_links.append(full_link)
-
-# Function to scrape an individual profile
-def scrape_profile(url):
-    profile_data = {}
-    response = requests.get(url, headers=headers)
-    profile_soup = BeautifulSoup(response.content, 'html.parser')
-    
     # Extract name
-    name = profile_soup.find('h1').text.strip() if profile_soup.find('h1') else ''
-    profile_data['Name'] = name
-    
+    name = profile_soup.find('h1')
     # Extract position
     position_div = profile_soup.find('div', class_='c-title-6')
-    position = position_div.text.strip() if position_div else ''
-    profile_data['Position'] = position
-    
     # Extract biography
     bio_div = profile_soup.find('div', class_='c-global-richtext w-richtext')
-    bio = bio_div.text.strip() if bio_div else ''
-    profile_data['Biography'] = bio
-    
+
     # Extract education information
-    education_section = profile_soup.find('h3', text="Education")
     education_list = []
-    if education_section:
-        for item in education_section.find_next('ul').find_all('li'):
-            education_list.append(item.text.strip())
-    profile_data['Education'] = '; '.join(education_list)  # Join education items with a semicolon for a single string
-    
-    return profile_data
-
-# Step 5: Loop through each profile, store the extracted data, and write to file
-profiles_data = []
-with open(output_file, 'w') as f:
-    # Write the header
-    f.write("Name,Position,Biography,Education\n")
-    
-    for link in profile_links:
-        profile_info = scrape_profile(link)
-        
-        # Format each profile's information as a comma-separated line
-        line = f"{profile_info['Name']},{profile_info['Position']},{profile_info['Biography']},{profile_info['Education']}\n"
-        
-        # Write the formatted line to the file
-        f.write(line)
-        profiles_data.append(profile_info)  # Optional: keep in memory if further processing is needed
-
-print(f"Data saved to {output_file}")
+    education_section = profile_soup.find('h3', string='Education')
+    education_items = education_section.find_next('ul') if education_section else None
+    if education_items:
+        education_list = [item.text.strip() for item in education_items.find_all('li')]
+
+    return {
+        'Name': name.text.strip() if name else '',
+        'Position': position_div.text.strip() if position_div else '',
+        'Biography': bio_div.text.strip() if bio_div else '',
+        'Education': '; '.join(education_list),  # Join education items with a semicolon for a single string
+    }
+
+@instrumentation.traced("scrape.profile")
+def scrape_profile(session, throttle, url, previous=None, full=False):
+    """
+    Return (record, status) for one profile, where status is "added", "changed", "unchanged" or "failed".
+
+    A 304 answer or a byte-identical page reuses the previous record without parsing, unless full
+    is set. A page that fails to download keeps its previous record (or None when there is none).
+    """
+    try:
+        response = fetch(session, throttle, url, request_headers=None if full else conditional_headers(previous))
+    except requests.RequestException as e:
+        print(f"Skipping {url}: {e}")
+        return previous, 'failed'
+
+    fetched = time.time()
+    if response.status_code == 304:
+        return dict(previous, fetched=fetched), 'unchanged'
+    metadata = {
+        'page_hash': hashlib.sha256(response.content).hexdigest(),
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched': fetched,
+    }
+    if not full and previous and previous.get('page_hash') == metadata['page_hash']:
+        return dict(previous, **metadata), 'unchanged'
+
+    profile = parse_profile(response.content)
+    record = dict({'url': url}, **profile, hash=profile_hash(profile), **metadata)
+    if previous is None:
+        return record, 'added'
+    return record, 'changed' if record['hash'] != previous.get('hash') else 'unchanged'
+
+@instrumentation.traced("scrape.profiles")
+def scrape_profiles(page_url=base_url, previous_records=None, workers=SCRAPE_WORKERS, per_host=SCRAPE_PER_HOST, min_interval=SCRAPE_MIN_INTERVAL, full=False):
+    """
+    Fetch the index page and every profile it links to.
+
+    Returns (records in page order, changes) where changes lists the added, changed and removed
+    profiles relative to previous_records ({url: record} from load_records). With full, every
+    profile is downloaded and parsed again instead of being revalidated.
+    """
+    previous_records = previous_records or {}
+    session = make_session(pool_size=max(workers, 1))
+    throttle = HostThrottle(per_host, min_interval)
+
+    # Step 2: Request the main "Our People" page and locate all team member profile links
+    with instrumentation.span("scrape.index", url=page_url):
+        profile_links = find_profile_links(fetch(session, throttle, page_url).content, page_url)
+    print(f"Found {len(profile_links)} profile links on {page_url}")
+
+    # Step 3: Scrape the profiles concurrently over the pooled session
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        scrape = instrumentation.propagate(lambda url: scrape_profile(session, throttle, url, previous_records.get(url), full))
+        results = list(executor.map(scrape, profile_links))
+    session.close()
+
+    records = [record for record, _ in results if record is not None]
+    changes = {'scraped': time.time(), 'added': [], 'changed': [], 'removed': [], 'failed': [], 'unchanged': 0}
+    for url, (record, status) in zip(profile_links, results):
+        if status == 'unchanged':
+            changes['unchanged'] += 1
+        else:
+            changes[status].append({'url': url, 'name': record['Name'] if record else ''})
+    linked = set(profile_links)
+    changes['removed'] = [{'url': url, 'name': record['Name']} for url, record in previous_records.items() if url not in linked]
+    print(f"Scraped {len(profile_links)} profiles in {time.perf_counter() - start:.1f}s")
+    return records, changes
+
+def write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_records(records, path=profiles_file):
+    # Step 4: Store one JSON record per profile
+    write_atomic(path, ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+
+def write_profiles(records, path=output_file):
+    """
+    Render the records as properly quoted CSV with one row per line, for merge_data.py and shard_corpus.py.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(PROFILE_FIELDS)
+    for record in records:
+        # Newlines inside a biography would split the row across lines of the merged corpus
+        writer.writerow([re.sub(r'\s*[\r\n]+\s*', ' ', record[field]) for field in PROFILE_FIELDS])
+    write_atomic(path, buffer.getvalue())
+
+def report_changes(changes, path=changes_file):
+    for status in ('added', 'changed', 'removed', 'failed'):
+        for entry in changes[status]:
+            print(f"  {status}: {entry['name'] or entry['url']}")
+    print(
+        f"{len(changes['added'])} added, {len(changes['changed'])} changed, {len(changes['removed'])} removed, "
+        f"{changes['unchanged']} unchanged, {len(changes['failed'])} failed"
+    )
+    write_atomic(path, json.dumps(changes, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scrape the Keystone AI \"Our People\" profiles.")
+    parser.add_argument('--base-url', default=base_url, help="Index page listing the profiles")
+    parser.add_argument('--output', default=output_file, help="CSV rendering of the profiles")
+    parser.add_argument('--records', default=profiles_file, help="JSONL profile records kept between runs")
+    parser.add_argument('--changes', default=changes_file, help="Where to write the added/changed/removed report")
+    parser.add_argument('--full', action='store_true', help="Re-download and re-parse every profile instead of revalidating")
+    parser.add_argument('--workers', type=int, default=SCRAPE_WORKERS)
+    parser.add_argument('--per-host', type=int, default=SCRAPE_PER_HOST)
+    parser.add_argument('--min-interval', type=float, default=SCRAPE_MIN_INTERVAL)
+    args = parser.parse_args()
+
+    instrumentation.configure('scrape_website')  # INSTRUMENT=1 writes a span trace and metrics snapshot
+    previous_records = load_records(args.records)
+    records, changes = scrape_profiles(args.base_url, previous_records, args.workers, args.per_host, args.min_interval, args.full)
+    write_records(records, args.records)
+    write_profiles(records, args.output)
+    report_changes(changes, args.changes)
+    print(f"Data saved to {args.records} and {args.output}")
@@ -0,0 +1,226 @@
+import os
+import re
+import csv
+import json
+import hashlib
+import argparse
+from pathlib import Path
+import tiktoken
+
+# Set up file paths
+MERGED_FILE_PATH = Path("/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/output1/merged_output.txt")
+MANIFEST_PATH = MERGED_FILE_PATH.with_name("token_manifest.json")  # Written by merge_data.py
+SHARDS_PATH = MERGED_FILE_PATH.with_name("shards.jsonl")
+
+# Mirrors the LightRAG configuration in generate_graph_LOCAL.py
+LLM_MODEL_MAX_TOKEN_SIZE = 60000
+NUM_CTX = 60000
+PROMPT_RESERVE = 0.5  # Share of the context left for the extraction prompt and the model's answer
+DEFAULT_TOKEN_BUDGET = int(min(LLM_MODEL_MAX_TOKEN_SIZE, NUM_CTX) * (1 - PROMPT_RESERVE))
+SHARD_ANCHOR_SPACING = int(os.getenv("SHARD_ANCHOR_SPACING", "16"))  # Average units per shard (see is_anchor)
+
+PEOPLE_HEADER = "Name,Position,Biography,Education"
+ISSUE_HEADER = re.compile(r"^### Issue #(\d+): ")
+
+encoding = tiktoken.get_encoding("cl100k_base")
+
+def repo_units(lines):
+    """
+    Split a fetch_github_data document into units: the header and structure tree, one unit per
+    `## <path>` file section and one per `### Issue #N` block.
+    """
+    units = []
+    key, kind, start = "structure", "structure", 0
+    in_issues = False
+    for i, line in enumerate(lines):
+        if not in_issues and line.startswith("## Recent Issues"):
+            boundary = ("issues", "issues")
+            in_issues = True
+        elif in_issues:
+            match = ISSUE_HEADER.match(line)
+            boundary = (f"issue-{match.group(1)}", "issue") if match else None
+        elif (line.startswith("## ") and line != "## Repository Structure"
+              and lines[i + 1:i + 3] == ["", "```"]):
+            boundary = (f"file:{line[3:]}", "file")
+        else:
+            boundary = None
+        if boundary and i > start:
+            units.append({"key": key, "kind": kind, "text": "\n".join(lines[start:i]).strip("\n")})
+        if boundary:
+            (key, kind), start = boundary, i
+    units.append({"key": key, "kind": kind, "text": "\n".join(lines[start:]).strip("\n")})
+    # The bare "Recent Issues" heading carries no content of its own
+    return [unit for unit in units if unit["kind"] != "issues" and unit["text"]]
+
+def people_units(lines):
+    units = []
+    for line in lines[1:]:
+        if line.strip():
+            # Rows are quoted CSV (scrape_website.py), so a name containing a comma stays whole
+            units.append({"key": f"person:{next(csv.reader([line]))[0].strip()}", "kind": "person", "text": line})
+    return units
+
+def paragraph_units(text):
+    paragraphs = [p.strip("\n") for p in re.split(r"\n\s*\n", text) if p.strip()]
+    return [{"key": f"paragraph-{i}", "kind": "paragraph", "text": p} for i, p in enumerate(paragraphs)]
+
+def number_repeated_keys(units):
+    # Two units with the same key (e.g. two people with the same name) would give two shards the same ID
+    seen = {}
+    for unit in units:
+        seen[unit["key"]] = seen.get(unit["key"], 0) + 1
+        if seen[unit["key"]] > 1:
+            unit["key"] = f"{unit['key']}~{seen[unit['key']]}"
+    return units
+
+def source_units(path, text):
+    """
+    Return (source key, context line, units) for one source file of the merged corpus.
+
+    The context line is repeated at the top of every shard of that source, so a shard of
+    issues still names its repository and a shard of profile rows keeps its CSV header.
+    """
+    lines = text.split("\n")
+    if lines[0].startswith("# Repository: "):
+        # Keyed by repository rather than file name, which changes with every fetch timestamp
+        return f"repo:{lines[0][len('# Repository: '):].strip()}", lines[0], number_repeated_keys(repo_units(lines))
+    if lines[0].strip() == PEOPLE_HEADER:
+        return os.path.basename(path), PEOPLE_HEADER, number_repeated_keys(people_units(lines))
+    return os.path.basename(path), None, paragraph_units(text)
+
+def split_oversized(unit, budget):
+    """
+    Split a unit that alone exceeds the budget into line-aligned parts.
+    """
+    lines = []
+    for line in unit["text"].split("\n"):
+        tokens = encoding.encode_ordinary(line)
+        # A single line longer than the budget (e.g. one profile row) is cut on token boundaries
+        lines.extend(encoding.decode(tokens[i:i + budget]) for i in range(0, max(len(tokens), 1), budget))
+
+    parts, current, current_tokens = [], [], 0
+    for line in lines:
+        line_tokens = len(encoding.encode_ordinary(line)) + 1
+        if current and current_tokens + line_tokens > budget:
+            parts.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        parts.append("\n".join(current))
+    return [
+        {"key": f"{unit['key']}#part{i}", "kind": unit["kind"], "text": part,
+         "tokens": len(encoding.encode_ordinary(part))}
+        for i, part in enumerate(parts)
+    ]
+
+def make_shard(source, context, kind, units):
+    # Profile rows stay one per line under their header; other units are separated by a blank line
+    text = ("\n" if kind == "person" else "\n\n").join(unit["text"] for unit in units)
+    context_tokens = 0
+    if context and kind != "structure":
+        text = f"{context}\n\n{text}" if kind != "person" else f"{context}\n{text}"
+        context_tokens = len(encoding.encode_ordinary(context)) + 2
+    keys = [unit["key"] for unit in units]
+    return {
+        # Stable across runs: derived from where the shard starts, not from its content
+        "id": "shard-" + hashlib.sha1(f"{source}|{keys[0]}".encode("utf-8")).hexdigest()[:16],
+        "source": source,
+        "kind": kind,
+        "units": keys,
+        "tokens": sum(unit["tokens"] for unit in units) + context_tokens,
+        "content_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "text": text,
+    }
+
+def is_anchor(key):
+    """
+    Whether a unit starts a new shard. Decided by the unit's key alone, about one unit in SHARD_ANCHOR_SPACING.
+    """
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % SHARD_ANCHOR_SPACING == 0
+
+def pack_shards(source, context, units, budget):
+    """
+    Pack consecutive units of the same kind into shards of at most `budget` tokens.
+
+    Shards start at anchor units (see is_anchor), so their boundaries depend on unit keys rather
+    than on everything before them: a new issue or file only changes the shard it lands in, where
+    greedy packing would shift every later shard. A run of units between anchors that exceeds the
+    budget is split greedily within the run.
+    """
+    if context:
+        budget -= len(encoding.encode_ordinary(context)) + 2
+    token_counts = encoding.encode_ordinary_batch([unit["text"] for unit in units])
+    shards, current = [], []
+    for unit, tokens in zip(units, token_counts):
+        unit["tokens"] = len(tokens)
+        pieces = split_oversized(unit, budget) if unit["tokens"] > budget else [unit]
+        for i, piece in enumerate(pieces):
+            if current and ((i == 0 and is_anchor(unit["key"])) or current[0]["kind"] != piece["kind"]
+                            or sum(u["tokens"] for u in current) + piece["tokens"] > budget):
+                shards.append(make_shard(source, context, current[0]["kind"], current))
+                current = []
+            current.append(piece)
+    if current:
+        shards.append(make_shard(source, context, current[0]["kind"], current))
+    return shards
+
+def shard_corpus(merged_path, manifest_path, output_path, budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Split the merged corpus along its natural boundaries and write the shards as JSONL.
+
+    A repository fetched more than once has several snapshots in the corpus; only the newest is
+    sharded, since the others repeat its content under the same shard IDs.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        layout = json.load(f).get("layout")
+    if not layout:
+        raise ValueError(f"{manifest_path} has no layout; re-run merge_data.py first")
+    with open(merged_path, "r", encoding="utf-8") as f:
+        merged = f.read()
+
+    sources = {}
+    for entry in layout:
+        text = merged[entry["offset"]:entry["offset"] + entry["length"]]
+        source, context, units = source_units(entry["path"], text)
+        if source in sources:
+            # fetch_github_data.py names snapshots <repo>_<timestamp>.txt, so the later name is the newer fetch
+            older, newer = sorted([sources[source], (entry["path"], context, units)],
+                                  key=lambda snapshot: os.path.basename(snapshot[0]))
+            print(f"Skipping {older[0]}: older snapshot of {source} than {newer[0]}")
+            sources[source] = newer
+        else:
+            sources[source] = (entry["path"], context, units)
+
+    shards = []
+    for source, (path, context, units) in sources.items():
+        if units:
+            shards.extend(pack_shards(source, context, units, budget))
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        for shard in shards:
+            f.write(json.dumps(shard, ensure_ascii=False) + "\n")
+    return shards
+
+def load_shards(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the merged corpus into token-budgeted shards.")
+    parser.add_argument("--merged", type=Path, default=MERGED_FILE_PATH)
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_PATH)
+    parser.add_argument("--output", type=Path, default=SHARDS_PATH)
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help="Maximum tokens per shard (default: half of num_ctx)")
+    args = parser.parse_args()
+
+    shards = shard_corpus(args.merged, args.manifest, args.output, args.token_budget)
+    by_kind = {}
+    for shard in shards:
+        by_kind[shard["kind"]] = by_kind.get(shard["kind"], 0) + 1
+    total_tokens = sum(shard["tokens"] for shard in shards)
+    print(f"Wrote {len(shards)} shards ({total_tokens} tokens, budget {args.token_budget}) to {args.output}")
+    for kind, count in sorted(by_kind.items()):
+        print(f"  {kind}: {count}")
@@ -1,51 +1,16 @@
-import os
-from lightrag import LightRAG, QueryParam
-from lightrag.llm import ollama_model_complete, ollama_embedding
-from lightrag.utils import EmbeddingFunc
-from dotenv import load_dotenv
+import requests
+from query_client import QUERY_SERVICE_URL, query_service, issue_matches
+import instrumentation
 import logging
 import streamlit as st
 
 # Set up logging
 logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
 
-# Load environment variables (for OpenAI API key, if needed in future)
-load_dotenv('/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/.env')
+# INSTRUMENT=1 traces every query this app sends; reruns keep the same trace
+instrumentation.configure("streamlit_query_graph_LOCAL2")
 
-# Set up file paths
-BASE_WORKING_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/lightrag_data'
-EXISTING_GRAPH_DIR = '/Users/mruckman1/Desktop/ImagesGraphAgentsExperiment/lightrag_data/graph_20241112_135927'
-
-# Ensure the existing graph directory exists
-if not os.path.exists(EXISTING_GRAPH_DIR):
-    logging.error(f"Error: The existing graph directory {EXISTING_GRAPH_DIR} does not exist.")
-    st.error(f"Error: The existing graph directory {EXISTING_GRAPH_DIR} does not exist.")
-    st.stop()
-
-logging.info(f"Using existing working directory at: {EXISTING_GRAPH_DIR}")
-
-# Initialize LightRAG with the existing working directory and Ollama model function
-rag = LightRAG(
-    working_dir=EXISTING_GRAPH_DIR,
-    llm_model_func=ollama_model_complete,  # Ollama model for text generation
-    llm_model_name="llama3.2:3b-instruct-fp16",  # Specify the local Ollama model name
-    llm_model_max_async=4,  # Maximum number of async requests
-    llm_model_max_token_size=60000,  # Maximum context size
-    llm_model_kwargs={
-        "host": "http://localhost:11434",  # Ollama server host
-        "options": {"num_ctx": 60000}  # Context size configuration
-    },
-    embedding_func=EmbeddingFunc(
-        embedding_dim=768,
-        max_token_size=8192,
-        func=lambda texts: ollama_embedding(
-            texts,
-            embed_model="nomic-embed-text:latest",
-            host="http://localhost:11434"  # Specify Ollama embedding host
-        )
-    )
-)
-logging.info("LightRAG initialized with Ollama model.")
+# The graph is loaded once by query_service.py; every Streamlit rerun only talks to it over HTTP
 
 # Streamlit app
 st.title("LightRAG Query App")
@@ -64,13 +29,35 @@ search_mode = st.selectbox(
 # Button to submit the query
 if st.button("Submit"):
     try:
-        query_param = QueryParam(mode=search_mode)
-        response = rag.query(user_query, param=query_param)
+        result = query_service(user_query, mode=search_mode)
+        response, source = result["response"], result["source"]
         logging.info(f"Query: {user_query}")
         logging.info(f"Search Mode: {search_mode}")
-        logging.info(f"Response: {response}")
-        st.success("Query Response:")
+        logging.info(f"Response ({source}, {result['seconds']:.1f}s): {response}")
+        st.success("Query Response:" if source == "llm" else f"Query Response (cached, {source} match):")
         st.write(response)
+    except requests.ConnectionError:
+        logging.error(f"No query service at {QUERY_SERVICE_URL}")
+        st.error(f"The query service is not running at {QUERY_SERVICE_URL}. Start it with: python scripts/query_service.py")
     except Exception as e:
         logging.error(f"Error during querying: {e}")
-        st.error(f"An error occurred: {e}")
\ No newline at end of file
+        st.error(f"An error occurred: {e}")
+
+# Precomputed issue-to-employee shortlists (scripts/match_issues.py); the LLM is only used to explain one
+st.markdown("---")
+st.subheader("Issue Matches")
+issue_number = st.number_input("GitHub issue number:", min_value=1, step=1)
+explain = st.checkbox("Explain the shortlist with the LLM")
+if st.button("Find Matches"):
+    try:
+        result = issue_matches(int(issue_number), explain=explain)
+        st.success(f"{result['repo']} #{result['number']}: {result['title']}")
+        st.table([{"Employee": m["name"], "Position": m["position"], "Score": round(m["score"], 3)} for m in result["matches"]])
+        if "explanation" in result:
+            st.write(result["explanation"])
+    except requests.ConnectionError:
+        logging.error(f"No query service at {QUERY_SERVICE_URL}")
+        st.error(f"The query service is not running at {QUERY_SERVICE_URL}. Start it with: python scripts/query_service.py")
+    except Exception as e:
+        logging.error(f"Error fetching matches: {e}")
+        st.error(f"An error occurred: {e}")
@@ -0,0 +1,63 @@
+import os
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+# The scripts import each other as top-level modules, the way they are run from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+@pytest.fixture
+def make_rag():
+    """
+    Factory for LightRAG instances answered by the fake_services completion and embedding functions,
+    optionally through a CompletionCache.
+    """
+    pytest.importorskip("lightrag")
+    from lightrag import LightRAG
+    from lightrag.utils import EmbeddingFunc
+    from fake_services import EMBEDDING_DIM, fake_completion, fake_embedding
+    from completion_cache import cached_completion
+
+    async def complete(prompt, system_prompt=None, history_messages=[], **kwargs):
+        return fake_completion(prompt)
+
+    async def embed(texts):
+        return np.array([fake_embedding(text) for text in texts])
+
+    def factory(working_dir, completion_cache=None):
+        # LightRAG opens its log file in working_dir before creating the directory
+        os.makedirs(working_dir, exist_ok=True)
+        return LightRAG(
+            working_dir=str(working_dir),
+            llm_model_func=complete if completion_cache is None else cached_completion(complete, completion_cache, "fake"),
+            embedding_func=EmbeddingFunc(embedding_dim=EMBEDDING_DIM, max_token_size=8192, func=embed),
+        )
+    return factory
+
+@pytest.fixture
+def github(monkeypatch):
+    """
+    A fake_services GitHub serving a small synthetic repository, with fetch_github_data pointed at it.
+    """
+    pytest.importorskip("github")
+    import fetch_github_data
+    from fake_services import SyntheticRepo, fake_github
+
+    server = fake_github(SyntheticRepo(files=12, dirs=3, issues=6)).start()
+    monkeypatch.setattr(fetch_github_data, "GITHUB_API_URL", server.url)
+    monkeypatch.setattr(fetch_github_data, "GITHUB_TOKEN", None)
+    yield server
+    server.stop()
+
+@pytest.fixture
+def profile_site():
+    """
+    A fake_services "Our People" site with eight profiles; each request takes 50ms.
+    """
+    pytest.importorskip("bs4")
+    from fake_services import fake_profile_site
+
+    server = fake_profile_site(8, latency=0.05).start()
+    yield server
+    server.stop()
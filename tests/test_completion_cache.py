@@ -0,0 +1,47 @@
+import asyncio
+import multiprocessing
+from completion_cache import CompletionCache, cached_completion, completion_key
+
+def key(n):
+    return completion_key("model", f"prompt {n}", None, [], {})
+
+def write_completions(path, start, count):
+    cache = CompletionCache(path=path)
+    for n in range(start, start + count):
+        cache.put(key(n), "model", f"answer {n}", 0.5)
+
+def test_processes_share_one_cache_file(tmp_path):
+    path = str(tmp_path / "completions.sqlite")
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        pool.starmap(write_completions, [(path, n * 200, 200) for n in range(4)])
+    cache = CompletionCache(path=path, mode="readonly")
+    assert all(cache.get(key(n)) == f"answer {n}" for n in range(800))
+    assert cache.hits == 800 and cache.seconds_saved == 400
+
+def test_readonly_mode_serves_hits_without_writing(tmp_path):
+    path = str(tmp_path / "completions.sqlite")
+    CompletionCache(path=path).put(key(1), "model", "stored", 1.0)
+    readonly = CompletionCache(path=path, mode="readonly")
+    readonly.put(key(2), "model", "ignored", 1.0)
+    assert readonly.get(key(1)) == "stored"
+    assert CompletionCache(path=path).get(key(2)) is None
+
+def test_expired_entries_are_misses(tmp_path):
+    path = str(tmp_path / "completions.sqlite")
+    CompletionCache(path=path).put(key(1), "model", "stale", 1.0)
+    assert CompletionCache(path=path, mode="readonly", ttl=-1).get(key(1)) is None
+
+def test_cached_completion_calls_the_model_once_per_normalized_prompt(tmp_path):
+    calls = []
+
+    async def complete(prompt, system_prompt=None, history_messages=[], **kwargs):
+        calls.append(prompt)
+        return f"answer to {prompt.strip()}"
+
+    cached = cached_completion(complete, CompletionCache(path=str(tmp_path / "completions.sqlite")), model="model")
+    first = asyncio.run(cached("What changed?", host="http://a"))
+    # Whitespace and transport settings do not change the key
+    second = asyncio.run(cached("  What changed?  \r\n", host="http://b"))
+    asyncio.run(cached("What changed?", options={"temperature": 0.5}))
+    assert first == second == "answer to What changed?"
+    assert len(calls) == 2
@@ -0,0 +1,62 @@
+import pytest
+import dedup_shards
+
+WORDS = [f"term{i}" for i in range(100)]
+BASE = " ".join(WORDS)
+
+def edited(*positions):
+    words = list(WORDS)
+    for position in positions:
+        words[position] = f"changed{position}"
+    return " ".join(words)
+
+def jaccard(a, b):
+    a, b = set(dedup_shards.shingles(a)), set(dedup_shards.shingles(b))
+    return len(a & b) / len(a | b)
+
+def shard(shard_id, *paragraphs):
+    return {"id": shard_id, "source": "notes.txt", "kind": "paragraph", "text": "\n\n".join(paragraphs)}
+
+def removals(threshold, first, second):
+    return dedup_shards.dedup_shards([shard("s1", first), shard("s2", second)], threshold)[1]
+
+def test_signatures_estimate_jaccard_similarity():
+    index = dedup_shards.MinHashIndex(0.85)
+    for text in (edited(50), edited(20, 50, 80), edited(*range(0, 100, 10))):
+        estimate = float((index.signature(BASE) == index.signature(text)).mean())
+        # The standard error of a 128-permutation estimate is at most 0.044
+        assert estimate == pytest.approx(jaccard(BASE, text), abs=0.15)
+
+def test_near_duplicates_are_removed_only_at_or_above_the_threshold():
+    close = edited(50)  # One changed word: about 0.90 Jaccard
+    assert jaccard(BASE, close) > 0.88
+    [removal] = removals(0.85, BASE, close)
+    assert removal["reason"] == "near" and removal["shard"] == "s2"
+    assert removal["duplicate_of"]["shard"] == "s1"
+    assert removals(0.97, BASE, close) == []
+
+    far = edited(20, 50, 80)  # Three changed words: about 0.73 Jaccard
+    assert jaccard(BASE, far) < 0.75
+    assert removals(0.85, BASE, far) == []
+    assert len(removals(0.6, BASE, far)) == 1
+
+def test_exact_duplicates_are_removed_at_any_threshold():
+    [removal] = removals(1.0, BASE, BASE)
+    assert removal["reason"] == "exact"
+
+def test_short_and_protected_segments_are_kept():
+    short = "Thanks, this fixed it for me."
+    assert removals(0.5, short, short) == []
+    heading = "# " + BASE
+    deduped, found = dedup_shards.dedup_shards([shard("s1", heading), shard("s2", heading)], 0.5)
+    assert found == [] and [s["text"] for s in deduped] == [heading, heading]
+
+    # The function body is a paragraph of its own, between blank lines inside the fence
+    code = f"## a.py\n\n```\ndef run():\n\n    {BASE}\n\n    return 1\n```"
+    deduped, found = dedup_shards.dedup_shards([shard("s1", code), shard("s2", code.replace("a.py", "b.py"))], 0.5)
+    assert found == [] and deduped[1]["text"] == code.replace("a.py", "b.py")
+
+def test_a_shard_left_empty_is_dropped_and_others_keep_their_ids():
+    deduped, _ = dedup_shards.dedup_shards([shard("s1", BASE), shard("s2", BASE), shard("s3", BASE, "Unique closing words here.")], 0.85)
+    assert [s["id"] for s in deduped] == ["s1", "s3"]
+    assert deduped[1]["text"] == "Unique closing words here."
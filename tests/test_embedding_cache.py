@@ -0,0 +1,91 @@
+import os
+import threading
+import multiprocessing
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+pytest.importorskip("lightrag")
+pytest.importorskip("ollama")
+from embedding_cache import EmbeddingCache
+
+MODEL = "nomic-embed-text:latest"
+DIM = 8
+
+def vector(i):
+    return np.full(DIM, i, dtype=np.float32)
+
+def write_vectors(cache_dir, start, count):
+    cache = EmbeddingCache(MODEL, DIM, cache_dir=cache_dir)
+    for offset in range(0, count, 500):
+        cache.put_many([(cache.key(f"text {i}"), vector(i)) for i in range(start + offset, start + min(offset + 500, count))])
+
+def test_vectors_survive_reopening(tmp_path):
+    cache = EmbeddingCache(MODEL, DIM, cache_dir=str(tmp_path))
+    cache.put_many([(cache.key("hello"), vector(1))])
+    reopened = EmbeddingCache(MODEL, DIM, cache_dir=str(tmp_path))
+    found = reopened.get_many([reopened.key("hello"), reopened.key("missing")])
+    assert list(found) == [reopened.key("hello")]
+    assert np.array_equal(found[reopened.key("hello")], vector(1))
+
+def test_processes_growing_the_cache_never_shrink_it_under_each_other(tmp_path):
+    cache_dir = str(tmp_path)
+    reader = EmbeddingCache(MODEL, DIM, cache_dir=cache_dir)
+    reader.put_many([(reader.key(f"text {i}"), vector(i)) for i in range(10)])
+    # Opened before the others grow the file, so its idea of the file size is stale
+    stale = EmbeddingCache(MODEL, DIM, cache_dir=cache_dir)
+
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        pool.starmap(write_vectors, [(cache_dir, 10 + n * 3000, 3000) for n in range(4)])
+    vector_path = os.path.join(reader.directory, "vectors.f32")
+    grown = os.path.getsize(vector_path)
+    assert grown >= 12010 * DIM * 4
+
+    stale.put_many([(stale.key("late"), vector(-1))])
+    assert os.path.getsize(vector_path) >= grown
+
+    # Rows past the reader's mapping, written by other processes
+    keys = {reader.key(f"text {i}"): i for i in range(12010)}
+    found = reader.get_many(keys)
+    assert len(found) == len(keys)
+    assert all(np.array_equal(found[key], vector(i)) for key, i in keys.items())
+    assert np.array_equal(reader.get_many([reader.key("late")])[reader.key("late")], vector(-1))
+
+class PausingConnection:
+    """
+    Wraps a cache's connection and runs on_lookup right after its slot lookup, before the vector is read.
+    """
+    def __init__(self, db, on_lookup):
+        self.db = db
+        self.on_lookup = on_lookup
+
+    def execute(self, sql, *args):
+        cursor = self.db.execute(sql, *args)
+        if sql.startswith("SELECT key, slot"):
+            rows = cursor.fetchall()
+            self.on_lookup()
+            return SimpleNamespace(fetchall=lambda: rows)
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+def test_a_row_is_not_reused_for_another_text_while_it_is_being_read(tmp_path):
+    # Room for two vectors: a third put evicts the least recently used one and reuses its row
+    reader = EmbeddingCache(MODEL, DIM, cache_dir=str(tmp_path), max_bytes=2 * DIM * 4)
+    reader.put_many([(reader.key("first"), vector(1))])
+    reader.put_many([(reader.key("second"), vector(2))])
+    writer = EmbeddingCache(MODEL, DIM, cache_dir=str(tmp_path), max_bytes=2 * DIM * 4)
+    other = threading.Thread(target=writer.put_many, args=([(writer.key("third"), vector(3))],))
+
+    def evict_concurrently():
+        other.start()
+        other.join(0.5)  # Without the lock held, the eviction completes here
+
+    reader.db = PausingConnection(reader.db, evict_concurrently)
+    found = reader.get_many([reader.key("first")])
+    other.join()
+    assert np.array_equal(found[reader.key("first")], vector(1))
+    # The read refreshed "first", so the eviction that waited for it took "second" instead
+    reader.db = reader.db.db
+    assert set(reader.get_many([reader.key(t) for t in ("first", "second", "third")])) == {reader.key("first"), reader.key("third")}
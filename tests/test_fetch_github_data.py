@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from datetime import timedelta
+import pytest
+import fetch_github_data
+from fetch_cache import FetchCache
+
+def fetch(github, output_dir, mode="contents", cache=None):
+    os.makedirs(output_dir, exist_ok=True)
+    return fetch_github_data.repo_to_text(f"https://github.com/{github.repo.full_name}", str(output_dir), mode, cache)
+
+def digest(result):
+    with open(result["output"], "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def read(result):
+    with open(result["output"], "r", encoding="utf-8") as f:
+        return f.read()
+
+def test_contents_walk_lists_directories_concurrently_and_writes_them_in_order(github, tmp_path, monkeypatch):
+    list_directory = fetch_github_data.list_directory
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def slow_listing(*args, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            time.sleep(0.05)
+            return list_directory(*args, **kwargs)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(fetch_github_data, "list_directory", slow_listing)
+    result = fetch(github, tmp_path)
+    assert result["status"] == "written" and peak[0] > 1
+    # Depth-first, whichever listing finished first
+    assert re.findall(r"^## (src/\S+)$", read(result), re.M) == sorted(github.repo.files)
+    assert result["files"] == len(github.repo.files)
+    # One listing per directory and one request per file
+    assert github.requests["contents"] == len(github.repo.directories()) + len(github.repo.files)
+
+def test_archive_mode_writes_the_same_document_as_contents_mode(github, tmp_path):
+    contents = fetch(github, tmp_path / "contents")
+    listed = github.requests["contents"]
+    archive = fetch(github, tmp_path / "archive", "archive")
+    assert archive["status"] == "written" and digest(archive) == digest(contents)
+    # One Git Trees call and one tarball instead of the per-file walk
+    assert github.requests["contents"] == listed
+    assert github.requests["trees"] == 1 and github.requests["tarball"] == 1
+    assert archive["api_calls"] == 4 < contents["api_calls"]
+
+def test_a_warm_run_replays_listings_and_blobs_and_keeps_the_previous_document(github, tmp_path, capsys):
+    first = fetch(github, tmp_path / "data", cache=FetchCache(str(tmp_path / "cache")))
+    github.requests.clear()
+    capsys.readouterr()
+    second = fetch(github, tmp_path / "data", cache=FetchCache(str(tmp_path / "cache")))
+    assert second["status"] == "unchanged" and second["output"] == first["output"]
+    assert os.listdir(tmp_path / "data") == [os.path.basename(first["output"])]
+    # Every listing answered 304 Not Modified, and no file was downloaded again
+    directories = len(github.repo.directories())
+    assert github.requests["not_modified"] == github.requests["contents"] == directories
+    files = len(github.repo.files)
+    assert f"{files}/{files} blobs from cache (100%), {directories} directory listings not modified" in capsys.readouterr().out
+
+def test_one_cache_serves_other_modes_and_output_directories(github, tmp_path, capsys):
+    cache = FetchCache(str(tmp_path / "cache"))
+    contents = fetch(github, tmp_path / "contents", cache=cache)
+    capsys.readouterr()
+    # Every blob is cached, so no tarball is needed; the document still goes to the new directory
+    archive = fetch(github, tmp_path / "archive", "archive", cache)
+    assert archive["status"] == "written" and os.path.dirname(archive["output"]) == str(tmp_path / "archive")
+    assert digest(archive) == digest(contents) and "tarball" not in github.requests
+    # Counts are per run, not since the cache was created
+    files = len(github.repo.files)
+    assert f"{files}/{files} blobs from cache (100%)" in capsys.readouterr().out
+
+def test_issue_comments_come_from_one_repository_listing(github, tmp_path, monkeypatch):
+    # Small pages, so both listings span several of them
+    monkeypatch.setattr(fetch_github_data, "PER_PAGE", 5)
+    result = fetch(github, tmp_path)
+    assert github.requests["issues"] == 2
+    assert github.requests["issue_comments"] == 3  # 12 comments, not one listing per issue
+    text = read(result)
+    assert all(comment["body"] in text for comment in github.repo.comments)
+    # Every request except the repository lookup is counted, page by page
+    assert result["api_calls"] == sum(github.requests.values()) - github.requests["repo"]
+
+class Recorder:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_issues_are_written_as_soon_as_they_are_rendered(github, tmp_path, monkeypatch, cached):
+    from github import Github
+    cache = FetchCache(str(tmp_path / "cache")) if cached else None
+    repo = Github(base_url=github.url).get_repo(github.repo.full_name)
+    render_issue = fetch_github_data.render_issue
+    outs, written_before = [Recorder()], []
+
+    def render(issue, comments):
+        written_before.append(sum(text.startswith("### Issue #") for text in outs[-1].writes))
+        return render_issue(issue, comments)
+
+    monkeypatch.setattr(fetch_github_data, "render_issue", render)
+    fetch_github_data.write_recent_issues(repo, outs[-1], cache)
+    assert written_before == list(range(len(github.repo.issues)))
+
+    if cached:
+        # Issues are listed newest first: the newest is listed again (since is inclusive) and
+        # the fourth was edited; both are rendered in place among the ones read back from the cache
+        github.repo.issues[2]["updated_at"] += timedelta(days=1)
+        outs.append(Recorder())
+        written_before.clear()
+        fetch_github_data.write_recent_issues(repo, outs[-1], cache)
+        assert written_before == [0, 3]
+        uncached = Recorder()
+        fetch_github_data.write_recent_issues(repo, uncached)
+        assert "".join(outs[-1].writes) == "".join(uncached.writes)
+
+def test_a_failed_fetch_leaves_the_partial_document(github, tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(fetch_github_data, "write_recent_issues", fail)
+    assert fetch(github, tmp_path)["status"] == "failed"
+    [partial] = os.listdir(tmp_path)
+    assert partial.endswith(".txt.partial")
+    with open(tmp_path / partial, "r", encoding="utf-8") as f:
+        assert f.read().count("\n## src/") == len(github.repo.files)
+
+def test_a_blob_evicted_during_a_warm_archive_run_is_taken_from_the_tarball(github, tmp_path, monkeypatch):
+    cache = FetchCache(str(tmp_path / "cache"))
+    contents = fetch(github, tmp_path / "contents", cache=cache)
+    get_blob = cache.get_blob
+    reads = []
+
+    def evicted_after_check(sha):
+        # Another repository's run evicts the fourth blob between has_blob and get_blob
+        reads.append(sha)
+        return None if len(reads) == 4 else get_blob(sha)
+
+    monkeypatch.setattr(cache, "get_blob", evicted_after_check)
+    archive = fetch(github, tmp_path / "archive", "archive", cache)
+    assert archive["status"] == "written" and github.requests["tarball"] == 1
+    assert digest(archive) == digest(contents)
@@ -0,0 +1,79 @@
+import threading
+import pytest
+
+pytest.importorskip("github")
+import fetch_scheduler
+from fetch_cache import FetchCache
+from fetch_github_data import RateBudget
+
+class FixedBudget:
+    """
+    Stands in for RateBudget with a remaining count the test controls.
+    """
+    floor = 100
+
+    def __init__(self, remaining, reset=0.0):
+        self.remaining = remaining
+        self.reset = reset
+
+    def status(self):
+        return self.remaining, self.reset
+
+def schedule_with_costs(tmp_path, costs):
+    schedule = fetch_scheduler.FetchSchedule(str(tmp_path / "schedule.json"))
+    for repo, cost in costs.items():
+        schedule.state["repos"][repo] = {"api_calls": cost}
+    return schedule
+
+def run(tmp_path, monkeypatch, budget, costs, max_repos=3):
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def fetch(url, output_dir, mode, cache, budget):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.05)
+        with lock:
+            active[0] -= 1
+        repo = fetch_scheduler.repo_name(url)
+        return {"repo": repo, "status": "written", "output": None, "api_calls": costs[repo], "files": 0, "seconds": 0.05}
+
+    monkeypatch.setattr(fetch_scheduler, "repo_to_text", fetch)
+    schedule = schedule_with_costs(tmp_path, costs)
+    results = fetch_scheduler.schedule_fetches(list(costs), str(tmp_path), schedule, budget, max_repos=max_repos)
+    return results, peak[0]
+
+def test_repositories_run_together_while_their_estimates_fit_the_budget(tmp_path, monkeypatch):
+    costs = {"octo/a": 200, "octo/b": 200, "octo/c": 200, "octo/d": 200}
+    results, peak = run(tmp_path, monkeypatch, FixedBudget(1000), costs)
+    assert peak == 3 and len(results) == 4
+
+def test_repositories_wait_for_running_ones_when_the_budget_is_short(tmp_path, monkeypatch):
+    # 450 left: one 200-call fetch fits above the floor of 100, a second one would not
+    costs = {"octo/a": 200, "octo/b": 200, "octo/c": 200}
+    results, peak = run(tmp_path, monkeypatch, FixedBudget(450), costs)
+    assert peak == 1 and {r["status"] for r in results} == {"written"}
+
+def test_the_scheduler_sleeps_until_reset_when_nothing_fits(tmp_path, monkeypatch):
+    budget = FixedBudget(250, reset=fetch_scheduler.time.time() + 30)
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        budget.remaining = 5000  # A new rate limit window
+
+    monkeypatch.setattr(fetch_scheduler.time, "sleep", sleep)
+    results, _ = run(tmp_path, monkeypatch, budget, {"octo/a": 200})
+    assert len(slept) == 1 and 29 <= slept[0] <= 31
+    assert [r["status"] for r in results] == ["written"]
+
+def test_the_shared_budget_tracks_the_rate_limit_the_fake_github_reports(github, tmp_path):
+    budget = RateBudget()
+    schedule = fetch_scheduler.FetchSchedule(str(tmp_path / "schedule.json"))
+    [result] = fetch_scheduler.schedule_fetches([github.repo.full_name], str(tmp_path), schedule, budget,
+                                                cache=FetchCache(str(tmp_path / "cache")))
+    assert result["status"] == "written"
+    assert budget.status()[0] == github.remaining
+    assert schedule.estimated_cost(github.repo.full_name) == result["api_calls"]
+    assert schedule.start_run([github.repo.full_name]) == [github.repo.full_name]  # The run finished, so a new one starts
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+
+pytest.importorskip("lightrag")
+from lightrag.utils import compute_mdhash_id
+import graph_ledger
+import insert_driver
+
+def test_plan_splits_documents_by_ledger_state(tmp_path):
+    ledger = graph_ledger.DocumentLedger(tmp_path)
+    ledger.record("same", "unchanged text")
+    ledger.record("edited", "old text")
+    ledger.record("gone", "removed text")
+    new, changed, unchanged, removed = ledger.plan([("same", "unchanged text"), ("edited", "new text"), ("fresh", "text")])
+    assert new == [("fresh", "text")]
+    assert changed == [("edited", "new text")]
+    assert unchanged == [("same", "unchanged text")]
+    assert removed == ["gone"]
+
+def test_plan_rejects_duplicate_keys(tmp_path):
+    ledger = graph_ledger.DocumentLedger(tmp_path)
+    with pytest.raises(ValueError, match="k1"):
+        ledger.plan([("k1", "first text"), ("k2", "other text"), ("k1", "second text")])
+
+def test_changed_and_removed_documents_are_retired(tmp_path, make_rag):
+    first = "Alice Moreno met Bilal Chen to plan the Orchard migration."
+    second = "Carla Diaz reviewed the Harbor release with Dmitri Novak."
+    edited = "Elena Rossi met Farid Haddad to plan the Orchard migration."
+    asyncio.run(insert_driver.aupdate_graph(make_rag(tmp_path), [("a", first), ("b", second)]))
+
+    rag = make_rag(tmp_path)
+    assert asyncio.run(insert_driver.aupdate_graph(rag, [("a", edited), ("b", second)])) == (1, 0, 1, 0)
+    assert graph_ledger.document_id(first) not in rag.full_docs._data
+    assert graph_ledger.document_id(edited) in rag.full_docs._data
+    assert all(chunk["full_doc_id"] != graph_ledger.document_id(first) for chunk in rag.text_chunks._data.values())
+    assert graph_ledger.DocumentLedger(tmp_path).entries["a"]["doc_id"] == graph_ledger.document_id(edited)
+
+    # Read back from disk: the retired entities, their vectors and relations were persisted too
+    graph = make_rag(tmp_path).chunk_entity_relation_graph._graph
+    assert '"ALICE"' not in graph and '"BILAL"' not in graph
+    assert '"ELENA"' in graph and '"ORCHARD"' in graph and '"CARLA"' in graph
+    assert rag.entities_vdb._client.get([compute_mdhash_id('"ALICE"', prefix="ent-")]) == []
+
+    rag = make_rag(tmp_path)
+    assert asyncio.run(insert_driver.aupdate_graph(rag, [("a", edited)])) == (1, 0, 0, 1)
+    assert graph_ledger.document_id(second) not in rag.full_docs._data
+    assert '"CARLA"' not in rag.chunk_entity_relation_graph._graph
+    assert "b" not in graph_ledger.DocumentLedger(tmp_path).entries
@@ -0,0 +1,33 @@
+import asyncio
+import pytest
+
+pytest.importorskip("lightrag")
+import graph_ledger
+import insert_driver
+
+def test_documents_lightrag_did_not_store_stay_pending(tmp_path, make_rag):
+    # Lowercase text gives the fake extractor no entities, so LightRAG 1.0.0 stores nothing for the batch
+    documents = [("quiet", "nothing here but lowercase words about routines and loops.")]
+    asyncio.run(insert_driver.aupdate_graph(make_rag(tmp_path), documents, batch_size=1))
+    assert "quiet" not in graph_ledger.DocumentLedger(tmp_path).entries
+
+    documents.append(("named", "Grace Okafor ported the Lantern scheduler to Hiro Tanaka's queue."))
+    rag = make_rag(tmp_path)
+    assert asyncio.run(insert_driver.aupdate_graph(rag, documents, batch_size=1)) == (0, 2, 0, 0)
+    assert list(graph_ledger.DocumentLedger(tmp_path).entries) == ["named"]
+    assert graph_ledger.document_id(documents[1][1]) in rag.full_docs._data
+
+def test_completions_from_the_cache_are_not_counted_as_llm_calls(tmp_path, make_rag):
+    from completion_cache import CompletionCache
+    cache = CompletionCache(path=str(tmp_path / "completions.sqlite"))
+    pending = [("a", "Ingrid Berg moved the Beacon runner onto Jonas Weber's Harbor cluster.")]
+
+    def insert(working_dir):
+        rag = make_rag(working_dir, completion_cache=cache)
+        return asyncio.run(insert_driver.insert_batches(rag, graph_ledger.DocumentLedger(working_dir), pending, 8, 3600))
+
+    cold = insert(tmp_path / "cold")
+    assert cold.llm_calls > 0 and cold.cache_hits == 0 and cold.tokens > 0
+    warm = insert(tmp_path / "warm")
+    assert warm.llm_calls == 0 and warm.tokens == 0
+    assert warm.cache_hits == cold.llm_calls
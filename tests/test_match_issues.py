@@ -0,0 +1,33 @@
+import json
+import pytest
+
+pytest.importorskip("lightrag")
+pytest.importorskip("ollama")
+import match_issues
+
+BIOGRAPHY = "Ann builds agents, ships tools, and mentors engineers."
+
+def test_unquoted_csv_rows_keep_the_whole_biography(tmp_path):
+    path = tmp_path / "our_people.txt"
+    path.write_text(f"Name,Position,Biography,Education\nAnn Lee,Engineer,{BIOGRAPHY},MIT\n", encoding="utf-8")
+    [person] = match_issues.load_people(path)
+    assert person["name"] == "Ann Lee" and person["position"] == "Engineer"
+    assert BIOGRAPHY in person["text"] and person["text"].endswith("MIT")
+
+def test_profile_records_are_read_field_by_field(tmp_path):
+    path = tmp_path / "our_people.jsonl"
+    record = {"url": "https://example.com/ann", "Name": "Ann Lee", "Position": "Engineer", "Biography": BIOGRAPHY, "Education": "MIT"}
+    path.write_text(json.dumps(record) + "\n", encoding="utf-8")
+    [person] = match_issues.load_people(path)
+    assert person["text"] == f"Ann Lee, Engineer. {BIOGRAPHY} Education: MIT"
+
+def snapshot(body):
+    return "\n".join(["# Repository: octo/demo", "", "## Recent Issues (Past 3 Months)", "",
+                      "### Issue #2: Second", f"- **Body**:\n{body}", "", "### Issue #1: First", "- **Body**:\nOld", ""])
+
+def test_issues_in_several_snapshots_are_loaded_once_from_the_newest(tmp_path):
+    (tmp_path / "demo_2024-11-12_19-01-10.txt").write_text(snapshot("Before the edit"), encoding="utf-8")
+    (tmp_path / "demo_2024-11-20_08-00-00.txt").write_text(snapshot("After the edit"), encoding="utf-8")
+    issues = match_issues.load_issues(tmp_path)
+    assert sorted(issue["number"] for issue in issues) == [1, 2]
+    assert "After the edit" in next(issue["text"] for issue in issues if issue["number"] == 2)
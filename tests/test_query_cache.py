@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+pytest.importorskip("lightrag")
+from lightrag import QueryParam
+from query_cache import QueryCache, identifiers
+
+def make_cache(tmp_path):
+    asked = []
+
+    async def embed(texts):
+        # A model that cannot tell these questions apart at all
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+    async def aquery(question, param):
+        asked.append(question)
+        return f"Answer to: {question}"
+
+    (tmp_path / "graph").mkdir()
+    rag = SimpleNamespace(working_dir=str(tmp_path / "graph"), embedding_func=embed, aquery=aquery)
+    return QueryCache(rag, path=str(tmp_path / "queries.sqlite")), asked
+
+def test_identifiers_skip_sentence_starts():
+    assert identifiers("Who should fix issue #12 in openai/swarm? Ask Alice Moreno.") == {"12", "Alice", "Moreno"}
+    assert identifiers("Which engineer can I ask about v1.2?") == {"1.2"}
+
+def test_similar_questions_about_other_identifiers_are_not_served_from_the_cache(tmp_path):
+    cache, asked = make_cache(tmp_path)
+    param = QueryParam(mode="hybrid")
+    ask = lambda question: asyncio.run(cache.aquery(question, param))
+
+    assert ask("Who should fix issue #12?")[1] == "llm"
+    assert ask("Who should fix issue #13?") == ("Answer to: Who should fix issue #13?", "llm")
+    assert ask("Which engineer can fix issue #12?") == ("Answer to: Who should fix issue #12?", "semantic")
+    assert ask("who should fix issue #12")[1] == "exact"
+
+    assert ask("What has Alice Moreno worked on?")[1] == "llm"
+    assert ask("What has Bilal Chen worked on?")[1] == "llm"
+    assert ask("Tell me what Alice Moreno worked on.") == ("Answer to: What has Alice Moreno worked on?", "semantic")
+    assert len(asked) == 4
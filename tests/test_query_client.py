@@ -0,0 +1,31 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import query_client
+
+class BadGateway(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"<html><body><h1>502 Bad Gateway</h1></body></html>"
+        self.send_response(502)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def gateway():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BadGateway)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def test_non_json_error_pages_are_reported_as_text(gateway):
+    with pytest.raises(RuntimeError, match="returned 502: <html>.*Bad Gateway"):
+        query_client.query_service("Who owns fetch_github_data.py?", url=gateway)
+    with pytest.raises(RuntimeError, match="returned 502: <html>"):
+        query_client.issue_matches(issue=12, url=gateway)
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+
+pytest.importorskip("lightrag")
+pytest.importorskip("aiohttp")
+from aiohttp.test_utils import TestClient, TestServer
+import query_service
+
+def call(service, method, path, **kwargs):
+    async def run():
+        async with TestClient(TestServer(query_service.create_app(service))) as client:
+            response = await client.request(method, path, **kwargs)
+            return response.status, await response.json()
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]", b'"text"', b'{"query": 5}', b'{"query": "  "}', b"\xff\xfe"])
+def test_malformed_query_bodies_are_rejected(body):
+    status, reply = call(query_service.QueryService(None), "POST", "/query", data=body)
+    assert status == 400
+    assert "error" in reply
+
+class ExplainingRag:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def llm_model_func(self, prompt):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.05)
+        self.running -= 1
+        return "ranked"
+
+class FakeQueryCache:
+    def __init__(self):
+        self.rag = ExplainingRag()
+
+def issue(number):
+    return {"repo": "octo/demo", "number": number, "title": f"Issue {number}", "snippet": "Crash on start",
+            "matches": [{"name": "Ann Lee", "position": "Engineer", "score": 0.8, "profile": "Builds agents."}]}
+
+def explain_all(service, count):
+    async def run():
+        async with TestClient(TestServer(query_service.create_app(service))) as client:
+            responses = await asyncio.gather(*[client.get(f"/matches?issue={n}&explain=1") for n in range(1, count + 1)])
+            return [response.status for response in responses]
+    return asyncio.run(run())
+
+def test_explanations_run_on_the_query_workers():
+    service = query_service.QueryService(FakeQueryCache(), workers=1, queue_size=8,
+                                         matches={"issues": [issue(n) for n in range(1, 5)]})
+    assert explain_all(service, 4) == [200] * 4
+    assert service.query_cache.rag.peak == 1
+
+def test_explanations_are_turned_away_when_the_queue_is_full():
+    service = query_service.QueryService(FakeQueryCache(), workers=1, queue_size=1,
+                                         matches={"issues": [issue(n) for n in range(1, 5)]})
+    statuses = explain_all(service, 4)
+    assert 200 in statuses and 503 in statuses
+    assert service.rejected == statuses.count(503)
@@ -0,0 +1,67 @@
+import time
+import threading
+import requests
+import scrape_website
+
+def scrape(site, previous=None, **kwargs):
+    kwargs = dict({"workers": 8, "per_host": 2, "min_interval": 0.0}, **kwargs)
+    return scrape_website.scrape_profiles(f"{site.url}/our-people", previous, **kwargs)
+
+def test_profiles_are_fetched_concurrently_within_the_per_host_limit(profile_site, monkeypatch):
+    get = requests.Session.get
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def tracked_get(self, *args, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            return get(self, *args, **kwargs)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(requests.Session, "get", tracked_get)
+    records, changes = scrape(profile_site)
+    assert peak[0] == 2
+    # The index links every profile twice; each is fetched once, and records keep the page order
+    assert profile_site.requests["profile"] == len(profile_site.profiles)
+    assert [record["Name"] for record in records] == [profile["name"] for profile in profile_site.profiles.values()]
+    assert len(changes["added"]) == len(records)
+    first = records[0]
+    profile = profile_site.profiles["person-0"]
+    assert (first["Position"], first["Biography"], first["Education"]) == (profile["position"], profile["bio"], "; ".join(profile["education"]))
+
+def test_requests_on_one_host_start_min_interval_apart(profile_site):
+    start = time.perf_counter()
+    scrape(profile_site, per_host=8, min_interval=0.1)
+    # The index and eight profiles: eight gaps of 100ms
+    assert time.perf_counter() - start >= 0.8
+
+def test_a_second_scrape_revalidates_and_reports_only_what_changed(profile_site, monkeypatch, tmp_path):
+    records, _ = scrape(profile_site)
+    scrape_website.write_records(records, tmp_path / "our_people.jsonl")
+    previous = scrape_website.load_records(tmp_path / "our_people.jsonl")
+    profile_site.profiles["person-3"]["position"] = "Director of Research"
+    del profile_site.profiles["person-5"]
+    profile_site.requests.clear()
+    parsed = []
+    parse_profile = scrape_website.parse_profile
+    monkeypatch.setattr(scrape_website, "parse_profile", lambda content: parsed.append(content) or parse_profile(content))
+
+    records, changes = scrape(profile_site, previous)
+    # Every profile was requested with its ETag; only the edited one came back in full and was parsed
+    assert profile_site.requests["not_modified"] == 6 and profile_site.requests["profile"] == 1
+    assert len(parsed) == 1
+    assert [entry["name"] for entry in changes["changed"]] == [profile_site.profiles["person-3"]["name"]]
+    assert [entry["url"] for entry in changes["removed"]] == [f"{profile_site.url}/our-people/person-5"]
+    assert changes["added"] == [] and changes["unchanged"] == 6
+    assert next(r for r in records if r["url"].endswith("person-3"))["Position"] == "Director of Research"
+
+def test_full_rescrape_ignores_validators(profile_site):
+    records, _ = scrape(profile_site)
+    profile_site.requests.clear()
+    _, changes = scrape(profile_site, {record["url"]: record for record in records}, full=True)
+    assert profile_site.requests["profile"] == 8 and "not_modified" not in profile_site.requests
+    assert changes["unchanged"] == 8
@@ -0,0 +1,73 @@
+import json
+import shard_corpus
+
+def repo_document(issue_numbers, body="Body text"):
+    lines = ["# Repository: octo/demo", "", "## Repository Structure", "", "```", "README.md", "```", "",
+             "## README.md", "", "```", "Demo", "```", "", "## Recent Issues (Past 3 Months)", ""]
+    for number in issue_numbers:
+        lines += [f"### Issue #{number}: Issue {number}", f"- **Body**:\n{body} {number}", ""]
+    return "\n".join(lines)
+
+def test_repository_documents_split_into_structure_file_and_issue_units():
+    source, context, units = shard_corpus.source_units("demo.txt", repo_document([2, 1]))
+    assert (source, context) == ("repo:octo/demo", "# Repository: octo/demo")
+    assert [unit["key"] for unit in units] == ["structure", "file:README.md", "issue-2", "issue-1"]
+    assert units[2]["text"].startswith("### Issue #2: ") and "Body text 2" in units[2]["text"]
+
+def test_shards_fit_the_budget_and_never_mix_kinds():
+    source, context, units = shard_corpus.source_units("demo.txt", repo_document(range(60, 0, -1), body="Body text " * 40))
+    shards = shard_corpus.pack_shards(source, context, units, 400)
+    assert len(shards) > 3
+    assert all(shard["tokens"] <= 400 for shard in shards)
+    assert all(shard["text"].startswith(context) for shard in shards if shard["kind"] != "structure")
+    assert [shard["kind"] for shard in shards[:2]] == ["structure", "file"]
+    assert {shard["kind"] for shard in shards[2:]} == {"issue"}
+
+def test_oversized_units_are_split_on_line_boundaries():
+    unit = {"key": "file:big.py", "kind": "file", "text": "\n".join(f"line {i} " * 10 for i in range(200))}
+    shards = shard_corpus.pack_shards("demo.txt", None, [unit], 300)
+    assert len(shards) > 1
+    assert all(shard["tokens"] <= 300 for shard in shards)
+    assert "\n".join(shard["text"] for shard in shards) == unit["text"]
+
+def test_shard_ids_do_not_depend_on_content():
+    source, context, units = shard_corpus.source_units("demo.txt", repo_document(range(20, 0, -1)))
+    first = shard_corpus.pack_shards(source, context, units, 30000)
+    _, _, edited = shard_corpus.source_units("demo.txt", repo_document(range(20, 0, -1), body="Edited"))
+    second = shard_corpus.pack_shards(source, context, edited, 30000)
+    assert [shard["id"] for shard in first] == [shard["id"] for shard in second]
+    assert [shard["content_hash"] for shard in first] != [shard["content_hash"] for shard in second]
+
+def write_corpus(tmp_path, documents):
+    merged, layout = "", []
+    for path, text in documents:
+        layout.append({"path": path, "offset": len(merged), "length": len(text)})
+        merged += text + "\n\n"
+    (tmp_path / "merged.txt").write_text(merged, encoding="utf-8")
+    (tmp_path / "manifest.json").write_text(json.dumps({"layout": layout}), encoding="utf-8")
+    return shard_corpus.shard_corpus(tmp_path / "merged.txt", tmp_path / "manifest.json", tmp_path / "shards.jsonl")
+
+def test_only_the_newest_snapshot_of_a_repository_is_sharded(tmp_path):
+    shards = write_corpus(tmp_path, [
+        ("data/demo_2024-11-12_19-01-10.txt", repo_document(range(40, 0, -1), body="Old")),
+        ("data/demo_2024-11-20_08-00-00.txt", repo_document(range(41, 0, -1), body="New")),
+    ])
+    ids = [shard["id"] for shard in shards]
+    assert len(ids) == len(set(ids))
+    issue_text = "".join(shard["text"] for shard in shards if shard["kind"] == "issue")
+    assert "New 41" in issue_text and "Old 1" not in issue_text
+
+def test_a_new_issue_only_changes_the_shard_it_lands_in():
+    _, context, before = shard_corpus.source_units("demo.txt", repo_document(range(200, 0, -1)))
+    _, _, after = shard_corpus.source_units("demo.txt", repo_document(range(201, 0, -1)))
+    old = {s["id"]: s["content_hash"] for s in shard_corpus.pack_shards("repo:octo/demo", context, before, 30000)}
+    new = {s["id"]: s["content_hash"] for s in shard_corpus.pack_shards("repo:octo/demo", context, after, 30000)}
+    assert len(new) > 3
+    assert sum(1 for shard_id, content_hash in new.items() if old.get(shard_id) != content_hash) == 1
+
+def test_repeated_keys_get_distinct_shard_ids():
+    text = "\n".join([shard_corpus.PEOPLE_HEADER] + ['"Ann Lee",Engineer,Bio,School'] * 40)
+    source, context, units = shard_corpus.source_units("our_people.txt", text)
+    assert len({unit["key"] for unit in units}) == 40
+    ids = [shard["id"] for shard in shard_corpus.pack_shards(source, context, units, 200)]
+    assert len(ids) == len(set(ids))